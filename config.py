@@ -21,13 +21,25 @@ REPORTS_DIR = DOCS_DIR / "reports"
 ASOCIACIONES_PATH = RAW_DATA_DIR / "asociaciones.json"
 DATOS_PACIENTES_PATH = RAW_DATA_DIR / "datos_pacientes.sav"
 RESULTADOS_PATH = PROCESSED_DATA_DIR
+CACHE_LLM_PATH = PROCESSED_DATA_DIR / "cache_llm.sqlite"
+CATEGORIAS_ANIMALES_PATH = PROCESSED_DATA_DIR / "categorias_animales.json"
 
 # Configuración de audio
 AUDIO_CONFIG = {
     "sample_rate": 16000,
     "channels": 1,
     "format": "wav",
-    "codec": "pcm_s16le"
+    "codec": "pcm_s16le",
+    "streaming": True,
+    "block_seconds": 30.0,
+    "ingest_mode": "in_place",  # "in_place", "link" o "copy"
+    "direct_decode": True,      # Video -> WAV mono 16 kHz en una sola decodificación
+    "pipe_decode": False,       # Decodificar por tubería directo a la cadena DSP
+    "vad_index": True,          # Guardar el índice de regiones de voz junto al audio procesado
+    "vad_frame_seconds": 0.03,  # Trama del índice de voz (s)
+    "vad_threshold_db": -35.0,  # Nivel mínimo de voz respecto a la trama más fuerte (mismo umbral que la puerta de ruido)
+    "vad_merge_gap": 0.5,       # Pausas menores a esto (s) no separan regiones de voz
+    "vad_padding": 0.25         # Margen añadido a cada lado de una región de voz (s)
 }
 
 # Configuración de IA
@@ -35,21 +47,64 @@ AI_CONFIG = {
     "model": "llama3:8b",
     "ollama_url": "http://localhost:11434",
     "max_tokens": 2048,
-    "temperature": 0.1
+    "temperature": 0.1,
+    "prompt_version": 3,
+    "prompt_encoding": "compact",  # "compact" (índice:palabra) o "verbose" ([start: x] palabra)
+    "max_concurrency": 2,       # Peticiones simultáneas a Ollama
+    "max_retries": 3,           # Reintentos ante errores transitorios
+    "retry_backoff": 1.0,       # Espera inicial (s), se duplica en cada reintento
+    "request_timeout": 300,     # Timeout por petición (s)
+    "lexicon_fast_path": True,  # Detectar animales claros con el léxico local antes de usar la IA
+    "lexicon_fuzzy_cutoff": 0.8,  # Similitud mínima para enviar una palabra a la IA como posible animal
+    "lexicon_escalate_unknown": False,  # Enviar también a la IA las palabras que no se parecen a ningún animal
+    "window_seconds": 20.0,     # Duración de cada ventana de palabras enviada a la IA (s)
+    "window_overlap": 2.0,      # Solape entre ventanas consecutivas (s)
+    "llm_cache": True,          # Reutilizar respuestas guardadas en CACHE_LLM_PATH
+    "llm_cache_max_entries": 5000,  # Entradas máximas de la caché (se eliminan las menos usadas)
+    "category_memory": True,    # Agrupar con CATEGORIAS_ANIMALES_PATH y preguntar a la IA solo por animales nuevos
+    "structured_output": True,  # Pedir a Ollama JSON restringido por esquema (parámetro `format`)
+    "json_retries": 2           # Reintentos de corrección si la respuesta no es JSON válido
 }
 
 # Configuración de Whisper
 WHISPER_CONFIG = {
-    "model": "base",
+    "model": "large-v3",
     "language": "es",
-    "task": "transcribe"
+    "task": "transcribe",
+    "batch_size": 8,
+    "pack_segments": True,
+    "pack_max_seconds": 28.0,
+    "pack_gap_seconds": 0.5,
+    "speech_only": True,        # Enviar a Whisper solo las regiones de voz de cada segmento
+    "speech_gap_seconds": 0.3,  # Silencio entre regiones de voz concatenadas
+    "keep_examiner": False      # Transcribir también los segmentos del examinador
 }
 
 # Configuración de diarización
 DIARIZATION_CONFIG = {
     "min_speakers": 1,
     "max_speakers": 2,
-    "min_duration": 0.5
+    "min_duration": 0.5,
+    "backend": "local",             # "local" (VAD + MFCC + k-means en CPU) o "pyannote"
+    "vad_aggressiveness": 2,        # 0-3, agresividad de webrtcvad
+    "merge_gap": 0.3,               # Pausas menores a esto (s) no separan regiones de voz
+    "window_seconds": 0.75,         # Ventana de análisis por hablante (s)
+    "min_separation": 4.0,          # Distancia cepstral mínima entre grupos para aceptar 2 hablantes
+    "short_turn_seconds": 2.0       # Turnos de hasta esta duración cuentan como respuestas del paciente
+}
+
+# Configuración del procesamiento por lotes (trabajadores por etapa)
+BATCH_CONFIG = {
+    "cpu_workers": None,            # None = número de CPUs
+    "diarization_workers": 1,
+    "transcription_workers": 1,     # Una sola instancia de Whisper compartida
+    "llm_workers": 2,
+    "plot_workers": 2
+}
+
+# Formato de los archivos intermedios
+OUTPUT_CONFIG = {
+    "export_json": True             # Además del .npy columnar, exportar las líneas de tiempo a JSON
 }
 
 # Configuración de visualización
@@ -57,7 +112,8 @@ VISUALIZATION_CONFIG = {
     "figure_size": (10, 6),
     "dpi": 300,
     "style": "seaborn-v0_8",
-    "color_palette": "Set2"
+    "color_palette": "Set2",
+    "plot_profile": "standard"      # "standard" (PNG 100 dpi), "preview" (PNG 50 dpi) o "vector" (SVG)
 }
 
 # Configuración de análisis estadístico
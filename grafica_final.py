@@ -1,38 +1,15 @@
-import pandas as pd
-import json
-import os
+import time
+from src.visualization.agregacion_de_cohorte import agregar_cohorte
 
 # === RUTAS ===
 asociaciones_path = "base/asociaciones.json"
 sav_path = "base/datos_pacientes.sav"
 carpeta_resultados = "resultados"
 
-# === CARGAR ASOCIACIONES ===
-with open(asociaciones_path, "r", encoding="utf-8") as f:
-    asociaciones = json.load(f)
-
-# Invertir asociaciones: nombre -> video
-nombre_a_video = {v.strip().upper(): k for k, v in asociaciones.items()}
-
-# === CARGAR DATOS .SAV ===
-df = pd.read_spss(sav_path)
-
-# === ASIGNAR VIDEO SEGÚN NOMBRE ===
-df["video"] = df["NOMBRE"].str.upper().map(nombre_a_video)
-df["ppm_promedio"] = None
-
-# === EXTRAER PPM DESDE JSON POR VIDEO ===
-for idx, row in df.iterrows():
-    video = row["video"]
-    if pd.notna(video):
-        resumen_path = os.path.join(carpeta_resultados, video, f"resumen_fluidez_{video}.json")
-        if os.path.exists(resumen_path):
-            try:
-                with open(resumen_path, "r", encoding="utf-8") as f:
-                    resumen = json.load(f)
-                    df.at[idx, "ppm_promedio"] = resumen.get("ppm_promedio")
-            except Exception as e:
-                print(f"⚠️ Error al procesar {resumen_path}: {e}")
+# === UNIR DATOS .SAV CON LOS RESÚMENES DE FLUIDEZ (una sola lectura y un join por nombre) ===
+inicio = time.perf_counter()
+df = agregar_cohorte(asociaciones_path, sav_path, carpeta_resultados)
+print(f"📊 Cohorte agregada en {time.perf_counter() - inicio:.2f} s ({df['ppm_promedio'].notna().sum()} pacientes con resultados)")
 
 # === CREAR NUEVO DATAFRAME SOLO CON NOMBRE, DNOpositivos Y PPM ===
 df_salida = df[["NOMBRE", "DNOpositivos", "ppm_promedio"]].copy()
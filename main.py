@@ -1,21 +1,53 @@
 import os
+import queue
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
-from proceso.procesamiento_de_audio import procesamiento_de_audio
-from proceso.diarizacion_de_personas import realizar_diarizacion
-from proceso.transcripcion_de_audio import transcripcion_de_audio
-from proceso.extraer_animales_con_ai import extraer_animales_con_ai
-from proceso.convertir_de_video_a_audio import convertir_de_video_a_audio
-from proceso.correccion_de_lista_animales import sobreescribir_tiempos
-from proceso.graficacion_de_resultados import graficacion_de_resultados
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import filedialog, messagebox, scrolledtext, ttk
+from src.pipeline.etapas import (
+    nuevo_trabajo,
+    nombres_unicos,
+    completar_rutas,
+    etapa_conversion,
+    etapa_preprocesamiento,
+    etapa_diarizacion,
+    etapa_transcripcion,
+    etapa_extraccion,
+    etapa_graficacion
+)
+from src.pipeline.procesamiento_por_lotes import procesar_lote, listar_archivos
+
+# (nombre de la etapa, mensaje de inicio, función)
+PASOS = (
+    ("conversion", "🎬 Paso 0: Extrayendo audio...", etapa_conversion),
+    ("preprocesamiento", "🎧 Paso 1: Preprocesando audio...", etapa_preprocesamiento),
+    ("diarizacion", "🗣️ Paso 2: Ejecutando diarización...", etapa_diarizacion),
+    ("transcripcion", "✍️ Paso 3: Transcribiendo audio...", etapa_transcripcion),
+    ("extraccion", "🦁 Paso 4: Ejecutando análisis con IA...", etapa_extraccion),
+    ("graficacion", "📊 Paso 5: Generando gráficas...", etapa_graficacion),
+)
+INDICE_PASO = {nombre: i for i, (nombre, _, _) in enumerate(PASOS)}
 
 class AIAlcoholGUI:
+    """
+    Interfaz gráfica. Todo el procesamiento corre en hilos de fondo: los hilos
+    solo publican eventos en `self.eventos` y el hilo de Tk los atiende cada
+    100 ms con `root.after`, que es el único que toca los widgets.
+    """
+
     def __init__(self, root):
         self.root = root
         self.root.title("Procesador de Video con IA")
-        self.root.geometry("720x600")
+        self.root.geometry("720x760")
         self.root.configure(bg="#1e1e1e")
         self.archivo = ""
+        self.trabajo = None
+
+        self.eventos = queue.Queue()
+        self.cola_archivos = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-archivo")
+        self.cola_lotes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-lote")
+        self.cancelaciones = set()
+        self.filas = {}
 
         self.lbl_archivo = tk.Label(root, text="Archivo: Ninguno seleccionado", bg="#1e1e1e", fg="white")
         self.lbl_archivo.pack(pady=10)
@@ -30,7 +62,7 @@ class AIAlcoholGUI:
         self.btn_todo.pack(pady=10)
 
         self.btns = [
-            ("🎬 Paso 0: Convertir a MP3", self.paso_convertir),
+            ("🎬 Paso 0: Extraer audio", self.paso_convertir),
             ("🎧 Paso 1: Preprocesar Audio", self.paso_audio),
             ("🗣️ Paso 2: Diarización", self.paso_diarizacion),
             ("✍️ Paso 3: Transcripción", self.paso_transcripcion),
@@ -40,105 +72,196 @@ class AIAlcoholGUI:
         for texto, comando in self.btns:
             tk.Button(root, text=texto, command=comando, bg="#444", fg="white", width=40).pack(pady=3)
 
+        self.btn_cancelar = tk.Button(root, text="⛔ Cancelar", command=self.cancelar, bg="#a1260d", fg="white", width=40)
+        self.btn_cancelar.pack(pady=5)
+
+        # Panel de progreso: una fila con barra por archivo en cola o en proceso
+        contenedor = tk.Frame(root, bg="#1e1e1e")
+        contenedor.pack(fill="x", padx=10)
+        self.canvas_progreso = tk.Canvas(contenedor, height=140, bg="#1e1e1e", highlightthickness=0)
+        barra_desplazamiento = tk.Scrollbar(contenedor, orient="vertical", command=self.canvas_progreso.yview)
+        self.panel_progreso = tk.Frame(self.canvas_progreso, bg="#1e1e1e")
+        self.panel_progreso.bind(
+            "<Configure>",
+            lambda e: self.canvas_progreso.configure(scrollregion=self.canvas_progreso.bbox("all"))
+        )
+        self.canvas_progreso.create_window((0, 0), window=self.panel_progreso, anchor="nw")
+        self.canvas_progreso.configure(yscrollcommand=barra_desplazamiento.set)
+        self.canvas_progreso.pack(side="left", fill="x", expand=True)
+        barra_desplazamiento.pack(side="right", fill="y")
+
         self.output = scrolledtext.ScrolledText(root, height=12, bg="#252526", fg="white", font=("Consolas", 10))
         self.output.pack(fill="both", expand=True, padx=10, pady=10)
 
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
+        self.root.after(100, self.atender_eventos)
+
+    # === Comunicación entre hilos ===
     def log(self, msg):
-        self.output.insert(tk.END, msg + "\n")
-        self.output.see(tk.END)
+        """Se puede llamar desde cualquier hilo: el texto se escribe en el hilo de Tk."""
+        self.eventos.put(("log", msg))
 
+    def log_progreso(self, nombre_base, etapa, estado, detalle):
+        self.eventos.put(("progreso", nombre_base, etapa, estado, detalle))
+
+    def atender_eventos(self):
+        try:
+            while True:
+                evento = self.eventos.get_nowait()
+                if evento[0] == "log":
+                    self.output.insert(tk.END, evento[1] + "\n")
+                    self.output.see(tk.END)
+                elif evento[0] == "progreso":
+                    self.actualizar_fila(*evento[1:])
+                elif evento[0] == "trabajo":
+                    if self.trabajo and evento[1]["archivo"] == self.trabajo["archivo"]:
+                        self.trabajo = evento[1]
+                elif evento[0] == "fin":
+                    self.cancelaciones.discard(evento[1])
+        except queue.Empty:
+            pass
+        self.root.after(100, self.atender_eventos)
+
+    def fila(self, nombre_base):
+        if nombre_base not in self.filas:
+            marco = tk.Frame(self.panel_progreso, bg="#1e1e1e")
+            marco.pack(fill="x", pady=1)
+            tk.Label(marco, text=nombre_base, width=24, anchor="w", bg="#1e1e1e", fg="white").pack(side="left")
+            barra = ttk.Progressbar(marco, maximum=len(PASOS), length=260)
+            barra.pack(side="left", padx=5)
+            estado = tk.Label(marco, text="en cola", width=26, anchor="w", bg="#1e1e1e", fg="#bbbbbb")
+            estado.pack(side="left")
+            self.filas[nombre_base] = (barra, estado)
+        return self.filas[nombre_base]
+
+    def actualizar_fila(self, nombre_base, etapa, estado, detalle=""):
+        barra, etiqueta = self.fila(nombre_base)
+        if etapa is None:
+            if estado == "completado":
+                barra["value"] = len(PASOS)
+            etiqueta.config(text=f"{estado} {detalle}".strip()[:40])
+            if estado == "error":
+                self.output.insert(tk.END, f"❌ [{nombre_base}] {detalle}\n")
+                self.output.see(tk.END)
+        elif estado == "iniciado":
+            barra["value"] = INDICE_PASO[etapa]
+            etiqueta.config(text=f"{etapa}...")
+        elif estado == "completado":
+            barra["value"] = INDICE_PASO[etapa] + 1
+        elif estado == "error":
+            etiqueta.config(text=f"error en {etapa}")
+
+    # === Envío de trabajos a segundo plano ===
+    def _nueva_cancelacion(self):
+        evento = threading.Event()
+        self.cancelaciones.add(evento)
+        return evento
+
+    def encolar_pasos(self, indices):
+        if not self.trabajo:
+            messagebox.showwarning("Sin archivo", "Selecciona un archivo primero.")
+            return
+        trabajo = dict(self.trabajo)
+        cancelacion = self._nueva_cancelacion()
+        self.fila(trabajo["nombre_base"])
+        futuro = self.cola_archivos.submit(self._ejecutar_pasos, trabajo, indices, cancelacion)
+        futuro.add_done_callback(lambda f: self.eventos.put(("fin", cancelacion)))
+
+    def _ejecutar_pasos(self, trabajo, indices, cancelacion):
+        """Corre en un hilo de fondo."""
+        nombre_base = trabajo["nombre_base"]
+        for indice in indices:
+            etapa, mensaje, funcion = PASOS[indice]
+            if cancelacion.is_set():
+                self.log(f"⛔ [{nombre_base}] Cancelado antes de {etapa}.")
+                self.log_progreso(nombre_base, None, "cancelado", "")
+                return
+            self.log(mensaje)
+            self.log_progreso(nombre_base, etapa, "iniciado", "")
+            try:
+                trabajo = funcion(completar_rutas(trabajo))
+            except Exception as e:
+                self.log_progreso(nombre_base, etapa, "error", str(e))
+                self.log_progreso(nombre_base, None, "error", f"{etapa}: {e}")
+                return
+            self.eventos.put(("trabajo", trabajo))
+            self.log_progreso(nombre_base, etapa, "completado", "")
+            self.log(f"✅ {etapa} completado.")
+        if len(indices) == len(PASOS):
+            self.log("🎉 Procesamiento COMPLETO")
+        self.log_progreso(nombre_base, None, "completado", "")
+
+    def cancelar(self):
+        if not self.cancelaciones:
+            self.log("ℹ️ No hay trabajos en curso.")
+            return
+        for evento in list(self.cancelaciones):
+            evento.set()
+        self.log("⛔ Cancelación solicitada: la etapa en curso terminará y no se iniciarán más.")
+
+    def cerrar(self):
+        # Primero la cancelación: el lote en curso cierra sus pools y no inicia más etapas
+        for evento in list(self.cancelaciones):
+            evento.set()
+        self.cola_archivos.shutdown(wait=False, cancel_futures=True)
+        self.cola_lotes.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
+    # === Acciones de la interfaz ===
     def seleccionar_archivo(self):
         archivo = filedialog.askopenfilename(filetypes=[("Video/Audio", "*.mp4 *.mp3 *.wav *.m4a *.mov *.mkv")])
         if archivo:
             self.archivo = archivo
-            self.nombre_base = os.path.splitext(os.path.basename(archivo))[0]
-            self.output_dir = os.path.join("resultados", self.nombre_base)
-            os.makedirs(self.output_dir, exist_ok=True)
+            self.trabajo = nuevo_trabajo(archivo, "resultados")
+            self.nombre_base = self.trabajo["nombre_base"]
+            self.output_dir = self.trabajo["output_dir"]
             self.lbl_archivo.config(text=f"Archivo: {archivo}")
             self.log(f"📂 Archivo seleccionado: {archivo}")
 
     def procesar_carpeta(self):
         carpeta = filedialog.askdirectory()
         if carpeta:
-            extensiones_validas = (".mp4", ".mp3", ".wav", ".m4a", ".mov", ".mkv")
-            archivos = [f for f in os.listdir(carpeta) if f.lower().endswith(extensiones_validas)]
+            archivos = listar_archivos(carpeta)
             if not archivos:
                 messagebox.showwarning("Vacío", "No se encontraron archivos válidos en la carpeta.")
                 return
-            for archivo in archivos:
-                ruta = os.path.join(carpeta, archivo)
-                self.archivo = ruta
-                self.nombre_base = os.path.splitext(os.path.basename(archivo))[0]
-                self.output_dir = os.path.join("resultados", self.nombre_base)
-                os.makedirs(self.output_dir, exist_ok=True)
-                self.log(f"\n🚀 Procesando archivo: {archivo}")
-                try:
-                    self.ejecutar_todo()
-                except Exception as e:
-                    self.log(f"❌ Error al procesar {archivo}: {e}")
-            self.log("📁 Procesamiento por carpeta completado.")
+            for nombre_base in nombres_unicos(archivos):
+                self.fila(nombre_base)
+            self.log(f"\n🚀 Procesando {len(archivos)} archivos en paralelo...")
+            cancelacion = self._nueva_cancelacion()
+            futuro = self.cola_lotes.submit(self._procesar_lote, archivos, cancelacion)
+            futuro.add_done_callback(lambda f: self.eventos.put(("fin", cancelacion)))
+
+    def _procesar_lote(self, archivos, cancelacion):
+        """Corre en un hilo de fondo."""
+        try:
+            resultados = procesar_lote(archivos, "resultados", al_progreso=self.log_progreso, cancelacion=cancelacion)
+        except Exception as e:
+            self.log(f"❌ Error en el procesamiento por carpeta: {e}")
+            return
+        completados = sum(1 for r in resultados if r["estado"] == "completado")
+        self.log(f"📁 Procesamiento por carpeta completado: {completados}/{len(resultados)} archivos.")
 
     def paso_convertir(self):
-        self.log("🎬 Paso 0: Convirtiendo a MP3...")
-        self.audio_file = convertir_de_video_a_audio(self.archivo, self.output_dir)
-        if os.path.exists(self.audio_file):
-            self.log(f"✅ Audio listo: {self.audio_file}")
-        else:
-            self.log("❌ Error al convertir a audio")
+        self.encolar_pasos([INDICE_PASO["conversion"]])
 
     def paso_audio(self):
-        self.audio_file = os.path.join(self.output_dir, f"{self.nombre_base}.mp3")
-        self.log("🎧 Paso 1: Preprocesando audio...")
-        self.processed_audio = procesamiento_de_audio(self.audio_file, output_dir=self.output_dir)
-        self.log("✅ Preprocesamiento completado.")
+        self.encolar_pasos([INDICE_PASO["preprocesamiento"]])
 
     def paso_diarizacion(self):
-        self.processed_audio = os.path.join(self.output_dir, f"{self.nombre_base}_converted_whisper_ready.wav")
-        self.log("🗣️ Paso 2: Ejecutando diarización...")
-        self.diarization_results = realizar_diarizacion(self.processed_audio, output_dir=self.output_dir)
-        self.log("✅ Diarización completada.")
+        self.encolar_pasos([INDICE_PASO["diarizacion"]])
 
     def paso_transcripcion(self):
-        self.processed_audio = os.path.join(self.output_dir, f"{self.nombre_base}_converted_whisper_ready.wav")
-        self.log("✍️ Paso 3: Transcribiendo audio...")
-        self.transcribed_results = transcripcion_de_audio(self.processed_audio, self.diarization_results, output_dir=self.output_dir)
-        self.log("✅ Transcripción completada.")
+        self.encolar_pasos([INDICE_PASO["transcripcion"]])
 
     def paso_ollama(self):
-        path_json = os.path.join(self.output_dir, "palabras_con_tiempos.json")
-        self.log("🦁 Paso 4: Ejecutando análisis con IA...")
-        extraer_animales_con_ai(
-            path_json=path_json,
-            model="llama3:8b",
-            salida=self.nombre_base,
-            output_dir=self.output_dir
-        )
-        self.log("✅ Extracción completada.")
+        self.encolar_pasos([INDICE_PASO["extraccion"]])
 
     def paso_pdf(self):
-        lista_animales_path = os.path.join(self.output_dir, "lista_animales.json")
-        self.log("📊 Paso 5: Generando gráficas...")
-        try:
-            graficacion_de_resultados(
-                lista_animales_path=lista_animales_path,
-                nombre_salida=self.nombre_base,
-                output_dir=self.output_dir
-            )
-            self.log("✅ Gráficas generadas exitosamente.")
-        except Exception as e:
-            self.log(f"❌ Error generando gráficas: {e}")
+        self.encolar_pasos([INDICE_PASO["graficacion"]])
 
     def ejecutar_todo(self):
-        try:
-            self.paso_convertir()
-            self.paso_audio()
-            self.paso_diarizacion()
-            self.paso_transcripcion()
-            self.paso_ollama()
-            self.paso_pdf()
-            self.log("🎉 Procesamiento COMPLETO")
-        except Exception as e:
-            self.log(f"❌ Error en ejecución completa: {e}")
+        self.encolar_pasos(list(range(len(PASOS))))
 
 if __name__ == '__main__':
     root = tk.Tk()
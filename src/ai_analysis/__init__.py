@@ -5,10 +5,18 @@ Contiene funciones para:
 - Extracción de animales con IA
 - Clasificación semántica
 - Análisis de fluidez verbal
+- Cliente HTTP para Ollama
+- Caché persistente de respuestas de la IA
 """
 
 from .extraer_animales_con_ai import extraer_animales_con_ai
+from .cliente_ollama import ClienteOllama, obtener_cliente
+from .cache_llm import CacheLLM, obtener_cache_llm
 
 __all__ = [
-    'extraer_animales_con_ai'
+    'extraer_animales_con_ai',
+    'ClienteOllama',
+    'obtener_cliente',
+    'CacheLLM',
+    'obtener_cache_llm'
 ] 
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Caché persistente de respuestas de la IA.
+
+Guarda en SQLite la respuesta de cada petición a /api/chat, indexada por un
+hash del modelo, la versión de los prompts, las opciones de generación y los
+mensajes enviados. Volver a analizar una cohorte sin cambios en las
+transcripciones (por ejemplo tras modificar las gráficas) no hace ninguna
+llamada a Ollama. Las entradas menos usadas recientemente se eliminan al
+superar el tamaño máximo.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import AI_CONFIG, CACHE_LLM_PATH
+
+class CacheLLM:
+    def __init__(self, ruta=None, max_entradas=None):
+        self.ruta = str(ruta or CACHE_LLM_PATH)
+        self.max_entradas = max_entradas or AI_CONFIG["llm_cache_max_entries"]
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+        self._conexion = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                "clave TEXT PRIMARY KEY, modelo TEXT, respuesta TEXT, creado REAL, usado REAL)"
+            )
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_usado ON respuestas (usado)")
+
+    @staticmethod
+    def clave(cuerpo, version=None):
+        """Hash de la petición completa (modelo, mensajes, opciones y formato) y la versión de los prompts."""
+        version = AI_CONFIG["prompt_version"] if version is None else version
+        contenido = json.dumps({"version": version, "peticion": cuerpo}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def obtener(self, clave):
+        """Devuelve la respuesta guardada o None."""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT respuesta FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+            with self._conexion:
+                self._conexion.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (time.time(), clave))
+            self.aciertos += 1
+            return fila[0]
+
+    def guardar(self, clave, modelo, respuesta):
+        """Guarda una respuesta y elimina las menos usadas si se supera el máximo."""
+        ahora = time.time()
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?)",
+                (clave, modelo, respuesta, ahora, ahora)
+            )
+            sobrantes = self._conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0] - self.max_entradas
+            if sobrantes > 0:
+                self._conexion.execute(
+                    "DELETE FROM respuestas WHERE clave IN "
+                    "(SELECT clave FROM respuestas ORDER BY usado ASC LIMIT ?)",
+                    (sobrantes,)
+                )
+
+    def eliminar(self, clave):
+        """Descarta una respuesta guardada (p. ej. porque ya no pasa la validación)."""
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+
+    def estadisticas(self):
+        """Aciertos y fallos de este proceso y número de entradas guardadas."""
+        with self._lock:
+            entradas = self._conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": entradas}
+
+    def limpiar(self):
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM respuestas")
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+_cache_compartida = None
+_cache_lock = threading.Lock()
+
+def obtener_cache_llm():
+    """Devuelve la caché compartida por el proceso, o None si está desactivada en `AI_CONFIG`."""
+    global _cache_compartida
+    if not AI_CONFIG["llm_cache"]:
+        return None
+    with _cache_lock:
+        if _cache_compartida is None:
+            _cache_compartida = CacheLLM()
+        return _cache_compartida
@@ -0,0 +1,90 @@
+"""
+Diccionario persistente animal -> categoría semántica.
+
+Los grupos semánticos se construyen localmente: cada animal se busca primero
+en el diccionario aprendido (CATEGORIAS_ANIMALES_PATH) y después en el léxico
+local. Solo los animales nunca vistos se envían a la IA, en una sola
+petición, y su categoría queda guardada para el resto de la cohorte.
+"""
+
+import json
+import os
+import threading
+
+from config import CATEGORIAS_ANIMALES_PATH
+from src.utils.normalizacion_de_texto import normalizar
+from .lexico_animales import buscar_en_lexico, indice_lexico
+
+_lock = threading.Lock()
+
+def cargar_categorias(ruta=None):
+    """Carga el diccionario aprendido {palabra normalizada: categoría}."""
+    ruta = str(ruta or CATEGORIAS_ANIMALES_PATH)
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+def registrar_categorias(nuevas, ruta=None):
+    """Añade categorías aprendidas al diccionario en disco (escritura atómica)."""
+    ruta = str(ruta or CATEGORIAS_ANIMALES_PATH)
+    with _lock:
+        categorias = cargar_categorias(ruta)
+        categorias.update({normalizar(palabra): categoria for palabra, categoria in nuevas.items()})
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(categorias, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(temporal, ruta)
+    return categorias
+
+def categorias_conocidas(categorias=None):
+    """Nombres de categoría existentes, para que la IA reutilice los mismos."""
+    categorias = cargar_categorias() if categorias is None else categorias
+    nombres = {categoria for _, categoria in indice_lexico().values()}
+    nombres.update(categorias.values())
+    return sorted(nombres)
+
+def buscar_categoria(palabra, categorias):
+    """Categoría de una palabra según el diccionario aprendido o el léxico, o None."""
+    clave = normalizar(palabra)
+    if clave in categorias:
+        return categorias[clave]
+    encontrada = buscar_en_lexico(clave)
+    if encontrada:
+        return indice_lexico()[encontrada][1]
+    return None
+
+def resolver_categorias(palabras, ruta=None):
+    """
+    Busca la categoría de cada palabra.
+
+    Returns:
+        (asignadas, desconocidas): `asignadas` es {palabra: categoría} para las
+        palabras resueltas y `desconocidas` la lista (sin repetir) de las que
+        hay que preguntar a la IA.
+    """
+    categorias = cargar_categorias(ruta)
+    asignadas = {}
+    desconocidas = []
+    for palabra in palabras:
+        if palabra in asignadas or palabra in desconocidas:
+            continue
+        categoria = buscar_categoria(palabra, categorias)
+        if categoria:
+            asignadas[palabra] = categoria
+        else:
+            desconocidas.append(palabra)
+    return asignadas, desconocidas
+
+def construir_grupos(palabras, asignadas):
+    """Arma grupos_semanticos.json ({categoría: [palabras]}) en el orden de aparición."""
+    grupos = {}
+    for palabra in palabras:
+        categoria = asignadas.get(palabra, "otros")
+        if palabra not in grupos.setdefault(categoria, []):
+            grupos[categoria].append(palabra)
+    return grupos
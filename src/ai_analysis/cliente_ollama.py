@@ -0,0 +1,177 @@
+"""
+Cliente HTTP para la API de Ollama.
+
+Todas las llamadas del proyecto comparten una sola sesión de `requests` con
+un pool de conexiones persistentes, un límite de peticiones simultáneas y
+reintentos con espera exponencial ante errores transitorios (conexión
+rechazada, timeouts, 429/5xx). Las llamadas a /api/chat no guardan estado
+entre peticiones, así que no hace falta "reiniciar" el modelo.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import AI_CONFIG
+from .cache_llm import obtener_cache_llm
+
+ESTADOS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+class ErrorOllama(RuntimeError):
+    """Error definitivo al comunicarse con Ollama (tras agotar los reintentos)."""
+
+def opciones_por_defecto():
+    """Opciones de generación de `AI_CONFIG` en el formato de la API de Ollama."""
+    return {
+        "temperature": AI_CONFIG["temperature"],
+        "num_predict": AI_CONFIG["max_tokens"]
+    }
+
+class ClienteOllama:
+    def __init__(self, url=None, concurrencia=None, reintentos=None, espera_inicial=None, timeout=None, cache=None):
+        self.url = (url or AI_CONFIG["ollama_url"]).rstrip("/")
+        self.concurrencia = concurrencia or AI_CONFIG["max_concurrency"]
+        self.reintentos = AI_CONFIG["max_retries"] if reintentos is None else reintentos
+        self.espera_inicial = AI_CONFIG["retry_backoff"] if espera_inicial is None else espera_inicial
+        self.timeout = timeout or AI_CONFIG["request_timeout"]
+        self.cache = cache
+
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrencia)
+        self.sesion.mount("http://", adaptador)
+        self.sesion.mount("https://", adaptador)
+
+        self._semaforo = threading.BoundedSemaphore(self.concurrencia)
+        self._ejecutor = None
+        self._lock = threading.Lock()
+
+    def disponible(self):
+        """Verifica si el servidor de Ollama responde."""
+        try:
+            r = self.sesion.get(self.url, timeout=5)
+            return r.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def _post(self, ruta, cuerpo):
+        for intento in range(self.reintentos + 1):
+            ultimo = intento == self.reintentos
+            # El turno de concurrencia solo se ocupa durante la petición, no durante la espera
+            with self._semaforo:
+                try:
+                    r = self.sesion.post(f"{self.url}{ruta}", json=cuerpo, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if ultimo:
+                        raise ErrorOllama(f"No se pudo contactar a Ollama: {e}") from e
+                else:
+                    if r.status_code not in ESTADOS_TRANSITORIOS:
+                        if r.status_code != 200:
+                            raise ErrorOllama(f"Ollama respondió {r.status_code}: {r.text[:200]}")
+                        try:
+                            return r.json()
+                        except ValueError as e:
+                            # Cuerpo truncado o que no es JSON: se trata como error transitorio
+                            if ultimo:
+                                raise ErrorOllama(f"Ollama devolvió una respuesta que no es JSON: {r.text[:200]}") from e
+                    elif ultimo:
+                        raise ErrorOllama(f"Ollama respondió {r.status_code} tras {intento + 1} intentos")
+            espera = self.espera_inicial * (2 ** intento)
+            print(f"🔁 Reintentando petición a Ollama en {espera:.1f} s ({intento + 1}/{self.reintentos})...")
+            time.sleep(espera)
+
+    @staticmethod
+    def _es_valida(validar, contenido):
+        try:
+            return bool(validar(contenido))
+        except Exception:
+            return False
+
+    def chat(self, model, messages, options=None, validar=None, **extra):
+        """
+        Llamada a /api/chat sin streaming. Devuelve el texto de la respuesta.
+
+        Si el cliente tiene caché, una petición idéntica ya respondida no llega
+        a Ollama. Solo se guardan en caché las respuestas que pasan `validar`
+        (función que recibe el texto y devuelve si es utilizable); sin
+        validador la respuesta no se guarda. Una respuesta guardada que deja de
+        pasar la validación se elimina y se vuelve a pedir.
+        """
+        cuerpo = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "options": opciones_por_defecto() if options is None else options,
+            **extra
+        }
+        if self.cache is not None:
+            clave = self.cache.clave(cuerpo)
+            guardada = self.cache.obtener(clave)
+            if guardada is not None:
+                if validar is None or self._es_valida(validar, guardada):
+                    return guardada
+                self.cache.eliminar(clave)
+
+        respuesta = self._post("/api/chat", cuerpo)
+        try:
+            contenido = respuesta["message"]["content"]
+        except (KeyError, TypeError) as e:
+            raise ErrorOllama(f"Respuesta de Ollama sin mensaje: {str(respuesta)[:200]}") from e
+        if self.cache is not None and validar is not None and self._es_valida(validar, contenido):
+            self.cache.guardar(clave, model, contenido)
+        return contenido
+
+    def _obtener_ejecutor(self):
+        with self._lock:
+            if self._ejecutor is None:
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.concurrencia, thread_name_prefix="ollama")
+            return self._ejecutor
+
+    def chat_concurrente(self, peticiones, devolver_errores=False):
+        """
+        Envía varias peticiones de chat a la vez (hasta `concurrencia` en vuelo).
+
+        `peticiones` es una lista de diccionarios con los argumentos de `chat`.
+        Devuelve las respuestas en el mismo orden. Con `devolver_errores`, una
+        petición que falla con `ErrorOllama` deja la excepción en su posición
+        en lugar de interrumpir las demás.
+        """
+        ejecutor = self._obtener_ejecutor()
+        futuros = [ejecutor.submit(self.chat, **peticion) for peticion in peticiones]
+        respuestas = []
+        for futuro in futuros:
+            try:
+                respuestas.append(futuro.result())
+            except ErrorOllama as e:
+                if not devolver_errores:
+                    raise
+                respuestas.append(e)
+        return respuestas
+
+    async def achat(self, model, messages, options=None, validar=None, **extra):
+        """Versión asíncrona de `chat` (con la misma validación antes de guardar en caché) para usar desde asyncio."""
+        loop = asyncio.get_running_loop()
+        llamada = functools.partial(self.chat, model, messages, options, validar=validar, **extra)
+        return await loop.run_in_executor(self._obtener_ejecutor(), llamada)
+
+    def cerrar(self):
+        with self._lock:
+            if self._ejecutor is not None:
+                self._ejecutor.shutdown(wait=False)
+                self._ejecutor = None
+        self.sesion.close()
+
+_cliente_compartido = None
+_cliente_lock = threading.Lock()
+
+def obtener_cliente():
+    """Devuelve el cliente de Ollama compartido por todo el proceso."""
+    global _cliente_compartido
+    with _cliente_lock:
+        if _cliente_compartido is None:
+            _cliente_compartido = ClienteOllama(cache=obtener_cache_llm())
+        return _cliente_compartido
@@ -1,16 +1,46 @@
+import functools
 import json
 import os
-import ollama
-import requests
 import re
+from config import AI_CONFIG
+from .cliente_ollama import ErrorOllama, obtener_cliente
+from .lexico_animales import clasificar_palabras
+from .categorias_semanticas import categorias_conocidas, construir_grupos, registrar_categorias, resolver_categorias
+from src.utils.correccion_de_lista_animales import alinear_tiempos
+from src.utils.normalizacion_de_texto import normalizar
+from src.utils.linea_de_tiempo import CAMPOS_ANIMALES, cargar_registros, guardar_linea_de_tiempo
+
+# Esquemas para la salida estructurada de Ollama (parámetro `format`)
+ESQUEMA_LISTA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "word": {"type": "string"},
+            "start": {"type": "number"},
+            "posible": {"type": "boolean"}
+        },
+        "required": ["word", "start", "posible"]
+    }
+}
+ESQUEMA_LISTA_COMPACTA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"i": {"type": "integer"}, "posible": {"type": "boolean"}},
+        "required": ["i", "posible"]
+    }
+}
+ESQUEMA_CATEGORIAS = {"type": "object", "additionalProperties": {"type": "string"}}
+
+MENSAJE_CORRECCION = (
+    "Tu respuesta anterior no es JSON válido con el formato pedido. "
+    "Responde de nuevo solo con el JSON, sin texto adicional."
+)
 
 def verificar_ollama():
     """Verifica si el servidor local de Ollama está activo."""
-    try:
-        r = requests.get("http://localhost:11434")
-        return r.status_code == 200
-    except Exception:
-        return False
+    return obtener_cliente().disponible()
 
 def limpiar_posible_json(texto):
     """Limpia el texto crudo recibido para intentar extraer un bloque JSON válido."""
@@ -22,25 +52,113 @@ def limpiar_posible_json(texto):
         return texto[start:end]
     return texto.strip()
 
-def extraer_animales_con_ai(path_json="palabras_con_tiempos.json", model="llama3:8b", salida="salida", output_dir="."):
+def formato_estructurado(esquema):
+    """Argumentos extra de `chat` para pedir a Ollama una salida JSON restringida al esquema."""
+    return {"format": esquema} if AI_CONFIG["structured_output"] else {}
+
+def interpretar_con_reintentos(cliente, model, mensajes, raw_content, interpretar, esquema, etiqueta):
     """
-    Extrae animales explícitos y posibles menciones erróneas desde un texto plano generado a partir de palabras con tiempo.
-    El modelo de IA no tiene memoria previa gracias a un reset explícito.
+    Interpreta una respuesta y, si no es válida, pide al modelo que la corrija
+    (hasta `json_retries` veces) en la misma conversación.
+    Devuelve (respuesta cruda final, resultado o None).
     """
-    output_dir = os.path.abspath(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
+    reintentos = AI_CONFIG["json_retries"]
+    for intento in range(reintentos + 1):
+        try:
+            resultado = interpretar(raw_content)
+        except json.JSONDecodeError:
+            resultado = None
+        if resultado is not None or intento == reintentos:
+            return raw_content, resultado
+        print(f"🔁 {etiqueta}: respuesta no válida, pidiendo corrección ({intento + 1}/{reintentos})")
+        raw_content = cliente.chat(
+            model=model,
+            messages=mensajes + [
+                {'role': 'assistant', 'content': raw_content},
+                {'role': 'user', 'content': MENSAJE_CORRECCION}
+            ],
+            validar=validador(interpretar),
+            **formato_estructurado(esquema)
+        )
 
-    if not verificar_ollama():
-        print("❌ Ollama no está corriendo. Ejecuta `ollama serve` o abre la app.")
-        return
+def validador(interpretar):
+    """Función para `ClienteOllama.chat(validar=...)`: solo se guardan en caché las respuestas interpretables."""
+    return lambda raw_content: interpretar(raw_content) is not None
 
-    try:
-        with open(path_json, 'r', encoding='utf-8') as f:
-            palabras = json.load(f)
-    except FileNotFoundError as e:
-        print(f"❌ Archivo no encontrado: {e.filename}")
-        return
+def dividir_en_ventanas(palabras, duracion=None, solape=None):
+    """
+    Divide la secuencia de palabras en ventanas de tiempo solapadas.
+    Cada ventana cubre `duracion` segundos y comparte `solape` segundos con la siguiente.
+    Lanza ValueError si `duracion` no es positiva o si `solape` no es menor que `duracion`.
+    """
+    duracion = AI_CONFIG["window_seconds"] if duracion is None else duracion
+    solape = AI_CONFIG["window_overlap"] if solape is None else solape
+    if duracion <= 0:
+        raise ValueError(f"La duración de las ventanas debe ser positiva (window_seconds={duracion})")
+    if not 0 <= solape < duracion:
+        raise ValueError(
+            f"El solape debe estar entre 0 y la duración de la ventana (window_overlap={solape}, window_seconds={duracion})"
+        )
+    palabras = sorted(palabras, key=lambda p: float(p["start"]))
+    if not palabras:
+        return []
+
+    paso = duracion - solape
+    ventanas = []
+    inicio_idx = 0
+    t_inicio = float(palabras[0]["start"])
+    while inicio_idx < len(palabras):
+        fin_idx = inicio_idx
+        while fin_idx < len(palabras) and float(palabras[fin_idx]["start"]) < t_inicio + duracion:
+            fin_idx += 1
+        if fin_idx > inicio_idx:
+            ventanas.append(palabras[inicio_idx:fin_idx])
+        if fin_idx >= len(palabras):
+            break
+        t_inicio += paso
+        while float(palabras[inicio_idx]["start"]) < t_inicio:
+            inicio_idx += 1
+        # Saltar huecos largos sin palabras
+        t_inicio = max(t_inicio, float(palabras[inicio_idx]["start"]))
+    return ventanas
+
+def fusionar_detecciones(listas):
+    """Une las detecciones de cada ventana eliminando duplicados (palabra, start) del solape."""
+    vistos = {}
+    for detecciones in listas:
+        for d in detecciones:
+            clave = (normalizar(d["word"]), round(d["start"], 2))
+            if clave not in vistos:
+                vistos[clave] = d
+            elif d["posible"] is False:
+                vistos[clave]["posible"] = False
+    return sorted(vistos.values(), key=lambda d: d["start"])
+
+def construir_prompt_compacto(palabras):
+    """
+    Prompt de detección con las palabras numeradas (`0:perro 1:gato ...`).
+    El modelo responde solo con índices y los tiempos se recuperan localmente.
+    """
+    texto_indexado = " ".join(f"{i}:{p['word'].strip()}" for i, p in enumerate(palabras))
+    return f"""
+    Tienes una lista numerada de palabras de una transcripción de audio, en formato índice:palabra.
+    Marca las palabras que son nombres de **animales reales** y las que **podrían ser animales mal pronunciados o mal escritos** (por ejemplo "berrego" en lugar de "borrego").
+
+    Devuelve solo una lista JSON con un objeto por animal:
+    - "i": el índice de la palabra
+    - "posible": true si es una mención dudosa o errónea, false si es clara
+
+    No inventes palabras, no corrijas nada, incluye las repeticiones y no escribas nada fuera del JSON.
 
+    Ejemplo de salida:
+    [{{"i": 0, "posible": false}}, {{"i": 7, "posible": true}}]
+
+    Palabras:
+    {texto_indexado}
+    """
+
+def construir_prompt_lista(palabras):
+    """Prompt de detección de animales para una lista de palabras con tiempo."""
     texto_completo = "\n".join(f"[start: {p['start']}] {p['word']}" for p in palabras)
 
     prompt_lista = f"""
@@ -76,85 +194,246 @@ def extraer_animales_con_ai(path_json="palabras_con_tiempos.json", model="llama3
     Texto (palabras transcritas):
     {texto_completo}
     """
+    return prompt_lista
 
+def interpretar_respuesta_lista(raw_content, palabras=None):
+    """
+    Convierte la respuesta del modelo en detecciones. Devuelve None si no es una lista JSON.
+    Si se pasan las `palabras` de la ventana, la respuesta se interpreta en formato
+    compacto (índices) y la palabra y su tiempo se toman de la lista original.
+    """
     try:
-        ollama.chat(model=model, messages=[{'role': 'system', 'content': 'reset'}])
+        data_animales = json.loads(raw_content)
+    except json.JSONDecodeError:
+        print("⚠️ JSON no válido. Intentando limpiar...")
+        data_animales = json.loads(limpiar_posible_json(raw_content))
 
-        response_lista = ollama.chat(
-            model=model,
-            messages=[{'role': 'user', 'content': prompt_lista}]
-        )
-        raw_content = response_lista['message']['content']
-        print("\n🔍 Respuesta cruda de la IA (raw_content):\n", raw_content)
+    if not isinstance(data_animales, list):
+        return None
 
-        with open(os.path.join(output_dir, f"respuesta_raw_lista_{salida}.txt"), 'w', encoding='utf-8') as f:
-            f.write(raw_content)
-
-        try:
-            data_animales = json.loads(raw_content)
-        except json.JSONDecodeError:
-            print("⚠️ JSON no válido. Intentando limpiar...")
-            data_animales = json.loads(limpiar_posible_json(raw_content))
-
-        if not isinstance(data_animales, list):
-            print("⚠️ El contenido devuelto no es una lista válida.")
-            return
-
-        detectados = []
+    detectados = []
+    data_animales = [item for item in data_animales if isinstance(item, (dict, int))]
+    if palabras is not None:
         for item in data_animales:
-            if "word" in item and "start" in item:
+            indice = item.get("i") if isinstance(item, dict) else item
+            if isinstance(indice, int) and 0 <= indice < len(palabras):
                 detectados.append({
-                    "word": item["word"],
-                    "start": float(item["start"]),
-                    "posible": bool(item.get("posible", False))
+                    "word": palabras[indice]["word"].strip(),
+                    "start": float(palabras[indice]["start"]),
+                    "posible": bool(item.get("posible", False)) if isinstance(item, dict) else False
                 })
+        return detectados
+
+    for item in data_animales:
+        if isinstance(item, dict) and "word" in item and "start" in item:
+            detectados.append({
+                "word": item["word"],
+                "start": float(item["start"]),
+                "posible": bool(item.get("posible", False))
+            })
+    return detectados
+
+def detectar_animales_con_llm(cliente, palabras, model, salida, output_dir):
+    """
+    Pide al modelo que marque los animales (claros y posibles) de la lista de palabras.
+    Las palabras se envían en ventanas de tiempo solapadas y en paralelo; las
+    detecciones se unen al final. Una ventana cuya petición falla se omite sin
+    perder las demás. Devuelve None si ninguna ventana dio una lista JSON.
+    """
+    ventanas = dividir_en_ventanas(palabras)
+    compacto = AI_CONFIG["prompt_encoding"] == "compact"
+    construir = construir_prompt_compacto if compacto else construir_prompt_lista
+    esquema = ESQUEMA_LISTA_COMPACTA if compacto else ESQUEMA_LISTA
+    conversaciones = [[{'role': 'user', 'content': construir(ventana)}] for ventana in ventanas]
+    interpretes = [
+        functools.partial(interpretar_respuesta_lista, palabras=ventana if compacto else None)
+        for ventana in ventanas
+    ]
+    print(f"🪟 Enviando {len(ventanas)} ventana(s) a la IA")
+    respuestas = cliente.chat_concurrente([
+        {"model": model, "messages": mensajes, "validar": validador(interpretar), **formato_estructurado(esquema)}
+        for mensajes, interpretar in zip(conversaciones, interpretes)
+    ], devolver_errores=True)
+
+    por_ventana = []
+    for i in range(len(ventanas)):
+        try:
+            if isinstance(respuestas[i], ErrorOllama):
+                raise respuestas[i]
+            respuestas[i], detectados = interpretar_con_reintentos(
+                cliente, model, conversaciones[i], respuestas[i], interpretes[i],
+                esquema, f"Ventana {i + 1}/{len(ventanas)}"
+            )
+        except ErrorOllama as e:
+            print(f"❌ La ventana {i + 1} falló y se omite: {e}")
+            respuestas[i] = f"[error] {e}"
+            continue
+        if detectados is None:
+            print(f"⚠️ La ventana {i + 1} no devolvió una lista válida.")
+            continue
+        por_ventana.append(detectados)
+
+    # La respuesta cruda solo se guarda en disco para revisión
+    with open(os.path.join(output_dir, f"respuesta_raw_lista_{salida}.txt"), 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(respuestas))
+
+    if not por_ventana:
+        print("⚠️ El contenido devuelto no es una lista válida.")
+        return None
+    detectados = fusionar_detecciones(por_ventana)
+    if not compacto:
+        # En formato verboso la IA copia palabra y tiempo: se ajustan a la transcripción
+        detectados = alinear_tiempos(palabras, detectados)
+    return detectados
+
+def agrupar_con_llm(cliente, palabras_animales, model):
+    """Pide a la IA que agrupe en categorías semánticas la lista completa de animales."""
+    prompt_grupos = f"""
+    A continuación se presenta una lista de nombres de animales. Agrúpalos en categorías semánticas lógicas (por ejemplo: animales domésticos, salvajes, marinos, aves, insectos, etc.)
+
+    Devuelve solo un JSON con la siguiente estructura:
+
+    {{
+      "domésticos": ["perro", "gato"],
+      "aves": ["colibrí", "loro"],
+      "salvajes": ["león", "tigre"]
+    }}
+
+    No incluyas explicaciones ni texto adicional. Solo el JSON. 
+
+    Recuerda que si agregas un grupo semantico, debe tener como mínimo 1 animal por grupo semántico.
+
+    Lista:
+    {json.dumps(palabras_animales, ensure_ascii=False)}
+    """
 
-        print(f"🧮 Total de animales detectados: {len(detectados)}")
-        if not detectados:
-            print("⚠️ No se detectaron animales.")
+    raw_grupos = cliente.chat(
+        model=model,
+        messages=[{'role': 'user', 'content': prompt_grupos}],
+        validar=validador(_interpretar_categorias)
+    )
 
-        resultado_path = os.path.join(output_dir, "lista_animales.json")
-        with open(resultado_path, "w", encoding="utf-8") as f:
-            json.dump(detectados, f, indent=2, ensure_ascii=False)
-        print(f"✅ Archivo guardado: {resultado_path}")
+    try:
+        grupos = json.loads(raw_grupos)
+    except json.JSONDecodeError:
+        grupos = json.loads(limpiar_posible_json(raw_grupos))
+    return grupos
 
-        # Nuevo prompt para grupos semánticos
-        palabras_animales = [d["word"] for d in detectados]
-        prompt_grupos = f"""
-        A continuación se presenta una lista de nombres de animales. Agrúpalos en categorías semánticas lógicas (por ejemplo: animales domésticos, salvajes, marinos, aves, insectos, etc.)
+def extraer_objeto_json(texto):
+    """Interpreta una respuesta que debería ser un objeto JSON, quitando texto alrededor."""
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError:
+        start = texto.find("{")
+        end = texto.rfind("}") + 1
+        return json.loads(texto[start:end] if start >= 0 and end > start else texto)
 
-        Devuelve solo un JSON con la siguiente estructura:
+def _interpretar_categorias(raw_content):
+    categorias = extraer_objeto_json(raw_content)
+    return categorias if isinstance(categorias, dict) else None
 
-        {{
-          "domésticos": ["perro", "gato"],
-          "aves": ["colibrí", "loro"],
-          "salvajes": ["león", "tigre"]
-        }}
+def agrupar_con_diccionario(cliente, palabras_animales, model):
+    """
+    Agrupa los animales con el diccionario persistente de categorías. Solo los
+    animales nunca vistos se envían a la IA (en una sola petición) y su
+    categoría se guarda para los siguientes archivos.
+    """
+    asignadas, desconocidas = resolver_categorias(palabras_animales)
+    print(f"📚 Categorías: {len(asignadas)} conocidas, {len(desconocidas)} nuevas")
 
-        No incluyas explicaciones ni texto adicional. Solo el JSON. 
+    if desconocidas:
+        prompt_categorias = f"""
+        Asigna a cada nombre de animal de la lista una categoría semántica.
+        Usa preferentemente una de estas categorías: {", ".join(categorias_conocidas())}.
+        Solo crea una categoría nueva si ninguna encaja.
 
-        Recuerda que si agregas un grupo semantico, debe tener como mínimo 1 animal por grupo semántico.
+        Devuelve solo un objeto JSON de la forma {{"palabra": "categoría"}}, con las palabras tal cual aparecen en la lista.
+        No incluyas explicaciones ni texto adicional.
 
         Lista:
-        {json.dumps(palabras_animales, ensure_ascii=False)}
+        {json.dumps(desconocidas, ensure_ascii=False)}
         """
+        mensajes = [{'role': 'user', 'content': prompt_categorias}]
+        raw_categorias = cliente.chat(
+            model=model, messages=mensajes, validar=validador(_interpretar_categorias),
+            **formato_estructurado(ESQUEMA_CATEGORIAS)
+        )
+        _, nuevas = interpretar_con_reintentos(
+            cliente, model, mensajes, raw_categorias, _interpretar_categorias, ESQUEMA_CATEGORIAS, "Categorías"
+        )
+        if nuevas:
+            por_clave = {normalizar(p): p for p in desconocidas}
+            nuevas = {
+                por_clave[normalizar(p)]: str(c).strip().lower()
+                for p, c in nuevas.items() if normalizar(p) in por_clave and str(c).strip()
+            }
+            registrar_categorias(nuevas)
+            asignadas.update(nuevas)
 
-        response_grupos = ollama.chat(
-            model=model,
-            messages=[{'role': 'user', 'content': prompt_grupos}]
+    return construir_grupos(palabras_animales, asignadas)
+
+def extraer_animales_con_ai(path_json="palabras_con_tiempos.json", model="llama3:8b", salida="salida", output_dir="."):
+    """
+    Extrae animales explícitos y posibles menciones erróneas desde un texto plano generado a partir de palabras con tiempo.
+    Cada llamada a /api/chat es independiente, por lo que el modelo no arrastra memoria entre archivos.
+    """
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not verificar_ollama():
+        print("❌ Ollama no está corriendo. Ejecuta `ollama serve` o abre la app.")
+        return
+
+    try:
+        palabras = cargar_registros(path_json)
+    except FileNotFoundError as e:
+        print(f"❌ Archivo no encontrado: {e.filename}")
+        return
+
+    cliente = obtener_cliente()
+
+    try:
+        if AI_CONFIG["lexicon_fast_path"]:
+            detectados, candidatas = clasificar_palabras(
+                palabras,
+                umbral=AI_CONFIG["lexicon_fuzzy_cutoff"],
+                escalar_desconocidas=AI_CONFIG["lexicon_escalate_unknown"]
+            )
+            print(f"📖 Léxico: {len(detectados)} animales claros, {len(candidatas)} palabras para revisar con IA")
+        else:
+            detectados, candidatas = [], palabras
+
+        if candidatas:
+            detectados_llm = detectar_animales_con_llm(cliente, candidatas, model, salida, output_dir)
+            if detectados_llm is None:
+                return
+            detectados.extend(detectados_llm)
+        detectados.sort(key=lambda d: d["start"])
+
+        print(f"🧮 Total de animales detectados: {len(detectados)}")
+        if not detectados:
+            print("⚠️ No se detectaron animales.")
+
+        resultado_path = guardar_linea_de_tiempo(
+            os.path.join(output_dir, "lista_animales"), detectados, campos_json=CAMPOS_ANIMALES
         )
-        raw_grupos = response_grupos['message']['content']
+        print(f"✅ Archivo guardado: {resultado_path}")
 
-        try:
-            grupos = json.loads(raw_grupos)
-        except json.JSONDecodeError:
-            grupos = json.loads(limpiar_posible_json(raw_grupos))
+        palabras_animales = [d["word"] for d in detectados]
+        if AI_CONFIG["category_memory"]:
+            grupos = agrupar_con_diccionario(cliente, palabras_animales, model)
+        else:
+            grupos = agrupar_con_llm(cliente, palabras_animales, model)
 
         grupos_path = os.path.join(output_dir, "grupos_semanticos.json")
         with open(grupos_path, "w", encoding="utf-8") as f:
             json.dump(grupos, f, indent=2, ensure_ascii=False)
         print(f"✅ Grupos semánticos guardados en: {grupos_path}")
 
+        if cliente.cache is not None:
+            stats = cliente.cache.estadisticas()
+            print(f"💾 Caché de IA: {stats['aciertos']} aciertos, {stats['fallos']} fallos, {stats['entradas']} entradas")
+
     except Exception as e:
         print(f"⚠️ Error al interactuar con Ollama: {e}")
 
@@ -0,0 +1,209 @@
+"""
+Léxico local de animales en español.
+
+Detecta de forma determinista las menciones claras de animales en la
+transcripción (incluyendo plurales, diminutivos y variantes sin tildes) para
+que al modelo de lenguaje solo le lleguen las palabras que el léxico no puede
+resolver: posibles errores de pronunciación ("berrego") y palabras
+desconocidas que no son muletillas ni palabras funcionales.
+"""
+
+import difflib
+from functools import lru_cache
+
+from src.utils.normalizacion_de_texto import normalizar, normalizar_lote
+
+# Animales por categoría semántica (forma canónica, con tildes)
+LEXICO_ANIMALES = {
+    "domésticos": [
+        "perro", "perra", "gato", "gata", "hámster", "conejo", "coneja", "cuyo", "cobayo",
+        "huron", "hurón", "canario", "periquito", "pez", "tortuga", "chihuahua", "poodle"
+    ],
+    "granja": [
+        "vaca", "toro", "buey", "becerro", "becerra", "ternero", "ternera", "res", "caballo",
+        "yegua", "potro", "potra", "burro", "burra", "asno", "mula", "macho", "cerdo", "cerda",
+        "puerco", "puerca", "cochino", "marrano", "chancho", "oveja", "borrego", "borrega",
+        "carnero", "cordero", "chivo", "chiva", "cabra", "gallina", "gallo", "pollo", "pollito",
+        "pato", "pata", "ganso", "guajolote", "pavo", "codorniz", "llama", "alpaca", "pony", "poni"
+    ],
+    "salvajes": [
+        "león", "leona", "tigre", "tigresa", "leopardo", "jaguar", "pantera", "puma", "guepardo",
+        "chita", "lince", "ocelote", "gato montés", "lobo", "loba", "coyote", "zorro", "zorra",
+        "chacal", "hiena", "oso", "osa", "panda", "mapache", "tejón", "tlacuache", "zarigüeya",
+        "zorrillo", "mofeta", "armadillo", "puercoespín", "erizo", "ardilla", "castor", "nutria",
+        "ratón", "rata", "topo", "liebre", "venado", "ciervo", "alce", "reno", "gacela", "antílope",
+        "jirafa", "cebra", "elefante", "rinoceronte", "hipopótamo", "camello", "dromedario",
+        "bisonte", "búfalo", "jabalí", "mono", "chango", "gorila", "chimpancé", "orangután",
+        "mandril", "babuino", "lémur", "canguro", "koala", "perezoso", "oso hormiguero",
+        "hormiguero", "murciélago", "tapir", "suricata", "comadreja", "marta", "capibara",
+        "chinchilla", "ñu", "okapi", "yak", "llama"
+    ],
+    "aves": [
+        "ave", "pájaro", "pajarito", "águila", "halcón", "búho", "lechuza", "tecolote", "cuervo",
+        "zopilote", "buitre", "cóndor", "paloma", "tórtola", "gorrión", "golondrina", "colibrí",
+        "chuparrosa", "loro", "perico", "cotorra", "guacamaya", "tucán", "pelícano", "gaviota",
+        "flamenco", "cigüeña", "garza", "grulla", "avestruz", "emú", "pavo real", "pavorreal",
+        "pingüino", "cisne", "carpintero", "pájaro carpintero", "quetzal", "faisán", "urraca",
+        "canario", "jilguero", "cenzontle", "correcaminos", "kiwi", "albatros", "petirrojo"
+    ],
+    "marinos": [
+        "pez", "pescado", "tiburón", "ballena", "delfín", "orca", "foca", "morsa", "lobo marino",
+        "león marino", "pulpo", "calamar", "medusa", "aguamala", "estrella de mar", "erizo de mar",
+        "caballito de mar", "cangrejo", "jaiba", "langosta", "camarón", "langostino", "almeja",
+        "ostión", "ostra", "mejillón", "caracol", "mantarraya", "raya", "anguila", "atún",
+        "salmón", "trucha", "sardina", "bagre", "mojarra", "huachinango", "pez espada", "piraña",
+        "manatí", "nutria", "coral", "esponja", "narval", "beluga", "morena", "barracuda"
+    ],
+    "reptiles y anfibios": [
+        "serpiente", "víbora", "culebra", "cobra", "boa", "pitón", "anaconda", "cascabel",
+        "lagarto", "lagartija", "iguana", "camaleón", "cocodrilo", "caimán", "tortuga", "galápago",
+        "gecko", "geco", "dragón de komodo", "rana", "sapo", "ajolote", "salamandra", "tritón"
+    ],
+    "insectos": [
+        "insecto", "hormiga", "abeja", "avispa", "abejorro", "mosca", "mosquito", "zancudo",
+        "mariposa", "polilla", "palomilla", "escarabajo", "catarina", "mariquita", "grillo",
+        "chapulín", "saltamontes", "langosta", "cucaracha", "libélula", "luciérnaga", "pulga",
+        "piojo", "chinche", "termita", "mantis", "cigarra", "chicharra", "gusano", "lombriz",
+        "oruga", "araña", "tarántula", "alacrán", "escorpión", "garrapata", "ciempiés",
+        "milpiés", "babosa", "caracol"
+    ]
+}
+
+# Palabras frecuentes en la tarea de fluidez que nunca son animales
+PALABRAS_FUNCIONALES = {
+    "el", "la", "los", "las", "lo", "un", "una", "unos", "unas", "y", "e", "o", "u", "ni",
+    "que", "de", "del", "a", "al", "en", "con", "sin", "por", "para", "pero", "mas", "muy",
+    "se", "me", "te", "le", "les", "nos", "mi", "mis", "tu", "tus", "su", "sus", "yo",
+    "ella", "ellos", "usted", "es", "son", "era", "fue", "hay", "ha", "he", "esta", "estan",
+    "este", "esto", "estos", "eso", "ese", "esa", "aqui", "ahi", "alla", "ya", "no", "si",
+    "tambien", "bueno", "pues", "entonces", "como", "cual", "cuales", "otro", "otra", "otros",
+    "otras", "menos", "todo", "todos", "nada", "algo", "asi", "eh", "em", "mm", "mmm", "hmm",
+    "ah", "aja", "ajam", "oh", "ok", "okay", "va", "creo", "sabe", "acuerdo", "recuerdo",
+    "digo", "dije", "decir", "diga", "dime", "animal", "animales", "nombre", "nombres",
+    "minuto", "tiempo", "listo", "lista", "empieza", "empiece", "puede", "puedo", "tengo",
+    "tiene", "ver", "vamos", "mucho", "muchos", "poco", "ahora", "luego", "despues", "antes",
+    "gracias", "perdon", "verdad", "dos", "tres"
+}
+
+# Animales, o diminutivos de animales, que también son palabras comunes ("se llama",
+# "me cobra", "cuyo nombre", "un ratito", "palomitas de maíz"): siempre las revisa el modelo
+PALABRAS_AMBIGUAS = {
+    "llama", "cobra", "pata", "raya", "mono", "morena", "marta", "macho", "res", "coral",
+    "esponja", "chita", "ave", "boa", "cuyo", "ratito", "palomita"
+}
+
+@lru_cache(maxsize=1)
+def indice_lexico():
+    """
+    Índice forma normalizada -> (forma canónica, categoría).
+    Los nombres compuestos ("estrella de mar") no se indexan: la transcripción
+    llega palabra por palabra y su primera palabra no siempre es un animal.
+    """
+    indice = {}
+    for categoria, animales in LEXICO_ANIMALES.items():
+        for animal in animales:
+            clave = normalizar(animal)
+            if " " not in animal and clave not in indice:
+                indice[clave] = (animal, categoria)
+    return indice
+
+@lru_cache(maxsize=1)
+def _claves_por_longitud():
+    por_longitud = {}
+    for clave in indice_lexico():
+        por_longitud.setdefault(len(clave), []).append(clave)
+    return por_longitud
+
+def formas_plurales(palabra):
+    """Formas candidatas quitando el plural: "peces" -> [..., "pez"]."""
+    formas = [palabra]
+    if palabra.endswith("ces"):
+        formas.append(palabra[:-3] + "z")
+    if palabra.endswith("es"):
+        formas.append(palabra[:-2])
+    if palabra.endswith("s"):
+        formas.append(palabra[:-1])
+    return formas
+
+def formas_base(palabra):
+    """
+    Formas candidatas de una palabra normalizada quitando plurales y
+    diminutivos: "perritos" -> [..., "perro"], "peces" -> [..., "pez"].
+    """
+    formas = formas_plurales(palabra)
+
+    for forma in list(formas):
+        for sufijo in ("ecito", "ecita", "cito", "cita", "ito", "ita", "illo", "illa"):
+            if forma.endswith(sufijo) and len(forma) - len(sufijo) >= 2:
+                raiz = forma[:-len(sufijo)]
+                formas.extend([raiz + "o", raiz + "a", raiz, raiz + "e"])
+                if raiz.endswith("c"):
+                    formas.append(raiz[:-1] + "z")
+                if raiz.endswith("qu"):
+                    formas.extend([raiz[:-2] + "co", raiz[:-2] + "ca"])
+                if raiz.endswith("gu"):
+                    formas.extend([raiz[:-1] + "o", raiz[:-1] + "a"])
+                break
+    return formas
+
+@lru_cache(maxsize=4096)
+def buscar_en_lexico(palabra):
+    """Devuelve la clave del léxico para una palabra (exacta o por morfología) o None."""
+    indice = indice_lexico()
+    for forma in formas_base(palabra):
+        if forma in indice:
+            return forma
+    return None
+
+@lru_cache(maxsize=4096)
+def buscar_aproximado(palabra, umbral=0.8):
+    """Busca la clave más parecida del léxico (posible error de transcripción)."""
+    if len(palabra) < 4:
+        return None
+    candidatas = []
+    por_longitud = _claves_por_longitud()
+    for n in range(len(palabra) - 2, len(palabra) + 3):
+        candidatas.extend(por_longitud.get(n, []))
+    parecidas = difflib.get_close_matches(palabra, candidatas, n=1, cutoff=umbral)
+    return parecidas[0] if parecidas else None
+
+def es_ambigua(clave, encontrada):
+    """Si la palabra (o su forma base del léxico) puede no referirse a un animal."""
+    return encontrada in PALABRAS_AMBIGUAS or any(f in PALABRAS_AMBIGUAS for f in formas_plurales(clave))
+
+def clasificar_palabras(palabras, umbral=0.8, escalar_desconocidas=False):
+    """
+    Separa las palabras transcritas en menciones claras de animales y
+    candidatas que debe revisar el modelo de lenguaje.
+
+    Args:
+        palabras: lista de {"word", "start"} (palabras_con_tiempos.json)
+        umbral: similitud mínima para considerar una palabra como posible animal
+        escalar_desconocidas: si es True también se envían al modelo las palabras
+            que no se parecen a ningún animal del léxico
+
+    Plurales y diminutivos de animales del léxico ("perritos") son menciones
+    claras. Pasan al modelo, que decide si son animales, las palabras cuya
+    forma base o cuya forma escrita (sin plural) está en `PALABRAS_AMBIGUAS`
+    ("llama", "ratito", "palomitas").
+
+    Returns:
+        (detectados, candidatas): `detectados` ya tiene el formato de
+        lista_animales.json ({"word", "start", "posible": False}); `candidatas`
+        son las palabras originales que el léxico no pudo resolver.
+    """
+    detectados = []
+    candidatas = []
+    for p, clave in zip(palabras, normalizar_lote(p["word"] for p in palabras)):
+        if not clave or clave.isdigit() or clave in PALABRAS_FUNCIONALES:
+            continue
+        encontrada = buscar_en_lexico(clave)
+        if encontrada and not es_ambigua(clave, encontrada):
+            detectados.append({
+                "word": p["word"].strip(),
+                "start": float(p["start"]),
+                "posible": False
+            })
+        elif encontrada or buscar_aproximado(clave, umbral) or (escalar_desconocidas and len(clave) >= 3):
+            candidatas.append(p)
+    return detectados, candidatas
@@ -8,14 +8,32 @@ Contiene funciones para:
 - Transcripción de audio
 """
 
+import importlib
+
 from .convertir_de_video_a_audio import convertir_de_video_a_audio
 from .procesamiento_de_audio import procesamiento_de_audio
 from .diarizacion_de_personas import realizar_diarizacion
-from .transcripcion_de_audio import transcripcion_de_audio
+
+# La transcripción carga torch y transformers: se importa solo al usarla, para
+# que la conversión, el preprocesamiento, la detección de voz y la diarización
+# funcionen (y se prueben) sin esas dependencias.
+_TRANSCRIPCION = ('transcripcion_de_audio', 'transcripcion_de_audio_multiple', 'MotorTranscripcion', 'obtener_motor')
+
+def __getattr__(nombre):
+    if nombre in _TRANSCRIPCION:
+        modulo = importlib.import_module(f"{__name__}.transcripcion_de_audio")
+        # Importar el submódulo lo deja como atributo del paquete con el mismo
+        # nombre que la función: se reemplaza por las funciones exportadas
+        globals().update({n: getattr(modulo, n) for n in _TRANSCRIPCION})
+        return globals()[nombre]
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 __all__ = [
     'convertir_de_video_a_audio',
     'procesamiento_de_audio',
     'realizar_diarizacion',
-    'transcripcion_de_audio'
+    'transcripcion_de_audio',
+    'transcripcion_de_audio_multiple',
+    'MotorTranscripcion',
+    'obtener_motor'
 ] 
\ No newline at end of file
@@ -1,13 +1,56 @@
+import json
 import os
 import shutil
 import subprocess
+from config import AUDIO_CONFIG
 
 EXTENSIONES_VIDEO = (".mp4", ".mov", ".mkv")
 
-def convertir_de_video_a_audio(video_path, output_dir):
+def _guardar_log(log, output_dir):
+    with open(os.path.join(output_dir, "log_conversion.json"), "w", encoding="utf-8") as f:
+        json.dump(log, f, indent=2, ensure_ascii=False)
+
+def ingestar_archivo(origen, destino, modo="in_place"):
+    """
+    Deja el archivo original disponible para la conversión sin duplicarlo.
+
+    - "in_place": se lee directamente desde su ubicación original.
+    - "link": enlace duro o reflink (copia con copy-on-write) en `destino`;
+      si el sistema de archivos no lo permite, se lee en su lugar.
+    - "copy": copia completa (comportamiento anterior).
+
+    Devuelve (ruta_a_usar, metodo).
+    """
+    if modo == "copy":
+        if not (os.path.exists(destino) and os.path.samefile(origen, destino)):
+            shutil.copy(origen, destino)
+        return destino, "copia"
+
+    if modo == "link":
+        if os.path.exists(destino):
+            if os.path.samefile(origen, destino):
+                return destino, "enlace_existente"
+            os.remove(destino)
+        try:
+            os.link(origen, destino)
+            return destino, "enlace_duro"
+        except OSError:
+            pass
+        try:
+            subprocess.run(["cp", "--reflink=always", origen, destino], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return destino, "reflink"
+        except (OSError, subprocess.CalledProcessError):
+            if os.path.exists(destino):
+                os.remove(destino)
+
+    return origen, "in_place"
+
+def convertir_de_video_a_audio(video_path, output_dir, modo_ingesta=None):
     log = {
         "archivo_original": video_path,
-        "video_copiado": None,
+        "video_ingestado": None,
+        "metodo_ingesta": None,
         "audio_generado": None,
         "estado": "iniciado",
         "mensaje": ""
@@ -21,12 +64,22 @@ def convertir_de_video_a_audio(video_path, output_dir):
 
     os.makedirs(output_dir, exist_ok=True)
 
-    # Copiar video a carpeta destino
+    # Ingesta del original sin copiarlo (salvo que se pida explícitamente)
+    estado_original = os.stat(video_path)
+    log["origen"] = {
+        "ruta": os.path.abspath(video_path),
+        "tamano_bytes": estado_original.st_size,
+        "modificado": estado_original.st_mtime
+    }
     nombre_archivo = os.path.basename(video_path)
-    destino_video = os.path.join(output_dir, nombre_archivo)
-    shutil.copy(video_path, destino_video)
-    log["video_copiado"] = destino_video
-    print(f"📂 Video copiado a: {destino_video}")
+    destino_video, metodo = ingestar_archivo(
+        video_path,
+        os.path.join(output_dir, nombre_archivo),
+        modo_ingesta or AUDIO_CONFIG["ingest_mode"]
+    )
+    log["video_ingestado"] = destino_video
+    log["metodo_ingesta"] = metodo
+    print(f"📂 Video disponible en: {destino_video} ({metodo})")
 
     extension = os.path.splitext(nombre_archivo)[1].lower()
     if extension not in EXTENSIONES_VIDEO:
@@ -34,33 +87,51 @@ def convertir_de_video_a_audio(video_path, output_dir):
         log["estado"] = "audio_directo"
         log["mensaje"] = "Archivo tratado como audio directamente (no es video)."
         log["audio_generado"] = destino_video
-        return destino_video  # Ruta al archivo copiado
+        _guardar_log(log, output_dir)
+        return destino_video
 
-    # Convertir a mp3 dentro del mismo directorio
     base_sin_ext = os.path.splitext(nombre_archivo)[0]
-    mp3_path = os.path.join(output_dir, base_sin_ext + ".mp3")
-
-    try:
-        subprocess.run([
+    if AUDIO_CONFIG["direct_decode"]:
+        # Una sola decodificación: PCM mono a la frecuencia final, sin MP3 ni remuestreo posterior
+        audio_path = os.path.join(output_dir, base_sin_ext + ".wav")
+        comando = [
+            "ffmpeg",
+            "-i", destino_video,
+            "-vn",
+            "-ac", str(AUDIO_CONFIG["channels"]),
+            "-ar", str(AUDIO_CONFIG["sample_rate"]),
+            "-c:a", AUDIO_CONFIG["codec"],
+            "-y",
+            audio_path
+        ]
+    else:
+        # Convertir a mp3 dentro del mismo directorio
+        audio_path = os.path.join(output_dir, base_sin_ext + ".mp3")
+        comando = [
             "ffmpeg",
             "-i", destino_video,
             "-vn",
             "-ab", "192k",
             "-ar", "44100",
             "-y",
-            mp3_path
-        ], check=True)
+            audio_path
+        ]
+
+    try:
+        subprocess.run(comando, check=True)
 
-        log["audio_generado"] = mp3_path
+        log["audio_generado"] = audio_path
         log["estado"] = "convertido"
-        log["mensaje"] = f"Audio generado correctamente: {mp3_path}"
-        print(f"🎧 Audio convertido guardado en: {mp3_path}")
-        return mp3_path
+        log["mensaje"] = f"Audio generado correctamente: {audio_path}"
+        print(f"🎧 Audio convertido guardado en: {audio_path}")
+        _guardar_log(log, output_dir)
+        return audio_path
 
     except subprocess.CalledProcessError as e:
         log["estado"] = "error"
         log["mensaje"] = f"Error de conversión con ffmpeg: {e}"
         print(f"❌ {log['mensaje']}")
+        _guardar_log(log, output_dir)
         return None
 
 # Uso como script (opcional)
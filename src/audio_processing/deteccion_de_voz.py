@@ -0,0 +1,164 @@
+"""
+Índice de regiones de voz para no enviar silencios a Whisper.
+
+El preprocesamiento ya recorre el audio final para normalizarlo; en esa misma
+pasada se calcula el nivel RMS de cada trama de 30 ms y, con el mismo umbral
+relativo al pico que la puerta de ruido, se obtiene un índice compacto de
+regiones de voz `[inicio, fin]` (s) que se guarda junto al audio procesado
+(`<audio>_voz.npz`) con la longitud en muestras y la frecuencia de muestreo
+del audio y los parámetros `vad_*` con que se calculó; al cargarlo se
+descarta si alguno de ellos ya no coincide.
+
+La transcripción recorta cada segmento de diarización a sus regiones de voz,
+las concatena con un silencio corto entre ellas y, con el mapa de tiempos
+devuelto por `recortar_a_voz`, lleva los tiempos de Whisper de vuelta a la
+grabación original.
+"""
+
+import json
+import os
+
+import numpy as np
+import soundfile as sf
+
+from config import AUDIO_CONFIG
+
+PARAMETROS_VAD = ("vad_frame_seconds", "vad_threshold_db", "vad_merge_gap", "vad_padding")
+
+def ruta_indice_de_voz(audio_path):
+    return os.path.splitext(audio_path)[0] + "_voz.npz"
+
+def parametros_vad():
+    """Parámetros de `AUDIO_CONFIG` de los que depende el índice de voz."""
+    return {k: AUDIO_CONFIG[k] for k in PARAMETROS_VAD}
+
+def niveles_por_trama(audio, sample_rate, duracion_trama=None):
+    """Nivel RMS de cada trama de `duracion_trama` segundos (la última puede ser incompleta)."""
+    n = int(sample_rate * (duracion_trama or AUDIO_CONFIG["vad_frame_seconds"]))
+    audio = np.asarray(audio, dtype=np.float32)
+    completas = len(audio) // n
+    cuadrados = np.mean(audio[:completas * n].reshape(completas, n) ** 2, axis=1)
+    if len(audio) > completas * n:
+        cuadrados = np.append(cuadrados, np.mean(audio[completas * n:] ** 2))
+    return np.sqrt(cuadrados).astype(np.float32)
+
+def regiones_de_voz(mascara, duracion_trama, max_hueco=0.3, min_voz=0.15):
+    """
+    Convierte una máscara de voz por trama en regiones [inicio, fin] (s),
+    uniendo las separadas por menos de `max_hueco` y descartando las menores
+    de `min_voz`.
+    """
+    bordes = np.flatnonzero(np.diff(np.concatenate(([0], np.asarray(mascara).astype(np.int8), [0]))))
+    inicios, fines = bordes[::2], bordes[1::2]
+    if inicios.size > 1:
+        separadas = (inicios[1:] - fines[:-1]) * duracion_trama >= max_hueco
+        inicios = inicios[np.concatenate(([True], separadas))]
+        fines = fines[np.concatenate((separadas, [True]))]
+    regiones = np.stack([inicios, fines], axis=1) * duracion_trama
+    return regiones[(regiones[:, 1] - regiones[:, 0]) >= min_voz]
+
+def indice_de_voz(niveles, duracion_trama=None, umbral_db=None, max_hueco=None, margen=None):
+    """
+    Regiones de voz a partir de los niveles por trama.
+
+    Una trama es voz si su nivel supera `umbral_db` respecto a la trama más
+    fuerte. Las regiones se amplían `margen` segundos a cada lado para no
+    cortar el ataque ni la cola de las palabras.
+    """
+    duracion_trama = duracion_trama or AUDIO_CONFIG["vad_frame_seconds"]
+    umbral_db = AUDIO_CONFIG["vad_threshold_db"] if umbral_db is None else umbral_db
+    max_hueco = AUDIO_CONFIG["vad_merge_gap"] if max_hueco is None else max_hueco
+    margen = AUDIO_CONFIG["vad_padding"] if margen is None else margen
+
+    niveles = np.asarray(niveles, dtype=np.float32)
+    pico = float(niveles.max()) if niveles.size else 0.0
+    if pico <= 0:
+        return np.zeros((0, 2))
+
+    mascara = niveles > pico * (10 ** (umbral_db / 20))
+    regiones = regiones_de_voz(mascara, duracion_trama, max_hueco=max_hueco, min_voz=duracion_trama)
+    regiones[:, 0] = np.maximum(regiones[:, 0] - margen, 0.0)
+    regiones[:, 1] = np.minimum(regiones[:, 1] + margen, niveles.size * duracion_trama)
+
+    # El margen puede solapar regiones vecinas: se unen
+    if len(regiones) > 1:
+        nuevas = np.concatenate(([True], regiones[1:, 0] > regiones[:-1, 1]))
+        fines = np.maximum.reduceat(regiones[:, 1], np.flatnonzero(nuevas))
+        regiones = np.stack([regiones[nuevas, 0], fines], axis=1)
+    return np.round(regiones, 3)
+
+def guardar_indice_de_voz(audio_path, regiones):
+    """Guarda el índice del audio `audio_path` (ya escrito) junto con lo que lo identifica."""
+    info = sf.info(audio_path)
+    ruta = ruta_indice_de_voz(audio_path)
+    np.savez(
+        ruta,
+        regiones=np.asarray(regiones, dtype=np.float64).reshape(-1, 2),
+        muestras=info.frames,
+        sample_rate=info.samplerate,
+        parametros=json.dumps(parametros_vad(), sort_keys=True)
+    )
+    return ruta
+
+def cargar_indice_de_voz(audio_path):
+    """
+    Índice guardado por el preprocesamiento, o None si no existe o no
+    corresponde al audio actual (otra longitud o frecuencia de muestreo) o a
+    los parámetros `vad_*` actuales.
+    """
+    ruta = ruta_indice_de_voz(audio_path)
+    if not os.path.exists(ruta):
+        return None
+    info = sf.info(audio_path)
+    try:
+        with np.load(ruta) as guardado:
+            if (int(guardado["muestras"]) != info.frames
+                    or int(guardado["sample_rate"]) != info.samplerate
+                    or str(guardado["parametros"]) != json.dumps(parametros_vad(), sort_keys=True)):
+                return None
+            return guardado["regiones"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+def recortar_a_voz(audio, sample_rate, inicio, fin, regiones, hueco=0.3):
+    """
+    Audio del intervalo [inicio, fin] (s) con solo sus regiones de voz.
+
+    Returns:
+        (audio_voz, mapa): `mapa` tiene una fila por pieza con
+        [inicio en audio_voz, inicio absoluto, duración], todo en segundos.
+    """
+    regiones = np.asarray(regiones, dtype=np.float64).reshape(-1, 2)
+    desde = np.maximum(regiones[:, 0], inicio)
+    hasta = np.minimum(regiones[:, 1], fin)
+    validas = hasta > desde
+    desde, hasta = desde[validas], hasta[validas]
+
+    silencio = np.zeros(int(hueco * sample_rate), dtype=np.float32)
+    piezas, mapa, posicion = [], [], 0
+    for a, b in zip(desde, hasta):
+        pieza = audio[int(a * sample_rate):int(b * sample_rate)]
+        if not len(pieza):
+            continue
+        if piezas:
+            piezas.append(silencio)
+            posicion += len(silencio)
+        mapa.append((posicion / sample_rate, a, len(pieza) / sample_rate))
+        piezas.append(pieza)
+        posicion += len(pieza)
+
+    if not piezas:
+        return np.zeros(0, dtype=np.float32), np.zeros((0, 3))
+    return np.concatenate(piezas).astype(np.float32, copy=False), np.array(mapa)
+
+def a_tiempo_absoluto(t, mapa):
+    """
+    Lleva un tiempo del audio recortado a la grabación original. Los tiempos
+    que caen en el silencio insertado entre piezas se asignan al inicio de la
+    pieza siguiente.
+    """
+    i = max(int(np.searchsorted(mapa[:, 0], t, side="right")) - 1, 0)
+    desplazamiento = t - mapa[i, 0]
+    if desplazamiento > mapa[i, 2] and i + 1 < len(mapa):
+        return float(mapa[i + 1, 1])
+    return float(mapa[i, 1] + min(max(desplazamiento, 0.0), mapa[i, 2]))
@@ -0,0 +1,289 @@
+"""
+Diarización de hablantes local en CPU.
+
+Pensada para las grabaciones de fluidez verbal (examinador + paciente):
+
+1. Detección de voz por tramas de 30 ms con webrtcvad (o por energía si no
+   está instalado) y unión de tramas en regiones de habla.
+2. Cada región se divide en ventanas cortas descritas por la media y la
+   desviación de sus MFCC (calculados con NumPy/SciPy en float32). Los MFCC
+   se calculan solo sobre las regiones de voz y en bloques de a lo sumo
+   `SEGUNDOS_BLOQUE_MFCC`, así que la memoria no crece con la duración.
+3. Las ventanas se agrupan con k-means en `max_speakers` hablantes; si los
+   grupos no se separan lo suficiente (distancia cepstral entre sus MFCC
+   medios menor a `min_separation`) se asume un solo hablante.
+
+El resultado tiene el mismo formato que consume `transcripcion_de_audio`:
+una lista de {"speaker", "start_time", "end_time", "role"}. El backend de
+pyannote sigue disponible con `DIARIZATION_CONFIG["backend"] = "pyannote"`.
+
+El rol ("paciente" o "examinador") se asigna después de segmentar: en la
+prueba de fluidez el paciente responde con turnos cortos de una o dos
+palabras, mientras que el examinador da instrucciones más largas.
+"""
+
+import json
+import os
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+from scipy.fft import dct, rfft
+from scipy.signal import resample_poly
+
+from config import DIARIZATION_CONFIG
+from .deteccion_de_voz import regiones_de_voz
+
+try:
+    import webrtcvad
+except ImportError:  # Se usa el detector por energía
+    webrtcvad = None
+
+SAMPLE_RATE_DIARIZACION = 16000
+MS_TRAMA_VAD = 30
+PASO_MFCC = 0.010
+SEGUNDOS_BLOQUE_MFCC = 30.0
+
+def cargar_audio_mono(audio_path, sample_rate=SAMPLE_RATE_DIARIZACION):
+    audio, sr = sf.read(audio_path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if sr != sample_rate:
+        divisor = gcd(sr, sample_rate)
+        audio = resample_poly(audio, sample_rate // divisor, sr // divisor).astype(np.float32)
+    return audio, sample_rate
+
+def detectar_voz(audio, sample_rate, agresividad=2):
+    """Máscara booleana de voz por trama de 30 ms."""
+    n = int(sample_rate * MS_TRAMA_VAD / 1000)
+    total = len(audio) // n
+    tramas = audio[:total * n].reshape(total, n)
+    if webrtcvad is not None:
+        vad = webrtcvad.Vad(agresividad)
+        pcm = (np.clip(tramas, -1.0, 1.0) * 32767).astype("<i2")
+        return np.fromiter((vad.is_speech(t.tobytes(), sample_rate) for t in pcm), dtype=bool, count=total)
+
+    energia = 10 * np.log10(np.mean(tramas ** 2, axis=1) + 1e-10)
+    return energia > np.percentile(energia, 20) + 10
+
+@lru_cache(maxsize=8)
+def _banco_mel(sample_rate, n_fft, n_mels):
+    def a_mel(f):
+        return 2595 * np.log10(1 + f / 700)
+
+    def a_hz(m):
+        return 700 * (10 ** (m / 2595) - 1)
+
+    puntos = a_hz(np.linspace(a_mel(0), a_mel(sample_rate / 2), n_mels + 2))
+    bins = np.floor((n_fft + 1) * puntos / sample_rate).astype(int)
+    banco = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        izq, centro, der = bins[m - 1], bins[m], bins[m + 1]
+        if centro > izq:
+            banco[m - 1, izq:centro] = (np.arange(izq, centro) - izq) / (centro - izq)
+        if der > centro:
+            banco[m - 1, centro:der] = (der - np.arange(centro, der)) / (der - centro)
+    return banco
+
+def mfcc(audio, sample_rate, n_mfcc=13, n_mels=26, ventana=0.025, paso=PASO_MFCC, n_fft=512):
+    """MFCC (sin el coeficiente de energía) por tramas de 25 ms cada 10 ms, en float32."""
+    n, h = int(sample_rate * ventana), int(sample_rate * paso)
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < n:
+        audio = np.pad(audio, (0, n - len(audio)))
+    tramas = np.lib.stride_tricks.sliding_window_view(audio, n)[::h] * np.hamming(n).astype(np.float32)
+    potencia = np.abs(rfft(tramas, n_fft, axis=1)) ** 2 / np.float32(n_fft)
+    log_mel = np.log(potencia @ _banco_mel(sample_rate, n_fft, n_mels).T + np.float32(1e-10))
+    return dct(log_mel, type=2, axis=1, norm="ortho")[:, 1:n_mfcc + 1]
+
+def _descriptores_de_region(audio, sample_rate, limites):
+    """
+    Media y desviación de los MFCC de cada ventana [limites[i], limites[i+1]]
+    de una región de voz, calculando los MFCC por bloques de ventanas de a lo
+    sumo `SEGUNDOS_BLOQUE_MFCC`.
+    """
+    descriptores = []
+    primera = 0
+    while primera < len(limites) - 1:
+        ultima = primera + 1
+        while ultima < len(limites) - 1 and limites[ultima + 1] - limites[primera] <= SEGUNDOS_BLOQUE_MFCC:
+            ultima += 1
+        inicio = limites[primera]
+        coeficientes = mfcc(audio[int(inicio * sample_rate):int(limites[ultima] * sample_rate)], sample_rate)
+        for a, b in zip(limites[primera:ultima], limites[primera + 1:ultima + 1]):
+            desde = min(int((a - inicio) / PASO_MFCC), len(coeficientes) - 1)
+            tramas = coeficientes[desde:max(int((b - inicio) / PASO_MFCC), desde + 1)]
+            descriptores.append(np.concatenate([tramas.mean(axis=0), tramas.std(axis=0)]))
+        primera = ultima
+    return descriptores
+
+def kmeans(x, k, iteraciones=50, semilla=0):
+    """k-means con inicialización k-means++. Devuelve (etiquetas, centros)."""
+    rng = np.random.default_rng(semilla)
+    centros = [x[rng.integers(len(x))]]
+    for _ in range(1, k):
+        distancias = np.min(((x[:, None, :] - np.array(centros)[None]) ** 2).sum(-1), axis=1)
+        if distancias.sum() == 0:
+            break
+        centros.append(x[rng.choice(len(x), p=distancias / distancias.sum())])
+    centros = np.array(centros)
+
+    etiquetas = np.zeros(len(x), dtype=np.int64)
+    for iteracion in range(iteraciones):
+        nuevas = np.argmin(((x[:, None, :] - centros[None]) ** 2).sum(-1), axis=1)
+        if iteracion > 0 and np.array_equal(nuevas, etiquetas):
+            break
+        etiquetas = nuevas
+        for c in range(len(centros)):
+            if np.any(etiquetas == c):
+                centros[c] = x[etiquetas == c].mean(axis=0)
+    return etiquetas, centros
+
+def _separacion(medias, etiquetas):
+    """
+    Distancia cepstral entre los dos grupos: norma de la diferencia de sus MFCC
+    medios (sin estandarizar, para que una sola voz no parezca separable).
+    """
+    a, b = medias[etiquetas == 0], medias[etiquetas == 1]
+    if not len(a) or not len(b):
+        return 0.0
+    return float(np.linalg.norm(a.mean(axis=0) - b.mean(axis=0)))
+
+def _suavizar(etiquetas):
+    """Moda en ventana de 3 para quitar cambios de hablante de una sola ventana."""
+    if len(etiquetas) < 3:
+        return etiquetas
+    suavizadas = etiquetas.copy()
+    iguales_vecinos = etiquetas[:-2] == etiquetas[2:]
+    centro = np.arange(1, len(etiquetas) - 1)
+    suavizadas[centro[iguales_vecinos]] = etiquetas[:-2][iguales_vecinos]
+    return suavizadas
+
+def _diarizar_local(audio_path):
+    audio, sr = cargar_audio_mono(audio_path)
+    duracion_total = len(audio) / sr
+    regiones = regiones_de_voz(
+        detectar_voz(audio, sr, DIARIZATION_CONFIG["vad_aggressiveness"]),
+        MS_TRAMA_VAD / 1000,
+        max_hueco=DIARIZATION_CONFIG["merge_gap"]
+    )
+    if not len(regiones):
+        return []
+
+    ventana = DIARIZATION_CONFIG["window_seconds"]
+
+    # Ventanas de cada región y su descriptor (media + desviación de los MFCC)
+    ventanas, region_de_ventana, descriptores = [], [], []
+    for r, (inicio, fin) in enumerate(regiones):
+        n_ventanas = max(1, int(round((fin - inicio) / ventana)))
+        limites = np.linspace(inicio, fin, n_ventanas + 1)
+        descriptores.extend(_descriptores_de_region(audio, sr, limites))
+        ventanas.extend(zip(limites[:-1], limites[1:]))
+        region_de_ventana.extend([r] * n_ventanas)
+    descriptores = np.array(descriptores)
+    n_mfcc = descriptores.shape[1] // 2
+    x = (descriptores - descriptores.mean(axis=0)) / (descriptores.std(axis=0) + 1e-8)
+    region_de_ventana = np.array(region_de_ventana)
+
+    etiquetas = np.zeros(len(x), dtype=np.int64)
+    max_hablantes = DIARIZATION_CONFIG["max_speakers"]
+    if max_hablantes > 1 and len(x) >= 2 * max_hablantes:
+        etiquetas, _ = kmeans(x, max_hablantes)
+        if (DIARIZATION_CONFIG["min_speakers"] < max_hablantes and max_hablantes == 2
+                and _separacion(descriptores[:, :n_mfcc], etiquetas) < DIARIZATION_CONFIG["min_separation"]):
+            etiquetas[:] = 0
+
+    # Suavizado dentro de cada región y unión de ventanas consecutivas del mismo hablante
+    segmentos = []
+    orden_hablantes = {}
+    for r in range(len(regiones)):
+        indices = np.flatnonzero(region_de_ventana == r)
+        etiquetas_region = _suavizar(etiquetas[indices])
+        for i, etiqueta in zip(indices, etiquetas_region):
+            hablante = orden_hablantes.setdefault(int(etiqueta), f"SPEAKER_{len(orden_hablantes):02d}")
+            inicio, fin = ventanas[i]
+            if segmentos and segmentos[-1]["speaker"] == hablante and segmentos[-1]["_region"] == r:
+                segmentos[-1]["end_time"] = fin
+            else:
+                segmentos.append({"speaker": hablante, "start_time": inicio, "end_time": fin, "_region": r})
+
+    # Los segmentos muy cortos se amplían hasta `min_duration` para darle contexto a Whisper
+    minimo = DIARIZATION_CONFIG["min_duration"]
+    for s in segmentos:
+        del s["_region"]
+        falta = minimo - (s["end_time"] - s["start_time"])
+        if falta > 0:
+            s["start_time"] = max(0.0, s["start_time"] - falta / 2)
+            s["end_time"] = min(duracion_total, s["end_time"] + falta / 2)
+        s["start_time"] = round(float(s["start_time"]), 2)
+        s["end_time"] = round(float(s["end_time"]), 2)
+    return segmentos
+
+def _diarizar_pyannote(audio_path):
+    from pyannote.audio import Pipeline
+
+    pipeline = Pipeline.from_pretrained(
+        "pyannote/speaker-diarization@2.1",
+        use_auth_token=os.getenv("HUGGINGFACE_TOKEN")
+    )
+    diarizacion = pipeline(
+        audio_path,
+        min_speakers=DIARIZATION_CONFIG["min_speakers"],
+        max_speakers=DIARIZATION_CONFIG["max_speakers"]
+    )
+    return [
+        {"speaker": hablante, "start_time": round(turno.start, 2), "end_time": round(turno.end, 2)}
+        for turno, _, hablante in diarizacion.itertracks(yield_label=True)
+        if turno.end - turno.start >= DIARIZATION_CONFIG["min_duration"]
+    ]
+
+def asignar_roles(segmentos, turno_corto=None):
+    """
+    Marca cada segmento con "role": el hablante con más turnos cortos (de
+    hasta `turno_corto` segundos) es el paciente; el resto, examinadores.
+    A igualdad de turnos cortos gana el de turnos más breves en promedio.
+
+    Returns:
+        dict hablante -> rol
+    """
+    turno_corto = DIARIZATION_CONFIG["short_turn_seconds"] if turno_corto is None else turno_corto
+    turnos = {}
+    for s in segmentos:
+        turnos.setdefault(s["speaker"], []).append(s["end_time"] - s["start_time"])
+    if not turnos:
+        return {}
+
+    paciente = max(
+        turnos,
+        key=lambda h: (sum(d <= turno_corto for d in turnos[h]), -sum(turnos[h]) / len(turnos[h]))
+    )
+    roles = {h: "paciente" if h == paciente else "examinador" for h in turnos}
+    for s in segmentos:
+        s["role"] = roles[s["speaker"]]
+
+    cortos = sum(d <= turno_corto for d in turnos[paciente])
+    print(f"🧑 Paciente: {paciente} ({cortos} turnos cortos de {len(turnos[paciente])})")
+    return roles
+
+def realizar_diarizacion(audio_path, output_dir=".", backend=None):
+    """
+    Segmenta el audio por hablante y guarda `diarization_results.json` en `output_dir`.
+
+    Returns:
+        Lista de {"speaker", "start_time", "end_time", "role"} ordenada por tiempo.
+    """
+    backend = backend or DIARIZATION_CONFIG["backend"]
+    print(f"🗣️ Diarizando {os.path.basename(audio_path)} (backend: {backend})...")
+    if backend == "pyannote":
+        segmentos = _diarizar_pyannote(audio_path)
+    else:
+        segmentos = _diarizar_local(audio_path)
+
+    hablantes = sorted({s["speaker"] for s in segmentos})
+    print(f"✅ {len(segmentos)} segmentos de {len(hablantes)} hablante(s)")
+    asignar_roles(segmentos)
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "diarization_results.json"), "w", encoding="utf-8") as f:
+        json.dump(segmentos, f, ensure_ascii=False, indent=4)
+    return segmentos
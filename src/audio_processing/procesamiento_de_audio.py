@@ -2,20 +2,87 @@ import numpy as np
 import soundfile as sf
 import os
 import subprocess
+import tempfile
 import noisereduce as nr
 import librosa
-from scipy.signal import butter, filtfilt, iirpeak, lfilter
-
-def butter_bandpass(lowcut, highcut, fs, order=4):
+from functools import lru_cache
+from scipy.signal import butter, filtfilt, iirpeak, sosfilt, sosfilt_zi
+from config import AUDIO_CONFIG
+from .deteccion_de_voz import guardar_indice_de_voz, indice_de_voz, niveles_por_trama
+
+EQ_TRANSCRIPCION = (
+    (150, -2, 0.8),
+    (250, 2, 1),
+    (1000, 2, 1),
+    (3000, 6, 1),
+    (8000, -3, 1.5)
+)
+
+def butter_bandpass(lowcut, highcut, fs, order=4, output='ba'):
     nyq = 0.5 * fs
     low = lowcut / nyq
     high = highcut / nyq
-    return butter(order, [low, high], btype='band')
+    return butter(order, [low, high], btype='band', output=output)
+
+@lru_cache(maxsize=32)
+def banco_pasabanda_preenfasis(sample_rate, lowcut=80, highcut=5000, coeff=0.95, order=4):
+    """
+    Diseña (una sola vez por frecuencia de muestreo) las secciones SOS del
+    pasa banda de fase cero seguido del preénfasis.
+
+    Devuelve (ida, vuelta): la pasada hacia adelante lleva el Butterworth y el
+    FIR de preénfasis en la misma cascada; la pasada hacia atrás solo el
+    Butterworth. Al ser filtros lineales, el resultado equivale a `filtfilt`
+    seguido de `apply_preemphasis`, con una pasada menos sobre los datos.
+    """
+    vuelta = butter_bandpass(lowcut, highcut, sample_rate, order=order, output='sos')
+    preenfasis = np.array([[1.0, -coeff, 0.0, 1.0, 0.0, 0.0]])
+    ida = np.vstack([vuelta, preenfasis])
+    return ida.astype(np.float32), vuelta.astype(np.float32)
+
+@lru_cache(maxsize=32)
+def banco_ecualizador(sample_rate, eq_settings):
+    """
+    Compila las bandas de `eq_settings` en una sola cascada SOS.
+
+    Cada banda de `apply_eq` calcula y = x + (g - 1)·H(x) con H = b/a del
+    filtro `iirpeak`, es decir, y = ((a + (g - 1)·b) / a)·x: una sección de
+    segundo orden. Aplicar las bandas una tras otra equivale a la cascada.
+    """
+    secciones = []
+    for f_center, gain_db, Q in eq_settings:
+        b, a = iirpeak(f_center / (sample_rate / 2), Q)
+        ganancia = 10 ** (gain_db / 20) - 1
+        secciones.append(np.concatenate([a + ganancia * b, a]))
+    return np.array(secciones, dtype=np.float32)
+
+def _perfil_eq(eq_settings):
+    return tuple(tuple(banda) for banda in eq_settings)
 
 def apply_bandpass(audio_data, sample_rate, lowcut=80, highcut=5000):
     b, a = butter_bandpass(lowcut, highcut, sample_rate)
     return filtfilt(b, a, audio_data)
 
+def apply_bandpass_preemphasis(audio_data, sample_rate, lowcut=80, highcut=5000, coeff=0.95):
+    """Pasa banda de fase cero + preénfasis en dos pasadas `sosfilt` sobre float32."""
+    ida, vuelta = banco_pasabanda_preenfasis(sample_rate, lowcut, highcut, coeff)
+    datos = np.asarray(audio_data, dtype=np.float32)
+    if len(datos) < 2:
+        return datos
+
+    # Extensión impar en los bordes, igual que filtfilt, para evitar transitorios
+    padlen = min(3 * (2 * len(vuelta) + 1), len(datos) - 1)
+    izquierda = 2 * datos[0] - datos[padlen:0:-1]
+    derecha = 2 * datos[-1] - datos[-2:-padlen - 2:-1]
+    extendido = np.concatenate([izquierda, datos, derecha])
+
+    zi_ida = (sosfilt_zi(ida) * extendido[0]).astype(np.float32)
+    datos_ida, _ = sosfilt(ida, extendido, zi=zi_ida)
+    invertido = datos_ida[::-1]
+    zi_vuelta = (sosfilt_zi(vuelta) * invertido[0]).astype(np.float32)
+    datos_vuelta, _ = sosfilt(vuelta, invertido, zi=zi_vuelta)
+    return datos_vuelta[::-1][padlen:padlen + len(datos)]
+
 def normalize_audio(audio_data):
     max_val = np.max(np.abs(audio_data))
     return audio_data / max_val if max_val > 0 else audio_data
@@ -26,9 +93,14 @@ def apply_preemphasis(audio_data, coeff=0.95):
 def remove_dc_offset(audio_data):
     return audio_data - np.mean(audio_data)
 
-def convert_mp3_to_wav(mp3_path, wav_path):
+def convert_mp3_to_wav(mp3_path, wav_path, sample_rate=None, channels=None):
+    comando = ["ffmpeg", "-y", "-i", mp3_path]
+    if sample_rate:
+        comando += ["-ar", str(sample_rate)]
+    if channels:
+        comando += ["-ac", str(channels)]
     try:
-        subprocess.run(["ffmpeg", "-y", "-i", mp3_path, wav_path], check=True,
+        subprocess.run(comando + [wav_path], check=True,
                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         return wav_path
     except Exception as e:
@@ -43,53 +115,267 @@ def apply_noise_gate(audio_data, threshold_db=-40.0):
     threshold = max_amp * (10 ** (threshold_db / 20))
     return np.where(np.abs(audio_data) < threshold, 0.0, audio_data)
 
-def apply_eq(audio, sr, eq_settings):
-    output = audio.copy()
-    for f_center, gain_db, Q in eq_settings:
-        gain_linear = 10 ** (gain_db / 20)
-        b, a = iirpeak(f_center / (sr / 2), Q)
-        filtered = lfilter(b, a, output)
-        output = output + (gain_linear - 1) * filtered
-    return output
-
-def procesamiento_de_audio(audio_file, output_dir="."):
-    print(f"🔄 Procesando: {audio_file}...")
-
-    output_dir = os.path.abspath(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
+def apply_eq(audio, sr, eq_settings, zi=None):
+    """
+    Ecualiza con todas las bandas en una sola pasada `sosfilt` sobre float32.
+
+    Si se pasa `zi` (estado de un bloque anterior) devuelve (salida, zf) para
+    poder continuar el filtrado en el siguiente bloque.
+    """
+    sos = banco_ecualizador(sr, _perfil_eq(eq_settings))
+    datos = np.asarray(audio, dtype=np.float32)
+    if zi is None:
+        return sosfilt(sos, datos)
+    return sosfilt(sos, datos, zi=zi)
+
+def _leer_bloques(audio_file, bloque):
+    """Lee un archivo de audio en bloques float32 mono de `bloque` muestras."""
+    with sf.SoundFile(audio_file) as f:
+        for datos in f.blocks(blocksize=bloque, dtype="float32", always_2d=True):
+            yield datos.mean(axis=1) if datos.shape[1] > 1 else datos[:, 0]
+
+def _leer_bloques_ffmpeg(audio_file, sample_rate, bloque):
+    """
+    Decodifica cualquier contenedor (video o audio) con ffmpeg y entrega
+    bloques float32 mono a `sample_rate` por una tubería, sin archivo
+    intermedio.
+
+    El código de salida de ffmpeg solo se revisa si se leyó la tubería hasta
+    el final: si quien consume los bloques se detiene o falla antes, ffmpeg se
+    termina sin ocultar esa excepción.
+    """
+    proceso = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", audio_file, "-vn", "-ac", "1", "-ar", str(sample_rate),
+         "-f", "s16le", "-acodec", "pcm_s16le", "-"],
+        stdout=subprocess.PIPE
+    )
+    muestras, completo = 0, False
+    try:
+        while True:
+            crudo = proceso.stdout.read(bloque * 2)
+            if not crudo:
+                break
+            datos = np.frombuffer(crudo[:len(crudo) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+            muestras += len(datos)
+            yield datos
+        completo = True
+    finally:
+        proceso.stdout.close()
+        if not completo:
+            proceso.kill()
+        codigo = proceso.wait()
+
+    if codigo != 0:
+        raise RuntimeError(f"ffmpeg no pudo decodificar {audio_file}")
+    if muestras == 0:
+        raise ValueError(f"El archivo de audio está vacío: {audio_file}")
+
+def _con_contexto(bloques, contexto):
+    """
+    Acompaña cada bloque con `contexto` muestras de sus vecinos a ambos lados.
+
+    Genera tuplas (extendido, inicio, fin) donde `extendido[inicio:fin]` es el
+    bloque original; los filtros no causales se aplican sobre `extendido` y
+    solo se conserva la parte central, de modo que no aparecen costuras.
+    """
+    bloques = iter(bloques)
+    vacio = np.zeros(0, dtype=np.float32)
+    cola = vacio
+    actual = next(bloques, None)
+    while actual is not None:
+        siguiente = next(bloques, None)
+        derecha = siguiente[:contexto] if siguiente is not None else vacio
+        yield np.concatenate([cola, actual, derecha]), len(cola), len(cola) + len(actual)
+        cola = np.concatenate([cola, actual])[-contexto:]
+        actual = siguiente
+
+def _pico(datos):
+    return float(np.max(np.abs(datos))) if len(datos) else 0.0
+
+def _guardar_indice_de_voz(output_path, niveles):
+    regiones = indice_de_voz(niveles)
+    ruta = guardar_indice_de_voz(output_path, regiones)
+    voz = float(np.sum(regiones[:, 1] - regiones[:, 0]))
+    total = len(niveles) * AUDIO_CONFIG["vad_frame_seconds"]
+    print(f"🔇 Índice de voz: {voz:.1f} s de voz en {total:.1f} s ({len(regiones)} regiones) -> '{ruta}'")
+    return ruta
+
+def procesamiento_de_audio_streaming(audio_file, output_path, sample_rate=16000,
+                                     segundos_bloque=30.0, segundos_contexto=2.0,
+                                     eq_settings=EQ_TRANSCRIPCION, tuberia=False, indice_voz=False):
+    """
+    Aplica la misma cadena que `procesamiento_de_audio` leyendo por bloques.
+
+    La memoria usada depende solo del tamaño de bloque, no de la duración de la
+    grabación. Las etapas que necesitan estadísticas globales (media, pico) se
+    resuelven con pasadas sucesivas sobre archivos temporales float32:
+
+    1. media y pico de la entrada (DC y normalización),
+    2. pasa banda y preénfasis (banco SOS fusionado, con solape),
+    3. puerta de ruido, reducción de ruido y media móvil (con solape) y
+       ecualización (banco SOS fusionado, estado `zi` entre bloques),
+    4. normalización final y escritura en PCM de 16 bits (con `indice_voz`,
+       en esta misma pasada se miden los niveles para el índice de voz).
+
+    Con `tuberia=True` la entrada (incluso un video) se decodifica con ffmpeg
+    directamente hacia la pasada 2 y la pasada 1 se omite: el pasa banda ya
+    elimina la componente continua y la puerta de ruido y la normalización
+    final son relativas al pico, así que el resultado no depende de ellas.
+    """
+    bloque = int(segundos_bloque * sample_rate)
+    contexto = min(int(segundos_contexto * sample_rate), bloque)
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+
+    if tuberia:
+        media, escala = 0.0, 1.0
+        fuente = _leer_bloques_ffmpeg(audio_file, sample_rate, bloque)
+    else:
+        # Pasada 1: estadísticas de la entrada
+        suma, total, maximo, minimo = 0.0, 0, -np.inf, np.inf
+        for datos in _leer_bloques(audio_file, bloque):
+            suma += float(np.sum(datos, dtype=np.float64))
+            total += len(datos)
+            maximo = max(maximo, float(datos.max()))
+            minimo = min(minimo, float(datos.min()))
+        if total == 0:
+            raise ValueError(f"El archivo de audio está vacío: {audio_file}")
+        media = suma / total
+        pico = max(maximo - media, media - minimo)
+        escala = 1.0 / pico if pico > 0 else 1.0
+        fuente = _leer_bloques(audio_file, bloque)
+
+    temporal_1 = tempfile.NamedTemporaryFile(suffix=".wav", dir=output_dir, delete=False).name
+    temporal_2 = tempfile.NamedTemporaryFile(suffix=".wav", dir=output_dir, delete=False).name
+    try:
+        # Pasada 2: pasa banda + preénfasis
+        pico_2 = 0.0
+        entrada = ((datos - media) * escala for datos in fuente)
+        with sf.SoundFile(temporal_1, "w", samplerate=sample_rate, channels=1, subtype="FLOAT") as salida:
+            for extendido, inicio, fin in _con_contexto(entrada, contexto):
+                filtrado = apply_bandpass_preemphasis(extendido, sample_rate)[inicio:fin]
+                pico_2 = max(pico_2, _pico(filtrado))
+                salida.write(filtrado)
+
+        # Pasada 3: puerta de ruido + reducción de ruido + media móvil + EQ
+        umbral = pico_2 * (10 ** (-35.0 / 20))
+        muestra_ruido, _ = sf.read(temporal_1, frames=int(sample_rate * 0.5), dtype="float32")
+        muestra_ruido = np.where(np.abs(muestra_ruido) < umbral, 0.0, muestra_ruido)
+        ventana = np.ones(20, dtype=np.float32) / 20
+        zi_eq = np.zeros((len(eq_settings), 2), dtype=np.float32)
+        pico_3 = 0.0
+        with sf.SoundFile(temporal_2, "w", samplerate=sample_rate, channels=1, subtype="FLOAT") as salida:
+            for extendido, inicio, fin in _con_contexto(_leer_bloques(temporal_1, bloque), contexto):
+                datos = np.where(np.abs(extendido) < umbral, 0.0, extendido).astype(np.float32)
+                datos = nr.reduce_noise(y=datos, sr=sample_rate, y_noise=muestra_ruido, prop_decrease=0.9)
+                datos = np.convolve(datos, ventana, mode="same")[inicio:fin]
+                datos, zi_eq = apply_eq(datos, sample_rate, eq_settings, zi=zi_eq)
+                pico_3 = max(pico_3, _pico(datos))
+                salida.write(datos)
+
+        # Pasada 4: normalización final
+        factor = 1.0 / pico_3 if pico_3 > 0 else 1.0
+        muestras_trama = int(sample_rate * AUDIO_CONFIG["vad_frame_seconds"])
+        niveles, resto = [], np.zeros(0, dtype=np.float32)
+        with sf.SoundFile(output_path, "w", samplerate=sample_rate, channels=1, subtype="PCM_16") as salida:
+            for datos in _leer_bloques(temporal_2, bloque):
+                datos = np.clip(datos * factor, -1.0, 1.0)
+                salida.write(datos)
+                if indice_voz:
+                    # Las tramas incompletas pasan al bloque siguiente
+                    datos = np.concatenate([resto, datos])
+                    completas = len(datos) // muestras_trama * muestras_trama
+                    niveles.append(niveles_por_trama(datos[:completas], sample_rate))
+                    resto = datos[completas:]
+        if indice_voz:
+            niveles.append(niveles_por_trama(resto, sample_rate))
+            _guardar_indice_de_voz(output_path, np.concatenate(niveles))
+    finally:
+        for temporal in (temporal_1, temporal_2):
+            if os.path.exists(temporal):
+                os.remove(temporal)
 
-    if audio_file.lower().endswith(".mp3"):
-        wav_file = os.path.join(output_dir, os.path.splitext(os.path.basename(audio_file))[0] + "_converted.wav")
-        audio_file = convert_mp3_to_wav(audio_file, wav_file)
-        if not audio_file or not os.path.exists(audio_file):
-            raise ValueError("No se pudo convertir MP3 a WAV")
+    return output_path
 
-    audio_data, sr = librosa.load(audio_file, sr=16000, mono=True)
+def _procesamiento_en_memoria(audio_file, output_path, sample_rate=16000, eq_settings=EQ_TRANSCRIPCION,
+                              indice_voz=False):
+    audio_data, sr = librosa.load(audio_file, sr=sample_rate, mono=True)
 
     audio_data = remove_dc_offset(audio_data)
     audio_data = normalize_audio(audio_data)
-    audio_data = apply_bandpass(audio_data, sr)
-    audio_data = apply_preemphasis(audio_data, coeff=0.95)
+    audio_data = apply_bandpass_preemphasis(audio_data, sr, coeff=0.95)
     audio_data = apply_noise_gate(audio_data, threshold_db=-35.0)
 
     noise_sample = audio_data[:int(sr * 0.5)]
     audio_data = nr.reduce_noise(y=audio_data, sr=sr, y_noise=noise_sample, prop_decrease=0.9)
 
     audio_data = apply_moving_average_filter(audio_data, window_size=20)
-
-    eq_transcripcion = [
-        (150, -2, 0.8),
-        (250, 2, 1),
-        (1000, 2, 1),
-        (3000, 6, 1),
-        (8000, -3, 1.5)
-    ]
-    audio_data = apply_eq(audio_data, sr, eq_transcripcion)
+    audio_data = apply_eq(audio_data, sr, eq_settings)
     audio_data = normalize_audio(audio_data)
 
+    sf.write(output_path, audio_data, sr, subtype='PCM_16')
+    if indice_voz:
+        _guardar_indice_de_voz(output_path, niveles_por_trama(audio_data, sr))
+    return output_path
+
+def procesamiento_de_audio(audio_file, output_dir=".", streaming=None, tuberia=None):
+    print(f"🔄 Procesando: {audio_file}...")
+
+    if streaming is None:
+        streaming = AUDIO_CONFIG["streaming"]
+    if tuberia is None:
+        tuberia = AUDIO_CONFIG["pipe_decode"]
+    sample_rate = AUDIO_CONFIG["sample_rate"]
+    indice_voz = AUDIO_CONFIG["vad_index"]
+
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if tuberia:
+        # Decodificación directa del contenedor hacia la cadena DSP, sin WAV intermedio
+        nombre_base = os.path.splitext(os.path.basename(audio_file))[0]
+        output_path = os.path.join(output_dir, f"{nombre_base}_whisper_ready.wav")
+        procesamiento_de_audio_streaming(
+            audio_file,
+            output_path,
+            sample_rate=sample_rate,
+            segundos_bloque=AUDIO_CONFIG["block_seconds"],
+            tuberia=True,
+            indice_voz=indice_voz
+        )
+        print(f"✅ Audio listo para Whisper: '{output_path}'\n")
+        return output_path
+
+    necesita_conversion = audio_file.lower().endswith(".mp3")
+    if streaming and not necesita_conversion:
+        # La lectura por bloques no remuestrea: la entrada debe estar ya a 16 kHz mono
+        try:
+            info = sf.info(audio_file)
+            necesita_conversion = info.samplerate != sample_rate or info.channels != 1
+        except RuntimeError:
+            necesita_conversion = True
+
+    if necesita_conversion:
+        wav_file = os.path.join(output_dir, os.path.splitext(os.path.basename(audio_file))[0] + "_converted.wav")
+        if streaming:
+            audio_file = convert_mp3_to_wav(audio_file, wav_file, sample_rate=sample_rate, channels=1)
+        else:
+            audio_file = convert_mp3_to_wav(audio_file, wav_file)
+        if not audio_file or not os.path.exists(audio_file):
+            raise ValueError("No se pudo convertir MP3 a WAV")
+
     nombre_base = os.path.splitext(os.path.basename(audio_file))[0]
     output_path = os.path.join(output_dir, f"{nombre_base}_whisper_ready.wav")
-    sf.write(output_path, audio_data, sr, subtype='PCM_16')
+
+    if streaming:
+        procesamiento_de_audio_streaming(
+            audio_file,
+            output_path,
+            sample_rate=sample_rate,
+            segundos_bloque=AUDIO_CONFIG["block_seconds"],
+            indice_voz=indice_voz
+        )
+    else:
+        _procesamiento_en_memoria(audio_file, output_path, sample_rate=sample_rate, indice_voz=indice_voz)
 
     print(f"✅ Audio listo para Whisper: '{output_path}'\n")
     return output_path
@@ -102,7 +388,6 @@ def procesamiento_de_audio(audio_file, output_dir="."):
 
 
 
-
 # import numpy as np
 # import soundfile as sf
 # from scipy.signal import butter, filtfilt
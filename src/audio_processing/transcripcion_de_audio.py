@@ -5,9 +5,111 @@ import numpy as np
 import soundfile as sf
 import gc
 import re
+import threading
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+from config import WHISPER_CONFIG
+from src.utils.linea_de_tiempo import guardar_linea_de_tiempo
+from .deteccion_de_voz import (
+    a_tiempo_absoluto,
+    cargar_indice_de_voz,
+    indice_de_voz,
+    niveles_por_trama,
+    recortar_a_voz
+)
 
-WHISPER_MODEL_PATH = "openai/whisper-large-v3"
+def resolver_modelo_whisper(nombre):
+    """Convierte un tamaño corto ("base", "large-v3") en el identificador de Hugging Face."""
+    return nombre if "/" in nombre else f"openai/whisper-{nombre}"
+
+class MotorTranscripcion:
+    """
+    Mantiene el modelo de Whisper en memoria para reutilizarlo entre archivos.
+
+    El modelo se carga de forma perezosa en la primera transcripción (o con
+    `load()`) y permanece cargado hasta llamar a `unload()`.
+    """
+
+    def __init__(self, modelo=None, idioma=None):
+        self.modelo_id = resolver_modelo_whisper(modelo or WHISPER_CONFIG["model"])
+        self.idioma = idioma or WHISPER_CONFIG["language"]
+        self._pipeline = None
+        self._lock_carga = threading.Lock()
+        self._lock_inferencia = threading.Lock()
+
+    @property
+    def cargado(self):
+        return self._pipeline is not None
+
+    def load(self):
+        with self._lock_carga:
+            if self._pipeline is not None:
+                return self._pipeline
+
+            print(f"⏳ Cargando modelo Whisper '{self.modelo_id}'...")
+            usar_cuda = torch.cuda.is_available()
+            device = torch.device("cuda" if usar_cuda else "cpu")
+
+            model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                self.modelo_id,
+                torch_dtype=torch.float16 if usar_cuda else torch.float32,
+                low_cpu_mem_usage=True
+            ).to(device)
+
+            processor = AutoProcessor.from_pretrained(self.modelo_id)
+            self._pipeline = pipeline(
+                "automatic-speech-recognition",
+                model=model,
+                tokenizer=processor.tokenizer,
+                feature_extractor=processor.feature_extractor,
+                return_timestamps="word",
+                chunk_length_s=30,
+                stride_length_s=5,
+                batch_size=WHISPER_CONFIG["batch_size"],
+                device=0 if usar_cuda else -1
+            )
+            print("✅ Modelo Whisper cargado.")
+            return self._pipeline
+
+    def unload(self):
+        with self._lock_carga:
+            if self._pipeline is None:
+                return
+            self._pipeline = None
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+                torch.cuda.ipc_collect()
+            print(f"🧹 Modelo Whisper '{self.modelo_id}' liberado de memoria.")
+
+    def transcribir(self, segment_audio, sample_rate):
+        whisper_pipeline = self.load()
+        with self._lock_inferencia:
+            return whisper_pipeline(
+                {"raw": segment_audio, "sampling_rate": sample_rate},
+                generate_kwargs={"language": f"<|{self.idioma}|>"}
+            )
+
+    def transcribir_lote(self, audios, sample_rate, batch_size=None):
+        """Transcribe una lista de audios agrupándolos en lotes de `batch_size`."""
+        whisper_pipeline = self.load()
+        entradas = [{"raw": audio, "sampling_rate": sample_rate} for audio in audios]
+        with self._lock_inferencia:
+            return whisper_pipeline(
+                entradas,
+                batch_size=batch_size or WHISPER_CONFIG["batch_size"],
+                generate_kwargs={"language": f"<|{self.idioma}|>"}
+            )
+
+_motor_compartido = None
+_motor_lock = threading.Lock()
+
+def obtener_motor():
+    """Devuelve el motor de transcripción compartido por todo el proceso."""
+    global _motor_compartido
+    with _motor_lock:
+        if _motor_compartido is None:
+            _motor_compartido = MotorTranscripcion()
+        return _motor_compartido
 
 def reconstruir_words(segmento):
     start = segmento["start_time"]
@@ -32,70 +134,165 @@ def reconstruir_words(segmento):
 
     return words
 
-def transcripcion_de_audio(audio_path, diarization_results, output_dir="."):
-    print("🔄 Ejecutando transcripción con Whisper (large-v3) en español...")
+def empaquetar_segmentos(piezas, sample_rate, duracion_max=28.0, silencio=0.5):
+    """
+    Agrupa piezas cortas de audio en paquetes de hasta `duracion_max` segundos.
 
-    output_dir = os.path.abspath(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
+    `piezas` es una lista de tuplas (clave, audio). Cada paquete concatena sus
+    piezas separadas por `silencio` segundos de ceros y guarda, para cada una,
+    su desplazamiento dentro del paquete para poder devolver los tiempos.
+    Las piezas más largas que `duracion_max` forman un paquete propio.
+    """
+    muestras_max = int(duracion_max * sample_rate)
+    hueco = np.zeros(int(silencio * sample_rate), dtype=np.float32)
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-    model = AutoModelForSpeechSeq2Seq.from_pretrained(
-        WHISPER_MODEL_PATH,
-        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-        low_cpu_mem_usage=True
-    ).to(device)
-
-    processor = AutoProcessor.from_pretrained(WHISPER_MODEL_PATH)
-    whisper_pipeline = pipeline(
-        "automatic-speech-recognition",
-        model=model,
-        tokenizer=processor.tokenizer,
-        feature_extractor=processor.feature_extractor,
-        return_timestamps="word",
-        chunk_length_s=30,
-        stride_length_s=5,
-        batch_size=2,
-        device=0 if torch.cuda.is_available() else -1
-    )
+    paquetes = []
+    actual, ubicaciones, longitud = [], [], 0
+
+    def cerrar():
+        if actual:
+            paquetes.append({"audio": np.concatenate(actual), "piezas": list(ubicaciones)})
+
+    for clave, audio in piezas:
+        n = len(audio)
+        if n == 0:
+            continue
+        extra = n if not actual else n + len(hueco)
+        if actual and longitud + extra > muestras_max:
+            cerrar()
+            actual, ubicaciones, longitud = [], [], 0
+        if actual:
+            actual.append(hueco)
+            longitud += len(hueco)
+        ubicaciones.append((clave, longitud / sample_rate, n / sample_rate))
+        actual.append(audio.astype(np.float32, copy=False))
+        longitud += n
+    cerrar()
+
+    return paquetes
+
+def desempaquetar_resultados(paquetes, resultados):
+    """
+    Reparte las palabras de cada paquete entre las piezas que lo forman.
+
+    Devuelve un diccionario clave -> {"text", "chunks"} con los tiempos de cada
+    palabra relativos al inicio de su pieza, igual que una llamada individual.
+    """
+    por_clave = {}
+    for paquete, resultado in zip(paquetes, resultados):
+        piezas = paquete["piezas"]
+        for clave, _, _ in piezas:
+            por_clave[clave] = {"text": "", "chunks": []}
+
+        for chunk in resultado.get("chunks", []):
+            timestamp = chunk.get("timestamp", [None, None])
+            if timestamp[0] is None:
+                continue
+            clave, offset, _ = piezas[0]
+            for candidata in piezas:
+                if candidata[1] <= timestamp[0]:
+                    clave, offset, _ = candidata
+                else:
+                    break
+            fin = timestamp[1] - offset if timestamp[1] is not None else None
+            por_clave[clave]["chunks"].append({
+                "text": chunk["text"],
+                "timestamp": (max(timestamp[0] - offset, 0.0), fin)
+            })
+
+    for transcripcion in por_clave.values():
+        transcripcion["text"] = " ".join(c["text"].strip() for c in transcripcion["chunks"])
+    return por_clave
+
+def segmentos_a_transcribir(diarization_results, conservar_examinador=None):
+    """
+    Descarta los segmentos marcados como "examinador" por la diarización, para
+    que ni Whisper ni la extracción con IA procesen sus palabras. Los
+    segmentos sin rol se conservan.
+    """
+    if conservar_examinador is None:
+        conservar_examinador = WHISPER_CONFIG["keep_examiner"]
+    if conservar_examinador:
+        return diarization_results
 
-    audio_data, sample_rate = sf.read(audio_path)
+    seleccionados = [s for s in diarization_results if s.get("role") != "examinador"]
+    omitidos = len(diarization_results) - len(seleccionados)
+    if omitidos:
+        print(f"⏭️ {omitidos} segmentos del examinador omitidos")
+    return seleccionados
+
+def _recortar_segmentos(audio_path, diarization_results, solo_voz=None):
+    """
+    Audio de cada segmento de diarización.
+
+    Con `solo_voz`, cada segmento se reduce a sus regiones de voz (índice del
+    preprocesamiento, o calculado aquí si no existe) y se devuelve también su
+    mapa de tiempos; si no, el mapa es None y los tiempos son relativos al
+    inicio del segmento.
+    """
+    if solo_voz is None:
+        solo_voz = WHISPER_CONFIG["speech_only"]
+    audio_data, sample_rate = sf.read(audio_path, dtype="float32")
     if len(audio_data.shape) > 1:
         audio_data = np.mean(audio_data, axis=1)
 
-    transcriptions = []
-    for i, segment in enumerate(diarization_results):
-        start_sample = int(segment["start_time"] * sample_rate)
-        end_sample = int(segment["end_time"] * sample_rate)
-        segment_audio = audio_data[start_sample:end_sample]
+    regiones = None
+    if solo_voz:
+        regiones = cargar_indice_de_voz(audio_path)
+        if regiones is None:
+            regiones = indice_de_voz(niveles_por_trama(audio_data, sample_rate))
 
-        if len(segment_audio) == 0:
-            transcriptions.append({"text": "", "chunks": []})
-            continue
+    segmentos_audio, mapas = [], []
+    for segment in diarization_results:
+        if regiones is None:
+            start_sample = int(segment["start_time"] * sample_rate)
+            end_sample = int(segment["end_time"] * sample_rate)
+            segmentos_audio.append(audio_data[start_sample:end_sample])
+            mapas.append(None)
+        else:
+            audio_voz, mapa = recortar_a_voz(
+                audio_data, sample_rate, segment["start_time"], segment["end_time"],
+                regiones, hueco=WHISPER_CONFIG["speech_gap_seconds"]
+            )
+            segmentos_audio.append(audio_voz)
+            mapas.append(mapa)
 
-        result = whisper_pipeline(
-            {"raw": segment_audio, "sampling_rate": sample_rate},
-            generate_kwargs={"language": "<|es|>"}
-        )
-        transcriptions.append(result)
+    if regiones is not None:
+        total = sum(s["end_time"] - s["start_time"] for s in diarization_results)
+        enviados = sum(len(a) for a in segmentos_audio) / sample_rate
+        print(f"🔇 Solo voz: {enviados:.1f} s de {total:.1f} s de segmentos se envían a Whisper")
+    return segmentos_audio, sample_rate, mapas
 
-        if i % 3 == 0:
-            gc.collect()
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-                torch.cuda.ipc_collect()
+def _transcribir_empaquetado(motor, piezas, sample_rate):
+    paquetes = empaquetar_segmentos(
+        piezas,
+        sample_rate,
+        duracion_max=WHISPER_CONFIG["pack_max_seconds"],
+        silencio=WHISPER_CONFIG["pack_gap_seconds"]
+    )
+    if not paquetes:
+        return {}
+    print(f"📦 {len(piezas)} segmentos empaquetados en {len(paquetes)} lotes de hasta {WHISPER_CONFIG['pack_max_seconds']} s")
+    resultados = motor.transcribir_lote([p["audio"] for p in paquetes], sample_rate)
+    return desempaquetar_resultados(paquetes, resultados)
 
+def _guardar_transcripcion(diarization_results, transcriptions, output_dir, mapas=None):
     for i, segment in enumerate(diarization_results):
         segment_start = segment["start_time"]
+        mapa = mapas[i] if mapas else None
         segment["transcript"] = transcriptions[i]["text"].lower()
         segment["words"] = []
 
         for chunk in transcriptions[i].get("chunks", []):
             timestamp = chunk.get("timestamp", [None, None])
             if timestamp[0] is not None:
+                if mapa is not None and len(mapa):
+                    inicio = a_tiempo_absoluto(timestamp[0], mapa)
+                else:
+                    inicio = segment_start + timestamp[0]
                 segment["words"].append({
                     "word": chunk["text"].strip().lower(),
-                    "start": round(segment_start + timestamp[0], 2)
+                    "start": round(inicio, 2)
                 })
             else:
                 print(f"⚠️ Palabra sin tiempo de inicio omitida: '{chunk['text']}'")
@@ -116,17 +313,84 @@ def transcripcion_de_audio(audio_path, diarization_results, output_dir="."):
     print(f"✅ Transcripción completada y guardada en '{aligned_path}'.")
 
     palabras_con_tiempos = []
-    for segmento in diarization_results:
+    for indice, segmento in enumerate(diarization_results):
         for word in segmento.get("words", []):
             palabras_con_tiempos.append({
                 "word": word["word"],
-                "start": word["start"]
+                "start": word["start"],
+                "segment": indice,
+                "speaker": segmento.get("speaker", "")
             })
 
-    tiempos_path = os.path.join(output_dir, "palabras_con_tiempos.json")
-    with open(tiempos_path, "w", encoding="utf-8") as f:
-        json.dump(palabras_con_tiempos, f, indent=2, ensure_ascii=False)
+    tiempos_path = guardar_linea_de_tiempo(os.path.join(output_dir, "palabras_con_tiempos"), palabras_con_tiempos)
 
     print(f"📄 Archivo '{tiempos_path}' generado con todas las palabras y sus tiempos de inicio.")
 
+def transcripcion_de_audio(audio_path, diarization_results, output_dir=".", motor=None, empaquetar=None,
+                           conservar_examinador=None):
+    motor = motor or obtener_motor()
+    if empaquetar is None:
+        empaquetar = WHISPER_CONFIG["pack_segments"]
+    print(f"🔄 Ejecutando transcripción con Whisper ({motor.modelo_id}) en español...")
+    diarization_results = segmentos_a_transcribir(diarization_results, conservar_examinador)
+
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    segmentos_audio, sample_rate, mapas = _recortar_segmentos(audio_path, diarization_results)
+
+    vacio = {"text": "", "chunks": []}
+    if empaquetar:
+        por_clave = _transcribir_empaquetado(motor, list(enumerate(segmentos_audio)), sample_rate)
+        transcriptions = [por_clave.get(i, vacio) for i in range(len(segmentos_audio))]
+    else:
+        transcriptions = []
+        for segment_audio in segmentos_audio:
+            if len(segment_audio) == 0:
+                transcriptions.append(vacio)
+                continue
+            transcriptions.append(motor.transcribir(segment_audio, sample_rate))
+
+    _guardar_transcripcion(diarization_results, transcriptions, output_dir, mapas)
+
     return diarization_results
+
+def transcripcion_de_audio_multiple(trabajos, motor=None, conservar_examinador=None):
+    """
+    Transcribe varios archivos en una sola pasada por lotes.
+
+    `trabajos` es una lista de diccionarios con las claves `audio_path`,
+    `diarization_results` y `output_dir`. Los segmentos de todos los archivos
+    se empaquetan juntos, de modo que los turnos cortos de distintos archivos
+    comparten lotes de Whisper. Devuelve la lista de resultados de diarización
+    de cada trabajo, en el mismo orden.
+    """
+    motor = motor or obtener_motor()
+    print(f"🔄 Transcribiendo {len(trabajos)} archivos por lotes con Whisper ({motor.modelo_id})...")
+    trabajos = [
+        {**t, "diarization_results": segmentos_a_transcribir(t["diarization_results"], conservar_examinador)}
+        for t in trabajos
+    ]
+
+    piezas = []
+    mapas_por_trabajo = []
+    sample_rate = None
+    for n, trabajo in enumerate(trabajos):
+        segmentos_audio, sr, mapas = _recortar_segmentos(trabajo["audio_path"], trabajo["diarization_results"])
+        mapas_por_trabajo.append(mapas)
+        if sample_rate is not None and sr != sample_rate:
+            raise ValueError(f"Frecuencia de muestreo distinta en {trabajo['audio_path']}: {sr} != {sample_rate}")
+        sample_rate = sr
+        piezas.extend(((n, i), audio) for i, audio in enumerate(segmentos_audio))
+
+    por_clave = _transcribir_empaquetado(motor, piezas, sample_rate) if piezas else {}
+
+    vacio = {"text": "", "chunks": []}
+    for n, trabajo in enumerate(trabajos):
+        output_dir = os.path.abspath(trabajo["output_dir"])
+        os.makedirs(output_dir, exist_ok=True)
+        diarization_results = trabajo["diarization_results"]
+        transcriptions = [por_clave.get((n, i), vacio) for i in range(len(diarization_results))]
+        _guardar_transcripcion(diarization_results, transcriptions, output_dir, mapas_por_trabajo[n])
+
+    return [t["diarization_results"] for t in trabajos]
@@ -0,0 +1,15 @@
+"""
+Módulo de orquestación del pipeline.
+
+Contiene funciones para:
+- Ejecución de cada etapa sobre un archivo
+- Procesamiento por lotes con etapas concurrentes
+"""
+
+from .procesamiento_por_lotes import procesar_lote, listar_archivos
+
+__all__ = [
+    'procesar_lote',
+    'listar_archivos'
+]
+ 
\ No newline at end of file
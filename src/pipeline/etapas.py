@@ -0,0 +1,167 @@
+"""
+Etapas del pipeline para un archivo.
+
+Cada etapa recibe un diccionario `trabajo` con las rutas del archivo y
+devuelve una copia con las rutas que produjo, de forma que pueda ejecutarse
+en otro proceso o hilo sin estado compartido.
+
+Las etapas costosas pasan por la caché de `src.utils.cache_de_etapas`: si
+sus archivos de entrada y sus parámetros no cambiaron desde la última
+ejecución, se reutilizan las salidas registradas en el manifiesto.
+
+Los módulos de cada etapa se importan dentro de la función: los procesos del
+pool de CPU solo cargan lo que necesitan (no torch ni transformers).
+"""
+
+import hashlib
+import json
+import os
+
+from config import AI_CONFIG, AUDIO_CONFIG, DIARIZATION_CONFIG, WHISPER_CONFIG
+from src.utils.cache_de_etapas import ejecutar_con_cache
+
+def nombre_con_hash(archivo):
+    """Nombre sin extensión más los 8 primeros caracteres del SHA-1 de la ruta absoluta."""
+    raiz = os.path.splitext(os.path.basename(archivo))[0]
+    return f"{raiz}_{hashlib.sha1(os.path.abspath(archivo).encode('utf-8')).hexdigest()[:8]}"
+
+def nombres_unicos(archivos):
+    """
+    Nombre de la carpeta de resultados de cada archivo, en el mismo orden.
+
+    Es el nombre sin extensión. Si varios archivos distintos lo comparten
+    (a.mp4 y a.mov), cada uno usa `nombre_con_hash`: el sufijo depende solo
+    de la ruta del archivo, así que ese archivo vuelve siempre a la misma
+    carpeta y nunca ocupa la de otro archivo cuyo nombre ya tenga un sufijo.
+    """
+    rutas = [os.path.abspath(archivo) for archivo in archivos]
+    raices = [os.path.splitext(os.path.basename(ruta))[0] for ruta in rutas]
+    repetidas = {
+        raiz for raiz in raices
+        if len({ruta for ruta, otra in zip(rutas, raices) if otra == raiz}) > 1
+    }
+    return [nombre_con_hash(ruta) if raiz in repetidas else raiz for ruta, raiz in zip(rutas, raices)]
+
+def nuevo_trabajo(archivo, carpeta_resultados="resultados", nombre_base=None):
+    nombre_base = nombre_base or os.path.splitext(os.path.basename(archivo))[0]
+    output_dir = os.path.join(carpeta_resultados, nombre_base)
+    os.makedirs(output_dir, exist_ok=True)
+    return {
+        "archivo": archivo,
+        "nombre_base": nombre_base,
+        "output_dir": output_dir
+    }
+
+def completar_rutas(trabajo):
+    """
+    Rellena las rutas intermedias que falten con sus nombres convencionales,
+    para poder ejecutar una etapa suelta sobre resultados de una sesión previa.
+    """
+    output_dir = trabajo["output_dir"]
+    # Los audios intermedios llevan el nombre del archivo original, no el de la carpeta
+    nombre_base = os.path.splitext(os.path.basename(trabajo.get("archivo", trabajo["nombre_base"])))[0]
+
+    def primera_existente(*nombres):
+        rutas = [os.path.join(output_dir, nombre) for nombre in nombres]
+        return next((ruta for ruta in rutas if os.path.exists(ruta)), rutas[0])
+
+    por_defecto = {
+        "audio_file": primera_existente(f"{nombre_base}.wav", f"{nombre_base}.mp3"),
+        "processed_audio": primera_existente(
+            f"{nombre_base}_whisper_ready.wav",
+            f"{nombre_base}_converted_whisper_ready.wav"
+        ),
+        "diarization_path": os.path.join(output_dir, "diarization_results.json"),
+        "palabras_path": primera_existente("palabras_con_tiempos.npy", "palabras_con_tiempos.json"),
+        "lista_animales_path": primera_existente("lista_animales.npy", "lista_animales.json"),
+    }
+    return {**por_defecto, **trabajo}
+
+def etapa_conversion(trabajo):
+    from src.audio_processing.convertir_de_video_a_audio import convertir_de_video_a_audio
+
+    if AUDIO_CONFIG["pipe_decode"]:
+        # El preprocesamiento decodifica el original por tubería: no hay archivo intermedio
+        return {**trabajo, "audio_file": trabajo["archivo"]}
+
+    def ejecutar():
+        audio_file = convertir_de_video_a_audio(trabajo["archivo"], trabajo["output_dir"])
+        if not audio_file or not os.path.exists(audio_file):
+            raise RuntimeError(f"No se pudo obtener audio de {trabajo['archivo']}")
+        return {"audio_file": audio_file}
+
+    parametros = {k: AUDIO_CONFIG[k] for k in ("ingest_mode", "direct_decode", "sample_rate", "channels", "codec")}
+    salidas = ejecutar_con_cache(trabajo["output_dir"], "conversion", [trabajo["archivo"]], parametros, ejecutar)
+    return {**trabajo, **salidas}
+
+def etapa_preprocesamiento(trabajo):
+    from src.audio_processing.procesamiento_de_audio import EQ_TRANSCRIPCION, procesamiento_de_audio
+
+    def ejecutar():
+        processed_audio = procesamiento_de_audio(trabajo["audio_file"], output_dir=trabajo["output_dir"])
+        return {"processed_audio": processed_audio}
+
+    parametros = {"audio": AUDIO_CONFIG, "eq": EQ_TRANSCRIPCION}
+    salidas = ejecutar_con_cache(trabajo["output_dir"], "preprocesamiento", [trabajo["audio_file"]], parametros, ejecutar)
+    return {**trabajo, **salidas}
+
+def etapa_diarizacion(trabajo):
+    from src.audio_processing.diarizacion_de_personas import realizar_diarizacion
+
+    def ejecutar():
+        realizar_diarizacion(trabajo["processed_audio"], output_dir=trabajo["output_dir"])
+        return {"diarization_path": os.path.join(trabajo["output_dir"], "diarization_results.json")}
+
+    salidas = ejecutar_con_cache(trabajo["output_dir"], "diarizacion", [trabajo["processed_audio"]], DIARIZATION_CONFIG, ejecutar)
+    return {**trabajo, **salidas}
+
+def etapa_transcripcion(trabajo):
+    from src.audio_processing.deteccion_de_voz import parametros_vad, ruta_indice_de_voz
+    from src.audio_processing import transcripcion_de_audio
+
+    def ejecutar():
+        with open(trabajo["diarization_path"], encoding="utf-8") as f:
+            diarization_results = json.load(f)
+        transcripcion_de_audio(trabajo["processed_audio"], diarization_results, output_dir=trabajo["output_dir"])
+        return {
+            "aligned_path": os.path.join(trabajo["output_dir"], "aligned_transcription.json"),
+            "palabras_path": os.path.join(trabajo["output_dir"], "palabras_con_tiempos.npy")
+        }
+
+    # El recorte a voz depende del índice guardado por el preprocesamiento y de los parámetros vad_*
+    entradas = [trabajo["processed_audio"], trabajo["diarization_path"]]
+    indice_voz = ruta_indice_de_voz(trabajo["processed_audio"])
+    if WHISPER_CONFIG["speech_only"] and os.path.exists(indice_voz):
+        entradas.append(indice_voz)
+    parametros = {"whisper": WHISPER_CONFIG, "vad": parametros_vad()}
+    salidas = ejecutar_con_cache(trabajo["output_dir"], "transcripcion", entradas, parametros, ejecutar)
+    return {**trabajo, **salidas}
+
+def etapa_extraccion(trabajo):
+    from src.ai_analysis.extraer_animales_con_ai import extraer_animales_con_ai
+
+    def ejecutar():
+        extraer_animales_con_ai(
+            path_json=trabajo["palabras_path"],
+            model=AI_CONFIG["model"],
+            salida=trabajo["nombre_base"],
+            output_dir=trabajo["output_dir"]
+        )
+        lista_animales_path = os.path.join(trabajo["output_dir"], "lista_animales.npy")
+        if not os.path.exists(lista_animales_path):
+            raise RuntimeError("La extracción con IA no generó lista_animales.npy")
+        return {"lista_animales_path": lista_animales_path}
+
+    salidas = ejecutar_con_cache(trabajo["output_dir"], "extraccion", [trabajo["palabras_path"]], AI_CONFIG, ejecutar)
+    return {**trabajo, **salidas}
+
+def etapa_graficacion(trabajo):
+    # Sin caché: es la etapa más barata y la que más se modifica entre ejecuciones
+    from src.visualization.graficacion_de_resultados import graficacion_de_resultados
+
+    graficacion_de_resultados(
+        lista_animales_path=trabajo["lista_animales_path"],
+        nombre_salida=trabajo["nombre_base"],
+        output_dir=trabajo["output_dir"]
+    )
+    return trabajo
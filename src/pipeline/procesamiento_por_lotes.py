@@ -0,0 +1,173 @@
+"""
+Procesamiento por lotes con las etapas del pipeline ejecutándose en paralelo.
+
+Cada etapa tiene su propio ejecutor con un límite de concurrencia:
+
+- conversión y preprocesamiento (ffmpeg, DSP) en un pool de procesos,
+- diarización, transcripción y extracción con IA en pools de hilos pequeños,
+  para compartir una sola instancia de Whisper y no saturar Ollama,
+- graficación en un pool de procesos.
+
+Así, mientras un archivo se transcribe, el siguiente ya se está convirtiendo.
+
+Los pools de procesos usan el contexto "spawn": el lote se lanza desde un hilo
+de la interfaz gráfica y hacer fork con hilos de Tk activos no es seguro.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import BATCH_CONFIG
+from . import etapas
+
+EXTENSIONES_VALIDAS = (".mp4", ".mp3", ".wav", ".m4a", ".mov", ".mkv")
+
+ETAPAS = (
+    ("conversion", etapas.etapa_conversion, "cpu"),
+    ("preprocesamiento", etapas.etapa_preprocesamiento, "cpu"),
+    ("diarizacion", etapas.etapa_diarizacion, "diarizacion"),
+    ("transcripcion", etapas.etapa_transcripcion, "transcripcion"),
+    ("extraccion", etapas.etapa_extraccion, "llm"),
+    ("graficacion", etapas.etapa_graficacion, "graficacion"),
+)
+
+def listar_archivos(carpeta):
+    """Devuelve las rutas de los archivos de audio/video válidos de una carpeta."""
+    return [
+        os.path.join(carpeta, f) for f in sorted(os.listdir(carpeta))
+        if f.lower().endswith(EXTENSIONES_VALIDAS)
+    ]
+
+def _crear_ejecutores(limites):
+    contexto = multiprocessing.get_context("spawn")
+    return {
+        "cpu": ProcessPoolExecutor(max_workers=limites["cpu_workers"], mp_context=contexto),
+        "diarizacion": ThreadPoolExecutor(max_workers=limites["diarization_workers"], thread_name_prefix="diarizacion"),
+        "transcripcion": ThreadPoolExecutor(max_workers=limites["transcription_workers"], thread_name_prefix="transcripcion"),
+        "llm": ThreadPoolExecutor(max_workers=limites["llm_workers"], thread_name_prefix="llm"),
+        "graficacion": ProcessPoolExecutor(max_workers=limites["plot_workers"], mp_context=contexto),
+    }
+
+def procesar_lote(archivos, carpeta_resultados="resultados", al_progreso=None, cancelacion=None, limites=None):
+    """
+    Procesa una lista de archivos encadenando las etapas como un pipeline.
+
+    `al_progreso(nombre_base, etapa, estado, detalle)` se invoca siempre desde
+    el hilo que llamó a esta función. `cancelacion` es un `threading.Event`
+    opcional: al activarse, se cancelan las etapas aún no iniciadas y se
+    cierran los pools (`cancel_futures=True`); solo terminan las etapas en curso.
+    `limites` permite sobrescribir los valores de `BATCH_CONFIG`.
+
+    Cada archivo se guarda en `carpeta_resultados/<nombre>` con el nombre de
+    `etapas.nombres_unicos`, que también identifica al archivo en `al_progreso`.
+
+    Devuelve, en el orden de `archivos`, un diccionario por archivo con sus
+    rutas intermedias, `estado` ("completado", "error" o "cancelado") y
+    `mensaje`.
+    """
+    limites = {**BATCH_CONFIG, **(limites or {})}
+    if not limites["cpu_workers"]:
+        limites["cpu_workers"] = os.cpu_count() or 1
+
+    eventos = queue.Queue()
+    resultados = {}
+    futuros = set()
+    lock = threading.Lock()
+    ejecutores = _crear_ejecutores(limites)
+
+    def finalizar(trabajo, estado, mensaje=""):
+        with lock:
+            resultados[trabajo["nombre_base"]] = {**trabajo, "estado": estado, "mensaje": mensaje}
+        eventos.put((trabajo["nombre_base"], None, estado, mensaje))
+
+    def cancelado():
+        return cancelacion is not None and cancelacion.is_set()
+
+    def lanzar(trabajo, indice):
+        if cancelado():
+            finalizar(trabajo, "cancelado")
+            return
+        if indice == len(ETAPAS):
+            finalizar(trabajo, "completado")
+            return
+
+        nombre, funcion, recurso = ETAPAS[indice]
+        eventos.put((trabajo["nombre_base"], nombre, "iniciado", ""))
+        try:
+            futuro = ejecutores[recurso].submit(funcion, trabajo)
+        except Exception as e:
+            # Pool roto (un proceso murió) o ya cerrado: el archivo termina igual
+            eventos.put((trabajo["nombre_base"], nombre, "error", str(e)))
+            finalizar(trabajo, "cancelado" if cancelado() else "error", f"{nombre}: {e}")
+            return
+        with lock:
+            futuros.add(futuro)
+        futuro.add_done_callback(lambda f: continuar(f, trabajo, indice))
+
+    def continuar(futuro, trabajo, indice):
+        nombre = ETAPAS[indice][0]
+        with lock:
+            futuros.discard(futuro)
+        try:
+            siguiente = futuro.result()
+        except CancelledError:
+            finalizar(trabajo, "cancelado")
+            return
+        except Exception as e:
+            eventos.put((trabajo["nombre_base"], nombre, "error", str(e)))
+            finalizar(trabajo, "error", f"{nombre}: {e}")
+            return
+        eventos.put((trabajo["nombre_base"], nombre, "completado", ""))
+        lanzar(siguiente, indice + 1)
+
+    try:
+        nombres = etapas.nombres_unicos(archivos)
+        # Un mismo archivo listado dos veces se procesa una sola vez
+        trabajos = dict(zip(nombres, archivos))
+        for nombre_base, archivo in trabajos.items():
+            lanzar(etapas.nuevo_trabajo(archivo, carpeta_resultados, nombre_base), 0)
+
+        pendientes = len(trabajos)
+        cerrados = False
+        while pendientes:
+            if cancelado():
+                with lock:
+                    en_curso = list(futuros)
+                for futuro in en_curso:
+                    futuro.cancel()
+                if not cerrados:
+                    # Las etapas ya encoladas se descartan; las nuevas fallan al enviarse y se marcan canceladas
+                    for ejecutor in ejecutores.values():
+                        ejecutor.shutdown(wait=False, cancel_futures=True)
+                    cerrados = True
+            try:
+                nombre_base, etapa, estado, detalle = eventos.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if etapa is None:
+                pendientes -= 1
+            if al_progreso:
+                al_progreso(nombre_base, etapa, estado, detalle)
+    finally:
+        for ejecutor in ejecutores.values():
+            ejecutor.shutdown(wait=True, cancel_futures=cancelado())
+
+    return [resultados[nombre_base] for nombre_base in nombres]
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python -m src.pipeline.procesamiento_por_lotes <carpeta> [carpeta_resultados]")
+        sys.exit(1)
+
+    def imprimir(nombre_base, etapa, estado, detalle):
+        print(f"[{nombre_base}] {etapa or 'archivo'}: {estado} {detalle}".rstrip())
+
+    archivos = listar_archivos(sys.argv[1])
+    salida = procesar_lote(archivos, sys.argv[2] if len(sys.argv) == 3 else "resultados", al_progreso=imprimir)
+    completados = sum(1 for r in salida if r["estado"] == "completado")
+    print(f"📁 {completados}/{len(salida)} archivos procesados correctamente.")
@@ -3,12 +3,22 @@ Módulo de utilidades.
 
 Contiene funciones auxiliares para:
 - Corrección de datos
+- Líneas de tiempo de palabras en formato columnar
+- Normalización de texto
 - Validación de archivos
 - Funciones de ayuda
 """
 
-from .correccion_de_lista_animales import sobreescribir_tiempos
+from .correccion_de_lista_animales import alinear_tiempos, sobreescribir_tiempos
+from .linea_de_tiempo import cargar_linea_de_tiempo, cargar_registros, guardar_linea_de_tiempo
+from .normalizacion_de_texto import normalizar, normalizar_lote
 
 __all__ = [
-    'sobreescribir_tiempos'
+    'alinear_tiempos',
+    'sobreescribir_tiempos',
+    'cargar_linea_de_tiempo',
+    'cargar_registros',
+    'guardar_linea_de_tiempo',
+    'normalizar',
+    'normalizar_lote'
 ] 
\ No newline at end of file
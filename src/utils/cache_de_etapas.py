@@ -0,0 +1,99 @@
+"""
+Caché de etapas del pipeline direccionada por contenido.
+
+Cada carpeta `resultados/<nombre>/` guarda un manifiesto con, por etapa, la
+clave con la que se ejecutó (hash de sus archivos de entrada más sus
+parámetros) y las rutas que produjo. Si al volver a ejecutar la clave coincide
+y las salidas siguen existiendo, la etapa se omite.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFIESTO = "manifiesto_etapas.json"
+
+def _ruta_manifiesto(output_dir):
+    return os.path.join(output_dir, MANIFIESTO)
+
+def cargar_manifiesto(output_dir):
+    try:
+        with open(_ruta_manifiesto(output_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"etapas": {}, "hashes": {}}
+
+def guardar_manifiesto(output_dir, manifiesto):
+    ruta = _ruta_manifiesto(output_dir)
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+def hash_archivo(ruta, manifiesto=None, bloque=1 << 20):
+    """
+    SHA-256 del contenido de un archivo.
+
+    Si se pasa el manifiesto, el hash se memoriza por (tamaño, fecha de
+    modificación) para no volver a leer videos de varios GB en cada ejecución.
+    """
+    ruta = os.path.abspath(ruta)
+    estado = os.stat(ruta)
+    firma = [estado.st_size, estado.st_mtime_ns]
+    if manifiesto is not None:
+        guardado = manifiesto["hashes"].get(ruta)
+        if guardado and guardado["firma"] == firma:
+            return guardado["sha256"]
+
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for datos in iter(lambda: f.read(bloque), b""):
+            h.update(datos)
+    digest = h.hexdigest()
+
+    if manifiesto is not None:
+        manifiesto["hashes"][ruta] = {"firma": firma, "sha256": digest}
+    return digest
+
+def clave_etapa(etapa, entradas, parametros, manifiesto=None):
+    """Clave de una etapa: hash de sus entradas y de sus parámetros."""
+    contenido = {
+        "etapa": etapa,
+        "entradas": [hash_archivo(ruta, manifiesto) for ruta in entradas],
+        "parametros": parametros
+    }
+    serializado = json.dumps(contenido, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+def etapa_vigente(manifiesto, etapa, clave):
+    """Devuelve las salidas guardadas de la etapa si su clave coincide y siguen existiendo."""
+    registro = manifiesto["etapas"].get(etapa)
+    if not registro or registro["clave"] != clave:
+        return None
+    salidas = registro["salidas"]
+    for valor in salidas.values():
+        if isinstance(valor, str) and not os.path.exists(valor):
+            return None
+    return salidas
+
+def registrar_etapa(manifiesto, etapa, clave, salidas):
+    manifiesto["etapas"][etapa] = {"clave": clave, "salidas": salidas}
+
+def ejecutar_con_cache(output_dir, etapa, entradas, parametros, funcion):
+    """
+    Ejecuta `funcion()` solo si la etapa no tiene un resultado vigente.
+
+    `funcion` debe devolver un diccionario serializable con las salidas
+    (las rutas deben existir para considerarse vigentes en el futuro).
+    """
+    manifiesto = cargar_manifiesto(output_dir)
+    clave = clave_etapa(etapa, entradas, parametros, manifiesto)
+    salidas = etapa_vigente(manifiesto, etapa, clave)
+    if salidas is not None:
+        print(f"⏭️ Etapa '{etapa}' sin cambios: se reutilizan sus resultados.")
+        return salidas
+
+    salidas = funcion()
+    registrar_etapa(manifiesto, etapa, clave, salidas)
+    guardar_manifiesto(output_dir, manifiesto)
+    return salidas
@@ -1,50 +1,117 @@
 import json
-import unicodedata
-import re
-
-def normalize(text):
-    text = text.lower()
-    text = ''.join(
-        c for c in unicodedata.normalize('NFD', text)
-        if unicodedata.category(c) != 'Mn'
-    )  # Elimina tildes
-    text = re.sub(r'[^\wñ]+', '', text)  # Elimina puntuación
-    return text
+from bisect import bisect_left
+from difflib import get_close_matches
+
+from .linea_de_tiempo import cargar_registros
+from .normalizacion_de_texto import normalizar, normalizar_lote
+
+# Nombre histórico, usado por otros módulos
+normalize = normalizar
+
+def _indice_de_tiempos(transcripcion):
+    """Tiempos (en orden) por palabra normalizada."""
+    indice = {}
+    ordenada = sorted(transcripcion, key=lambda p: p["start"])
+    for key, palabra in zip(normalizar_lote(p["word"] for p in ordenada), ordenada):
+        indice.setdefault(key, []).append(palabra["start"])
+    return indice
+
+def _elegir_ocurrencia(tiempos, libres, desde, propuesto):
+    """
+    Posición en `libres` (índices ordenados de las ocurrencias aún sin usar)
+    de la ocurrencia con índice >= `desde` más cercana a `propuesto` (la
+    primera si no hay tiempo propuesto), o None si no queda ninguna.
+
+    Como los tiempos están ordenados, las únicas candidatas son las dos
+    ocurrencias libres que rodean a `propuesto`: ambas se hallan por bisección.
+    """
+    primera = bisect_left(libres, desde)
+    if primera == len(libres):
+        return None
+    if propuesto is None:
+        return primera
+    posicion = max(bisect_left(libres, bisect_left(tiempos, propuesto)), primera)
+    opciones = [j for j in (posicion - 1, posicion) if primera <= j < len(libres)]
+    return min(opciones, key=lambda j: (abs(tiempos[libres[j]] - propuesto), j))
+
+def alinear_tiempos(transcripcion, entradas, umbral=0.8):
+    """
+    Asigna a cada entrada de la IA el tiempo real de la palabra en la transcripción.
+
+    Cada palabra normalizada tiene sus propios tiempos y un tiempo ya asignado
+    nunca se reutiliza, así que dos palabras distintas dichas en el mismo
+    instante no chocan. Las entradas se recorren en el orden de los tiempos
+    que propuso la IA y, para cada palabra, las asignaciones son monótonas:
+    se elige la ocurrencia siguiente más cercana al tiempo propuesto. Si ya no
+    queda ninguna posterior (la IA desordenó o inventó tiempos), se usa la
+    ocurrencia libre más cercana. Un tiempo erróneo de la IA solo afecta a su
+    propia palabra. Las palabras que la IA escribió distinto se buscan por
+    similitud (`umbral`) entre las de la transcripción.
+
+    Args:
+        transcripcion: lista de {"word", "start"} (palabras_con_tiempos)
+        entradas: lista de {"word", "start", ...} devuelta por la IA
+
+    Returns:
+        Copia de `entradas`, en el mismo orden, con los tiempos corregidos y
+        `"alineada"`: False en las que no se encontraron en la transcripción
+        (esas conservan el tiempo de la IA).
+    """
+    indice = _indice_de_tiempos(transcripcion)
+    claves = list(indice)
+    similares = {}
+    libres = {key: list(range(len(tiempos))) for key, tiempos in indice.items()}
+    siguiente = dict.fromkeys(indice, 0)
+    alineadas = [dict(entrada) for entrada in entradas]
+
+    sin_alinear = 0
+    for entrada in sorted(alineadas, key=lambda e: e.get("start") or 0.0):
+        entrada["alineada"] = False
+        key = normalizar(entrada["word"])
+        if key not in indice:
+            if key not in similares:
+                cercanas = get_close_matches(key, claves, n=1, cutoff=umbral)
+                similares[key] = cercanas[0] if cercanas else None
+            key = similares[key]
+            if key is None:
+                print(f"⚠️ Palabra '{entrada['word']}' no encontrada en transcripción.")
+                sin_alinear += 1
+                continue
+
+        tiempos, propuesto = indice[key], entrada.get("start")
+        posicion = _elegir_ocurrencia(tiempos, libres[key], siguiente[key], propuesto)
+        monotona = posicion is not None
+        if not monotona:
+            posicion = _elegir_ocurrencia(tiempos, libres[key], 0, propuesto)
+        if posicion is None:
+            print(f"⚠️ Todos los tiempos para '{entrada['word']}' ya fueron usados.")
+            sin_alinear += 1
+            continue
+
+        elegido = libres[key].pop(posicion)
+        if monotona:
+            siguiente[key] = elegido + 1
+        entrada["start"] = tiempos[elegido]
+        entrada["alineada"] = True
+
+    if sin_alinear:
+        print(f"⚠️ {sin_alinear} entradas de la IA quedaron sin alinear (\"alineada\": false).")
+    return alineadas
 
 def sobreescribir_tiempos(transcripcion_path, ia_path):
-    # Cargar los dos JSON
-    with open(transcripcion_path, encoding="utf-8") as f:
-        transcripcion = json.load(f)
+    """Corrige los tiempos del JSON de la IA con los de la transcripción y lo sobrescribe."""
+    transcripcion = cargar_registros(transcripcion_path)
     with open(ia_path, encoding="utf-8") as f:
         ia = json.load(f)
 
-    # Indexar tiempos por palabra normalizada
-    tiempos_disponibles = {}
-    for palabra in transcripcion:
-        key = normalize(palabra["word"])
-        tiempos_disponibles.setdefault(key, []).append(palabra["start"])
-
-    usados = set()  # Para evitar reutilizar tiempos
-
-    # Sobrescribir los tiempos en el JSON de la IA
-    for entrada in ia:
-        key = normalize(entrada["word"])
-        if key in tiempos_disponibles:
-            for t in tiempos_disponibles[key]:
-                if t not in usados:
-                    entrada["start"] = t
-                    usados.add(t)
-                    break
-            else:
-                print(f"⚠️ Todos los tiempos para '{entrada['word']}' ya fueron usados.")
-        else:
-            print(f"⚠️ Palabra '{entrada['word']}' no encontrada en transcripción.")
+    ia = alinear_tiempos(transcripcion, ia)
 
     # Sobrescribe el archivo original de IA con los tiempos corregidos
     with open(ia_path, "w", encoding="utf-8") as f:
         json.dump(ia, f, indent=2, ensure_ascii=False)
 
     print(f"✅ Tiempos sobrescritos directamente en: {ia_path}")
+    return ia
 
 # USO
 # sobreescribir_tiempos("transcripcion.json", "ia_animales.json")
@@ -0,0 +1,113 @@
+"""
+Almacenamiento columnar de líneas de tiempo de palabras.
+
+Las palabras transcritas y los animales detectados se guardan como un arreglo
+estructurado de NumPy (`.npy`) con una columna por campo: palabra, tiempo de
+inicio, índice de segmento, hablante y banderas. El archivo se puede abrir con
+`mmap_mode="r"`, de forma que los análisis de cohorte leen solo las columnas
+que usan sin interpretar JSON. El JSON se conserva como exportación opcional
+(`OUTPUT_CONFIG["export_json"]`).
+"""
+
+import json
+import os
+
+import numpy as np
+
+from config import OUTPUT_CONFIG
+
+def dtype_linea(ancho_palabra=32, ancho_hablante=16):
+    """
+    Tipo del arreglo de la línea de tiempo. Las columnas de texto miden al
+    menos 32 (palabra) y 16 (hablante) caracteres y se amplían cuando los
+    datos son más largos, para no truncarlos al guardar.
+    """
+    return np.dtype([
+        ("word", f"U{max(ancho_palabra, 32)}"),
+        ("start", "f8"),
+        ("segment", "i4"),
+        ("speaker", f"U{max(ancho_hablante, 16)}"),
+        ("flags", "u1")
+    ])
+
+DTYPE_LINEA = dtype_linea()
+
+FLAG_POSIBLE = 1
+FLAG_SIN_ALINEAR = 2  # La IA dio un tiempo que no se encontró en la transcripción
+
+CAMPOS_PALABRAS = ("word", "start")
+CAMPOS_ANIMALES = ("word", "start", "posible", "alineada")
+
+def a_columnas(registros):
+    """Convierte una lista de diccionarios {"word", "start", ...} en un arreglo estructurado."""
+    if not registros:
+        return np.zeros(0, dtype=DTYPE_LINEA)
+    palabras = [str(r["word"]) for r in registros]
+    hablantes = [str(r.get("speaker", "")) for r in registros]
+    linea = np.zeros(len(registros), dtype=dtype_linea(max(map(len, palabras)), max(map(len, hablantes))))
+    linea["word"] = palabras
+    linea["start"] = [float(r["start"]) for r in registros]
+    linea["segment"] = [int(r.get("segment", -1)) for r in registros]
+    linea["speaker"] = hablantes
+    linea["flags"] = [
+        (FLAG_POSIBLE if r.get("posible", False) else 0) | (0 if r.get("alineada", True) else FLAG_SIN_ALINEAR)
+        for r in registros
+    ]
+    return linea
+
+def a_registros(linea, campos=CAMPOS_PALABRAS):
+    """Convierte un arreglo estructurado en la lista de diccionarios de los JSON de siempre."""
+    columnas = {}
+    for campo in campos:
+        if campo == "posible":
+            columnas[campo] = ((linea["flags"] & FLAG_POSIBLE) != 0).tolist()
+        elif campo == "alineada":
+            columnas[campo] = ((linea["flags"] & FLAG_SIN_ALINEAR) == 0).tolist()
+        else:
+            columnas[campo] = linea[campo].tolist()
+    return [dict(zip(campos, valores)) for valores in zip(*(columnas[c] for c in campos))]
+
+def _sin_extension(ruta):
+    base, extension = os.path.splitext(ruta)
+    return base if extension in (".npy", ".json") else ruta
+
+def guardar_linea_de_tiempo(ruta, registros, campos_json=CAMPOS_PALABRAS, exportar_json=None):
+    """
+    Guarda la línea de tiempo en `<ruta>.npy` y, si corresponde, también en
+    `<ruta>.json` con los campos `campos_json`. Devuelve la ruta del `.npy`.
+    """
+    base = _sin_extension(ruta)
+    exportar_json = OUTPUT_CONFIG["export_json"] if exportar_json is None else exportar_json
+    linea = registros if isinstance(registros, np.ndarray) else a_columnas(registros)
+
+    ruta_npy = base + ".npy"
+    temporal = base + ".tmp.npy"
+    np.save(temporal, linea)
+    os.replace(temporal, ruta_npy)
+
+    if exportar_json:
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(a_registros(linea, campos_json), f, indent=2, ensure_ascii=False)
+    return ruta_npy
+
+def resolver_ruta(ruta):
+    """Devuelve `ruta` si existe; si no, la misma línea de tiempo en el otro formato (.npy/.json)."""
+    if os.path.exists(ruta):
+        return ruta
+    base = _sin_extension(ruta)
+    for extension in (".npy", ".json"):
+        if os.path.exists(base + extension):
+            return base + extension
+    raise FileNotFoundError(2, "No existe la línea de tiempo", ruta)
+
+def cargar_linea_de_tiempo(ruta, mmap=True):
+    """Carga una línea de tiempo desde `.npy` (mapeada en memoria) o desde el JSON exportado."""
+    ruta = resolver_ruta(ruta)
+    if ruta.endswith(".npy"):
+        return np.load(ruta, mmap_mode="r" if mmap else None)
+    with open(ruta, encoding="utf-8") as f:
+        return a_columnas(json.load(f))
+
+def cargar_registros(ruta, campos=CAMPOS_PALABRAS):
+    """Carga una línea de tiempo como lista de diccionarios, sea cual sea su formato."""
+    return a_registros(cargar_linea_de_tiempo(ruta, mmap=False), campos)
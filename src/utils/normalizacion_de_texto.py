@@ -0,0 +1,38 @@
+"""
+Normalización de palabras para compararlas entre sí.
+
+Minúsculas, sin tildes (ñ -> n) y sin puntuación. El vocabulario de una
+prueba de fluidez es pequeño y muy repetitivo, así que cada forma distinta se
+normaliza una sola vez y se memoriza. `normalizar_lote` normaliza una lista o
+arreglo completo de palabras en una sola llamada; la usan la corrección de
+tiempos, el léxico de animales y el conteo de repeticiones.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+_NO_PALABRA = re.compile(r'[^\wñ]+')
+
+@lru_cache(maxsize=65536)
+def normalizar(texto):
+    texto = unicodedata.normalize('NFD', texto.lower())
+    texto = ''.join(c for c in texto if unicodedata.category(c) != 'Mn')  # Elimina tildes
+    return _NO_PALABRA.sub('', texto)  # Elimina puntuación
+
+def normalizar_lote(palabras):
+    """
+    Normaliza todas las palabras de una vez.
+
+    Con un arreglo de NumPy (p. ej. la columna `word` de una línea de tiempo)
+    solo se normalizan sus valores distintos y se devuelve un arreglo; con
+    cualquier otro iterable, una lista.
+    """
+    if isinstance(palabras, np.ndarray):
+        if not palabras.size:
+            return palabras.astype(str)
+        unicas, inversa = np.unique(palabras.astype(str), return_inverse=True)
+        return np.array([normalizar(p) for p in unicas.tolist()])[inversa.reshape(palabras.shape)]
+    return [normalizar(str(p)) for p in palabras]
@@ -4,11 +4,20 @@ Módulo de visualización y generación de gráficas.
 Contiene funciones para:
 - Generación de gráficas de fluidez
 - Análisis estadístico
+- Métricas de fluidez vectorizadas (por sesión y por cohorte)
+- Agregación de resultados de la cohorte con los datos de los pacientes
 - Creación de reportes visuales
 """
 
-from .graficacion_de_resultados import graficacion_de_resultados
+from .graficacion_de_resultados import graficacion_de_resultados, graficacion_por_lotes
+from .metricas_fluidez import metricas_cohorte, resumen_fluidez
+from .agregacion_de_cohorte import agregar_cohorte, leer_resumenes
 
 __all__ = [
-    'graficacion_de_resultados'
+    'graficacion_de_resultados',
+    'graficacion_por_lotes',
+    'metricas_cohorte',
+    'resumen_fluidez',
+    'agregar_cohorte',
+    'leer_resumenes'
 ] 
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+Agregación de las métricas de fluidez de toda la cohorte.
+
+Lee una sola vez todos los `resultados/*/resumen_fluidez_*.json` (en paralelo
+y apoyándose en un índice que guarda las métricas de cada resumen junto con
+su tamaño y fecha de modificación), arma un único DataFrame con
+`FLUENCY_METRICS` y lo une con los datos de los pacientes mediante un join
+vectorizado por nombre normalizado.
+
+Cada video se identifica por el nombre de su carpeta de resultados, según el
+contrato `resultados/<video>/resumen_fluidez_<video>.json`.
+"""
+
+import glob
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config import FLUENCY_METRICS
+
+NOMBRE_INDICE = "indice_resumenes.json"
+PREFIJO_RESUMEN = "resumen_fluidez_"
+
+def normalizar_nombres(serie):
+    """Mayúsculas, sin tildes y con espacios colapsados, para unir nombres escritos de formas distintas."""
+    return (
+        serie.astype("string")
+        .str.normalize("NFKD")
+        .str.encode("ascii", errors="ignore")
+        .str.decode("ascii")
+        .str.upper()
+        .str.split()
+        .str.join(" ")
+    )
+
+def _video_de(ruta):
+    """Nombre de la carpeta del resumen, o None si el archivo no sigue el contrato."""
+    video = os.path.basename(os.path.dirname(ruta))
+    return video if os.path.basename(ruta) == f"{PREFIJO_RESUMEN}{video}.json" else None
+
+def _leer_resumen(ruta, metricas):
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            resumen = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Error al procesar {ruta}: {e}")
+        return None
+    return {m: resumen.get(m) for m in metricas}
+
+def leer_resumenes(carpeta_resultados="resultados", metricas=None, workers=None, usar_indice=True):
+    """
+    DataFrame con una fila por video (`video`) y una columna por métrica.
+
+    Con `usar_indice`, solo se vuelven a leer los resúmenes que cambiaron desde
+    la última agregación; el resto sale de `<carpeta_resultados>/indice_resumenes.json`.
+    """
+    metricas = list(metricas or FLUENCY_METRICS)
+    rutas = []
+    for ruta in sorted(glob.glob(os.path.join(carpeta_resultados, "*", f"{PREFIJO_RESUMEN}*.json"))):
+        if _video_de(ruta):
+            rutas.append(ruta)
+        else:
+            print(f"⚠️ Resumen ignorado, su nombre no coincide con su carpeta: {ruta}")
+
+    ruta_indice = os.path.join(carpeta_resultados, NOMBRE_INDICE)
+    indice = {}
+    if usar_indice and os.path.exists(ruta_indice):
+        try:
+            with open(ruta_indice, "r", encoding="utf-8") as f:
+                indice = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            indice = {}
+
+    nuevo_indice = {}
+    pendientes = []
+    for ruta in rutas:
+        estado = os.stat(ruta)
+        firma = [estado.st_size, estado.st_mtime_ns]
+        entrada = indice.get(ruta)
+        if entrada and entrada["firma"] == firma and all(m in entrada["metricas"] for m in metricas):
+            nuevo_indice[ruta] = entrada
+        else:
+            pendientes.append((ruta, firma))
+
+    if pendientes:
+        with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as ejecutor:
+            leidos = ejecutor.map(lambda p: _leer_resumen(p[0], metricas), pendientes)
+            for (ruta, firma), valores in zip(pendientes, leidos):
+                if valores is not None:
+                    nuevo_indice[ruta] = {"firma": firma, "metricas": valores}
+
+    if usar_indice and (pendientes or len(nuevo_indice) != len(indice)):
+        temporal = ruta_indice + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(nuevo_indice, f, ensure_ascii=False)
+        os.replace(temporal, ruta_indice)
+
+    filas = [
+        {"video": _video_de(ruta), **entrada["metricas"]}
+        for ruta, entrada in nuevo_indice.items()
+    ]
+    resumenes = pd.DataFrame(filas, columns=["video"] + metricas)
+    resumenes[metricas] = resumenes[metricas].apply(pd.to_numeric, errors="coerce")
+    return resumenes
+
+def unir_con_pacientes(df_pacientes, asociaciones, resumenes, columna_nombre="NOMBRE"):
+    """
+    Une los datos de los pacientes con sus métricas.
+
+    Args:
+        df_pacientes: DataFrame con una columna de nombre (`columna_nombre`)
+        asociaciones: dict video -> nombre del paciente (asociaciones.json)
+        resumenes: DataFrame de `leer_resumenes`; si un video aparece más de
+            una vez se conserva su última fila para no duplicar pacientes
+    """
+    duplicados = resumenes["video"].duplicated(keep="last")
+    if duplicados.any():
+        print(f"⚠️ Videos con más de un resumen, se usa el último: {sorted(set(resumenes.loc[duplicados, 'video']))}")
+        resumenes = resumenes[~duplicados]
+
+    videos = pd.DataFrame(list(asociaciones.items()), columns=["video", "_nombre"])
+    videos["_clave"] = normalizar_nombres(videos["_nombre"])
+    videos = videos.drop_duplicates("_clave", keep="last").drop(columns="_nombre")
+
+    df = df_pacientes.copy()
+    df["_clave"] = normalizar_nombres(df[columna_nombre])
+    df = df.merge(videos, on="_clave", how="left").merge(resumenes, on="video", how="left")
+    return df.drop(columns="_clave")
+
+def agregar_cohorte(asociaciones_path, sav_path, carpeta_resultados="resultados", metricas=None):
+    """Carga asociaciones, datos SPSS y resúmenes, y devuelve la tabla de la cohorte completa."""
+    with open(asociaciones_path, "r", encoding="utf-8") as f:
+        asociaciones = json.load(f)
+    df_pacientes = pd.read_spss(sav_path)
+    resumenes = leer_resumenes(carpeta_resultados, metricas)
+    return unir_con_pacientes(df_pacientes, asociaciones, resumenes)
@@ -1,31 +1,67 @@
 import json
-import matplotlib.pyplot as plt
 import numpy as np
 from collections import Counter
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from config import BATCH_CONFIG, VISUALIZATION_CONFIG
+from src.utils.normalizacion_de_texto import normalizar, normalizar_lote
+from src.utils.linea_de_tiempo import CAMPOS_ANIMALES, cargar_registros
+from .metricas_fluidez import agrupamiento_y_cambios, contar_repeticiones, fluidez_acumulada, resumen_fluidez
 
 # === Fluidez acumulada por palabra ===
 def calcular_fluidez_acumulada(data):
-    data = sorted(data, key=lambda x: x['start'])
-    tiempos = []
-    fluidez = []
-
-    tiempo_inicio = data[0]['start']
-
-    for i, entrada in enumerate(data, 1):
-        t = entrada['start'] - tiempo_inicio
-        minutos = t / 60
-        fpm = i / minutos if minutos > 0 else 0
-        tiempos.append(round(t, 2))
-        fluidez.append(fpm)
-
-    return tiempos, fluidez
+    tiempos, fluidez = fluidez_acumulada([entrada['start'] for entrada in data])
+    return np.round(tiempos, 2).tolist(), fluidez.tolist()
+
+# === Renderizado sin interfaz gráfica (Agg) ===
+PERFILES_GRAFICA = {
+    "standard": {"dpi": 100, "formato": "png"},
+    "preview": {"dpi": 50, "formato": "png"},
+    "vector": {"dpi": 100, "formato": "svg"}
+}
+
+_lienzos = threading.local()
+
+def _lienzo_fluidez():
+    """
+    Figura de fluidez reutilizable, una por hilo/proceso: entre sesiones solo
+    se actualizan los datos de la línea en lugar de crear ejes y artistas nuevos.
+    """
+    lienzo = getattr(_lienzos, "fluidez", None)
+    if lienzo is None:
+        fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        linea, = ax.plot([], [], marker='o', linestyle='-', label="Fluidez acumulada")
+        ax.set_title("Evolución de la Fluidez Verbal (Real)")
+        ax.set_xlabel("Tiempo (s)")
+        ax.set_ylabel("Palabras por minuto acumuladas")
+        ax.grid(True)
+        ax.legend()
+        fig.subplots_adjust(left=0.08, right=0.98, top=0.92, bottom=0.1)
+        lienzo = _lienzos.fluidez = (fig, ax, linea)
+    return lienzo
+
+def dibujar_fluidez(tiempos, fluidez, ruta_sin_extension, perfil=None):
+    """Dibuja la curva de fluidez con el perfil indicado y devuelve la ruta del archivo."""
+    perfil = PERFILES_GRAFICA[perfil or VISUALIZATION_CONFIG["plot_profile"]]
+    fig, ax, linea = _lienzo_fluidez()
+    linea.set_data(tiempos, fluidez)
+    ax.set_xlim(0, tiempos[-1] + 5)
+    ax.relim()
+    ax.autoscale_view(scalex=False)
+
+    ruta = f"{ruta_sin_extension}.{perfil['formato']}"
+    fig.savefig(ruta, dpi=perfil["dpi"], format=perfil["formato"])
+    return ruta
 
 # === Función principal solo con evolución real ===
-def graficacion_de_resultados(lista_animales_path="lista_animales.json", nombre_salida="salida", incluir_posibles=True, output_dir="."):
-    with open(lista_animales_path, encoding="utf-8") as f:
-        animales = json.load(f)
+def graficacion_de_resultados(lista_animales_path="lista_animales.json", nombre_salida="salida", incluir_posibles=True, output_dir=".", perfil=None):
+    animales = cargar_registros(lista_animales_path, CAMPOS_ANIMALES)
 
     if not animales:
         print("⚠️ No se encontraron animales en el archivo.")
@@ -41,30 +77,15 @@ def graficacion_de_resultados(lista_animales_path="lista_animales.json", nombre_
         return
 
     # Calcular fluidez verbal acumulada
-    tiempos, fluidez = calcular_fluidez_acumulada(animales_filtrados)
+    animales_filtrados = sorted(animales_filtrados, key=lambda a: a['start'])
+    starts = np.array([a['start'] for a in animales_filtrados], dtype=np.float64)
+    tiempos, fluidez = fluidez_acumulada(starts)
 
     # Graficar evolución real
-    plt.figure(figsize=(10, 5))
-    plt.plot(tiempos, fluidez, marker='o', linestyle='-', label="Fluidez acumulada")
-    plt.title("Evolución de la Fluidez Verbal (Real)")
-    plt.xlabel("Tiempo (s)")
-    plt.ylabel("Palabras por minuto acumuladas")
-    plt.grid(True)
-    plt.xlim(0, tiempos[-1] + 5)
-    plt.legend()
-    plt.tight_layout()
-
-    img_path = os.path.join(output_dir, f"fluidez_{nombre_salida}.png")
-    plt.savefig(img_path)
-    plt.close()
+    img_path = dibujar_fluidez(tiempos, fluidez, os.path.join(output_dir, f"fluidez_{nombre_salida}"), perfil)
 
     # Estadísticas
-    media_fpm = float(np.mean(fluidez))
-    std_fpm = float(np.std(fluidez))
-    fpm_final = float(fluidez[-1])
-    tiempo_inicial = round(tiempos[0], 2)
-    tiempo_final = round(tiempos[-1], 2)
-    total_palabras = len(animales_filtrados)
+    metricas = resumen_fluidez(starts)
     nombres_animales = [a['word'] for a in animales_filtrados if 'word' in a]
 
     # Cargar grupos semánticos si existe
@@ -75,27 +96,26 @@ def graficacion_de_resultados(lista_animales_path="lista_animales.json", nombre_
         with open(grupos_path, encoding="utf-8") as f:
             grupos_semanticos = json.load(f)
 
-            print(f"Grupos semanticos items: {grupos_semanticos.items()}")
-
         for grupo, lista in grupos_semanticos.items():
-            print(f"Lista: {lista}")
-            conteo = len(lista)
-            conteo_por_grupo[grupo] = conteo
-            print(f"Grupo: {grupo} - Conteo: {conteo}")
+            conteo_por_grupo[grupo] = len(lista)
+
+    # Agrupamiento y cambios entre categorías en el orden en que se dijeron
+    categoria_por_palabra = {
+        normalizar(palabra): grupo for grupo, lista in grupos_semanticos.items() for palabra in lista
+    }
+    claves = normalizar_lote(nombres_animales)
+    categorias = [categoria_por_palabra.get(clave, "otros") for clave in claves]
 
     resumen = {
-        "tiempo_inicio": tiempo_inicial,
-        "tiempo_final": tiempo_final,
-        "total_palabras": total_palabras,
-        "ppm_promedio": round(media_fpm, 2),
-        "desviacion_estandar": round(std_fpm, 2),
-        "ppm_final": round(fpm_final, 2),
+        **metricas,
+        **agrupamiento_y_cambios(categorias),
+        "repeticiones": contar_repeticiones(claves),
         "animales": nombres_animales,
         "grupos_semanticos": grupos_semanticos,
         "conteo_por_grupo": conteo_por_grupo
     }
 
-    print(f"✅ Fluidez promedio: {media_fpm:.2f} ppm | Desviación estándar: {std_fpm:.2f} | Final: {fpm_final:.2f} ppm")
+    print(f"✅ Fluidez promedio: {metricas['ppm_promedio']:.2f} ppm | Desviación estándar: {metricas['desviacion_estandar']:.2f} | Final: {metricas['ppm_final']:.2f} ppm")
     print(f"📈 Gráfica guardada como: {img_path}")
 
     # Guardar resumen en JSON
@@ -107,9 +127,24 @@ def graficacion_de_resultados(lista_animales_path="lista_animales.json", nombre_
     # Guardar también en Excel
     excel_path = os.path.join(output_dir, f"fluidez_{nombre_salida}.xlsx")
     df = pd.DataFrame([resumen])
-    df.drop(columns=["animales", "grupos_semanticos"], errors="ignore").to_excel(excel_path, index=False)
+    df.drop(columns=["animales", "grupos_semanticos", "conteo_por_intervalo"], errors="ignore").to_excel(excel_path, index=False)
     print(f"📄 Excel guardado en: {excel_path}")
 
+def _graficar_trabajo(trabajo):
+    return graficacion_de_resultados(**trabajo)
+
+def graficacion_por_lotes(trabajos, workers=None, perfil=None):
+    """
+    Genera las gráficas y resúmenes de muchas sesiones en un pool de procesos.
+    Cada trabajo es un diccionario con los argumentos de `graficacion_de_resultados`
+    (lista_animales_path, nombre_salida, output_dir...). Cada proceso reutiliza su figura.
+    """
+    trabajos = [{"perfil": perfil, **trabajo} for trabajo in trabajos]
+    workers = workers or BATCH_CONFIG["plot_workers"]
+    with ProcessPoolExecutor(max_workers=workers) as ejecutor:
+        list(ejecutor.map(_graficar_trabajo, trabajos, chunksize=max(1, len(trabajos) // (workers * 4))))
+
+
 
 
 
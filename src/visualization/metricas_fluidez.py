@@ -0,0 +1,184 @@
+"""
+Métricas de fluidez verbal sobre arreglos de tiempos.
+
+Todas las funciones trabajan con arreglos de NumPy de tiempos de inicio (en
+segundos) en lugar de listas de diccionarios. `metricas_cohorte` calcula las
+mismas métricas para muchas sesiones a la vez a partir de un único arreglo
+concatenado y las longitudes de cada sesión, sin bucles de Python por
+palabra ni por sesión.
+"""
+
+import numpy as np
+
+def fluidez_acumulada(starts):
+    """
+    Palabras por minuto acumuladas en cada respuesta.
+
+    Returns:
+        (tiempos, ppm): tiempo relativo a la primera respuesta y ppm acumuladas
+        (0 mientras el tiempo transcurrido sea 0).
+    """
+    t = np.sort(np.asarray(starts, dtype=np.float64))
+    t = t - t[0] if t.size else t
+    conteo = np.arange(1, t.size + 1, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ppm = np.where(t > 0, conteo * 60.0 / t, 0.0)
+    return t, ppm
+
+def latencias(starts):
+    """Tiempo entre respuestas consecutivas (s)."""
+    return np.diff(np.sort(np.asarray(starts, dtype=np.float64)))
+
+def conteo_por_intervalo(starts, ancho=15.0, duracion=60.0):
+    """Número de respuestas en cada intervalo de `ancho` segundos desde la primera respuesta."""
+    t, _ = fluidez_acumulada(starts)
+    minimo = int(np.ceil(duracion / ancho))
+    if not t.size:
+        return np.zeros(minimo, dtype=np.int64)
+    return np.bincount((t // ancho).astype(np.int64), minlength=minimo)
+
+def agrupamiento_y_cambios(categorias):
+    """
+    Agrupamiento (clustering) y cambios (switching) según la secuencia de
+    categorías semánticas de las respuestas, en orden temporal.
+
+    Un grupo es una racha de respuestas consecutivas de la misma categoría; su
+    tamaño se cuenta desde la segunda palabra (una palabra suelta mide 0).
+    """
+    codigos = np.unique(np.asarray(categorias), return_inverse=True)[1] if len(categorias) else np.array([], dtype=np.int64)
+    if not codigos.size:
+        return {"cambios": 0, "grupos": 0, "tamano_medio_grupo": 0.0}
+    limites = np.flatnonzero(codigos[1:] != codigos[:-1]) + 1
+    longitudes = np.diff(np.concatenate(([0], limites, [codigos.size])))
+    return {
+        "cambios": int(limites.size),
+        "grupos": int(longitudes.size),
+        "tamano_medio_grupo": float(np.mean(longitudes - 1))
+    }
+
+def contar_repeticiones(claves):
+    """Respuestas repetidas (perseveraciones): total menos palabras distintas."""
+    claves = np.asarray(claves)
+    return int(claves.size - np.unique(claves).size) if claves.size else 0
+
+def resumen_fluidez(starts, ancho_intervalo=15.0):
+    """Métricas de una sesión a partir de los tiempos de inicio de sus respuestas."""
+    t, ppm = fluidez_acumulada(starts)
+    lat = np.diff(t)
+    return {
+        "tiempo_inicio": round(float(t[0]), 2),
+        "tiempo_final": round(float(t[-1]), 2),
+        "total_palabras": int(t.size),
+        "ppm_promedio": round(float(np.mean(ppm)), 2),
+        "desviacion_estandar": round(float(np.std(ppm)), 2),
+        "ppm_final": round(float(ppm[-1]), 2),
+        "latencia_media": round(float(np.mean(lat)), 2) if lat.size else 0.0,
+        "latencia_mediana": round(float(np.median(lat)), 2) if lat.size else 0.0,
+        "conteo_por_intervalo": conteo_por_intervalo(t, ancho_intervalo).tolist()
+    }
+
+def metricas_cohorte(starts, longitudes, claves=None, categorias=None, ancho_intervalo=15.0, duracion=60.0):
+    """
+    Métricas de fluidez de muchas sesiones a la vez.
+
+    Args:
+        starts: tiempos de todas las sesiones concatenados, sesión tras sesión
+        longitudes: número de respuestas de cada sesión
+        claves: palabras normalizadas alineadas con `starts` (opcional, para
+            `repeticiones`)
+        categorias: categoría semántica de cada respuesta alineada con `starts`
+            (opcional, para `cambios`, `grupos` y `tamano_medio_grupo`)
+
+    Returns:
+        dict de arreglos (uno por métrica) alineados con `longitudes`; las
+        métricas en segundos o ppm de las sesiones vacías quedan en NaN.
+        `conteo_por_intervalo` es una matriz (sesiones x intervalos) con tantas
+        columnas como la sesión más larga; las demás se completan con ceros.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.int64)
+    n_sesiones = longitudes.size
+    inicios = np.concatenate(([0], np.cumsum(longitudes)[:-1])).astype(np.int64)
+    minimo_intervalos = int(np.ceil(duracion / ancho_intervalo))
+
+    resultado = {
+        clave: np.full(n_sesiones, np.nan)
+        for clave in (
+            "tiempo_final", "ppm_promedio", "desviacion_estandar", "ppm_final", "latencia_media", "latencia_mediana"
+        )
+    }
+    resultado["total_palabras"] = longitudes.copy()
+    resultado["conteo_por_intervalo"] = np.zeros((n_sesiones, minimo_intervalos), dtype=np.int64)
+    if claves is not None:
+        resultado["repeticiones"] = np.zeros(n_sesiones, dtype=np.int64)
+    if categorias is not None:
+        resultado["cambios"] = np.zeros(n_sesiones, dtype=np.int64)
+        resultado["grupos"] = np.zeros(n_sesiones, dtype=np.int64)
+        resultado["tamano_medio_grupo"] = np.full(n_sesiones, np.nan)
+
+    validas = longitudes > 0
+    if not validas.any():
+        return resultado
+    inicios_v, longitudes_v = inicios[validas], longitudes[validas]
+
+    # Ordenar por tiempo dentro de cada sesión; tiempo relativo y número de respuesta
+    sesion = np.repeat(np.arange(n_sesiones), longitudes)
+    orden = np.lexsort((starts, sesion))
+    starts = starts[orden]
+    t = starts - starts[inicios[sesion]]
+    conteo = np.arange(starts.size) - inicios[sesion] + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ppm = np.where(t > 0, conteo * 60.0 / t, 0.0)
+
+    finales = inicios_v + longitudes_v - 1
+    suma = np.add.reduceat(ppm, inicios_v)
+    suma_cuadrados = np.add.reduceat(ppm * ppm, inicios_v)
+    media = suma / longitudes_v
+    varianza = np.maximum(suma_cuadrados / longitudes_v - media * media, 0.0)
+
+    resultado["tiempo_final"][validas] = t[finales]
+    resultado["ppm_promedio"][validas] = media
+    resultado["desviacion_estandar"][validas] = np.sqrt(varianza)
+    resultado["ppm_final"][validas] = ppm[finales]
+
+    # Latencia media: (último - primero) / (n - 1) en sesiones con al menos 2 respuestas
+    con_latencia = longitudes_v > 1
+    latencia = np.full(longitudes_v.size, np.nan)
+    latencia[con_latencia] = t[finales][con_latencia] / (longitudes_v[con_latencia] - 1)
+    resultado["latencia_media"][validas] = latencia
+
+    # Latencia mediana: latencias ordenadas dentro de cada sesión y valor(es) central(es)
+    misma_sesion = sesion[1:] == sesion[:-1]
+    lat = np.diff(t)[misma_sesion]
+    lat = lat[np.lexsort((lat, sesion[1:][misma_sesion]))]
+    n_lat = np.maximum(longitudes - 1, 0)
+    inicio_lat = np.concatenate(([0], np.cumsum(n_lat)[:-1]))
+    con_lat = n_lat > 0
+    baja = inicio_lat[con_lat] + (n_lat[con_lat] - 1) // 2
+    alta = inicio_lat[con_lat] + n_lat[con_lat] // 2
+    resultado["latencia_mediana"][con_lat] = (lat[baja] + lat[alta]) / 2
+
+    # Respuestas por intervalo: un único bincount sobre (sesión, intervalo)
+    intervalo = (t // ancho_intervalo).astype(np.int64)
+    n_intervalos = max(minimo_intervalos, int(intervalo.max()) + 1)
+    resultado["conteo_por_intervalo"] = np.bincount(
+        sesion * n_intervalos + intervalo, minlength=n_sesiones * n_intervalos
+    ).reshape(n_sesiones, n_intervalos)
+
+    if claves is not None:
+        # Repeticiones: respuestas menos pares (sesión, palabra) distintos
+        codigos = np.unique(np.asarray(claves)[orden], return_inverse=True)[1].ravel()
+        n_codigos = int(codigos.max()) + 1
+        distintas = np.bincount(np.unique(sesion * n_codigos + codigos) // n_codigos, minlength=n_sesiones)
+        resultado["repeticiones"] = longitudes - distintas
+
+    if categorias is not None:
+        # Agrupamiento y cambios: un cambio es una categoría distinta a la anterior de la misma sesión
+        codigos = np.unique(np.asarray(categorias)[orden], return_inverse=True)[1].ravel()
+        cambio = misma_sesion & (codigos[1:] != codigos[:-1])
+        cambios = np.bincount(sesion[1:][cambio], minlength=n_sesiones)
+        grupos = np.where(validas, cambios + 1, 0)
+        resultado["cambios"] = cambios
+        resultado["grupos"] = grupos
+        resultado["tamano_medio_grupo"][validas] = (longitudes_v - grupos[validas]) / grupos[validas]
+    return resultado
@@ -0,0 +1,302 @@
+"""
+Pruebas para el análisis de animales del sistema AI Alcohol.
+"""
+
+import unittest
+import tempfile
+import json
+import os
+import threading
+import time
+from pathlib import Path
+import sys
+
+# Agregar el directorio raíz al path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.ai_analysis.cache_llm import CacheLLM
+from src.ai_analysis.categorias_semanticas import construir_grupos, registrar_categorias, resolver_categorias
+from src.ai_analysis.cliente_ollama import ClienteOllama, ErrorOllama, opciones_por_defecto
+from src.ai_analysis.lexico_animales import buscar_en_lexico, clasificar_palabras
+from src.ai_analysis.extraer_animales_con_ai import (
+    construir_prompt_compacto,
+    detectar_animales_con_llm,
+    dividir_en_ventanas,
+    fusionar_detecciones,
+    interpretar_con_reintentos,
+    interpretar_respuesta_lista
+)
+
+class TestLexicoAnimales(unittest.TestCase):
+    """Pruebas para el léxico local de animales."""
+
+    def test_plurales_y_diminutivos(self):
+        """Prueba que plurales, diminutivos y tildes se resuelvan a la forma base."""
+        self.assertEqual(buscar_en_lexico("perritos"), "perro")
+        self.assertEqual(buscar_en_lexico("peces"), "pez")
+        self.assertEqual(buscar_en_lexico("vaquita"), "vaca")
+        self.assertEqual(buscar_en_lexico("leon"), "leon")
+        self.assertIsNone(buscar_en_lexico("mesa"))
+
+    def test_diminutivos_y_palabras_comunes(self):
+        """Los diminutivos se resuelven localmente salvo los que son palabras comunes."""
+        palabras = [
+            {"word": "perros", "start": 1.0},
+            {"word": "perritos", "start": 1.5},
+            {"word": "ratito", "start": 2.0},
+            {"word": "ratitos", "start": 3.0},
+            {"word": "palomitas", "start": 4.0},
+            {"word": "cuyo", "start": 5.0}
+        ]
+        detectados, candidatas = clasificar_palabras(palabras)
+        self.assertEqual([d["word"] for d in detectados], ["perros", "perritos"])
+        self.assertEqual([c["word"] for c in candidatas], ["ratito", "ratitos", "palomitas", "cuyo"])
+
+    def test_clasificar_palabras(self):
+        """Prueba que solo las palabras dudosas queden para la IA."""
+        palabras = [
+            {"word": " Perro", "start": 1.0},
+            {"word": "este", "start": 2.0},
+            {"word": "berrego", "start": 3.0},
+            {"word": "gatitos,", "start": 4.0},
+            {"word": "llama", "start": 5.0},
+            {"word": "computadora", "start": 6.0}
+        ]
+        detectados, candidatas = clasificar_palabras(palabras)
+        self.assertEqual([d["start"] for d in detectados], [1.0, 4.0])
+        self.assertTrue(all(d["posible"] is False for d in detectados))
+        self.assertEqual([c["word"] for c in candidatas], ["berrego", "llama"])
+
+        _, candidatas = clasificar_palabras(palabras, escalar_desconocidas=True)
+        self.assertIn("computadora", [c["word"] for c in candidatas])
+
+class TestVentanasDeExtraccion(unittest.TestCase):
+    """Pruebas para la división en ventanas de la extracción con IA."""
+
+    def test_ventanas_solapadas(self):
+        """Prueba que cada palabra caiga en alguna ventana y que se salten los huecos."""
+        palabras = [{"word": f"p{i}", "start": t} for i, t in enumerate([0.0, 5.0, 9.5, 11.0, 40.0])]
+        ventanas = dividir_en_ventanas(palabras, duracion=10.0, solape=1.0)
+        starts = [[p["start"] for p in v] for v in ventanas]
+        self.assertEqual(starts, [[0.0, 5.0, 9.5], [9.5, 11.0], [40.0]])
+
+    def test_ventanas_invalidas(self):
+        """Prueba que un solape mayor o igual a la ventana se rechace en lugar de generar miles de ventanas."""
+        palabras = [{"word": "perro", "start": 0.0}]
+        with self.assertRaises(ValueError):
+            dividir_en_ventanas(palabras, duracion=20.0, solape=25.0)
+        with self.assertRaises(ValueError):
+            dividir_en_ventanas(palabras, duracion=20.0, solape=20.0)
+        with self.assertRaises(ValueError):
+            dividir_en_ventanas(palabras, duracion=0.0, solape=0.0)
+
+    def test_ventana_fallida_no_descarta_las_demas(self):
+        """Prueba que un error de Ollama en una ventana solo omita esa ventana."""
+        class ClienteFalso(ClienteOllama):
+            def chat(self, model, messages, **extra):
+                if "gato" in messages[-1]["content"]:
+                    raise ErrorOllama("Ollama respondió 500")
+                return '[{"i": 0, "posible": false}]'
+
+        palabras = [{"word": "perro", "start": 0.0}, {"word": "gato", "start": 30.0}]
+        cliente = ClienteFalso(url="http://ollama", concurrencia=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            detectados = detectar_animales_con_llm(cliente, palabras, "llama3:8b", "prueba", tmp)
+        cliente.cerrar()
+        self.assertEqual(detectados, [{"word": "perro", "start": 0.0, "posible": False}])
+
+    def test_fusion_sin_duplicados(self):
+        """Prueba que las detecciones repetidas en el solape se cuenten una vez."""
+        fusion = fusionar_detecciones([
+            [{"word": "Gato", "start": 9.5, "posible": True}],
+            [{"word": "gato", "start": 9.5, "posible": False}, {"word": "perro", "start": 11.0, "posible": False}]
+        ])
+        self.assertEqual([(d["start"], d["posible"]) for d in fusion], [(9.5, False), (11.0, False)])
+
+    def test_formato_compacto(self):
+        """Prueba que en formato compacto los tiempos se recuperen de la lista original."""
+        palabras = [{"word": " perro", "start": 1.25}, {"word": "eh", "start": 2.0}, {"word": "berrego", "start": 3.5}]
+        self.assertIn("0:perro 1:eh 2:berrego", construir_prompt_compacto(palabras))
+        detectados = interpretar_respuesta_lista(
+            'Claro: [{"i": 0, "posible": false}, {"i": 2, "posible": true}, {"i": 9}]', palabras
+        )
+        self.assertEqual(detectados, [
+            {"word": "perro", "start": 1.25, "posible": False},
+            {"word": "berrego", "start": 3.5, "posible": True}
+        ])
+
+    def test_reintento_ante_json_invalido(self):
+        """Prueba que una respuesta mal formada se corrija en la misma conversación."""
+        class ClienteFalso:
+            def __init__(self):
+                self.conversaciones = []
+
+            def chat(self, model, messages, **extra):
+                self.conversaciones.append(messages)
+                return '[{"i": 0, "posible": false}]'
+
+        cliente = ClienteFalso()
+        palabras = [{"word": "perro", "start": 1.0}]
+        mensajes = [{"role": "user", "content": "0:perro"}]
+        raw, detectados = interpretar_con_reintentos(
+            cliente, "llama3:8b", mensajes, "Claro, aquí tienes los animales",
+            lambda r: interpretar_respuesta_lista(r, palabras), None, "Ventana"
+        )
+        self.assertEqual(detectados, [{"word": "perro", "start": 1.0, "posible": False}])
+        self.assertEqual(len(cliente.conversaciones), 1)
+        self.assertEqual(cliente.conversaciones[0][1]["role"], "assistant")
+
+class TestCacheLLM(unittest.TestCase):
+    """Pruebas para la caché persistente de respuestas de la IA."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = CacheLLM(os.path.join(self.tmp.name, "cache.sqlite"), max_entradas=2)
+
+    def tearDown(self):
+        self.cache.cerrar()
+        self.tmp.cleanup()
+
+    def test_cliente_no_repite_peticiones(self):
+        """Prueba que una petición idéntica se responda desde la caché."""
+        cliente = ClienteOllama(cache=self.cache)
+        llamadas = []
+        cliente._post = lambda ruta, cuerpo: llamadas.append(cuerpo) or {"message": {"content": "[]"}}
+
+        mensajes = [{"role": "user", "content": "0:perro"}]
+        es_lista = lambda raw: isinstance(json.loads(raw), list)
+        self.assertEqual(cliente.chat("llama3:8b", mensajes, validar=es_lista), "[]")
+        self.assertEqual(cliente.chat("llama3:8b", mensajes, validar=es_lista), "[]")
+        cliente.chat("mistral", mensajes, validar=es_lista)
+        self.assertEqual(len(llamadas), 2)
+        self.assertEqual(self.cache.estadisticas()["aciertos"], 1)
+
+    def test_no_guarda_respuestas_invalidas(self):
+        """Prueba que solo se guarden en caché las respuestas que pasan la validación."""
+        cliente = ClienteOllama(cache=self.cache)
+        respuestas = iter(["no es json", "[]"])
+        cliente._post = lambda ruta, cuerpo: {"message": {"content": next(respuestas)}}
+        es_lista = lambda raw: isinstance(json.loads(raw), list)
+
+        mensajes = [{"role": "user", "content": "0:perro"}]
+        self.assertEqual(cliente.chat("llama3:8b", mensajes, validar=es_lista), "no es json")
+        self.assertEqual(self.cache.estadisticas()["entradas"], 0)
+        self.assertEqual(cliente.chat("llama3:8b", mensajes, validar=es_lista), "[]")
+        self.assertEqual(self.cache.estadisticas()["entradas"], 1)
+
+        # Una entrada guardada que ya no es válida se descarta y se vuelve a pedir
+        clave = CacheLLM.clave({
+            "model": "llama3:8b", "messages": mensajes, "stream": False,
+            "options": opciones_por_defecto()
+        })
+        self.cache.guardar(clave, "llama3:8b", "roto")
+        cliente._post = lambda ruta, cuerpo: {"message": {"content": "[1]"}}
+        self.assertEqual(cliente.chat("llama3:8b", mensajes, validar=es_lista), "[1]")
+        self.assertEqual(self.cache.obtener(clave), "[1]")
+
+    def test_elimina_las_menos_usadas(self):
+        """Prueba que al superar el máximo se elimine la entrada usada hace más tiempo."""
+        claves = [CacheLLM.clave({"n": i}) for i in range(3)]
+        self.cache.guardar(claves[0], "m", "a")
+        self.cache.guardar(claves[1], "m", "b")
+        self.cache.obtener(claves[0])
+        self.cache.guardar(claves[2], "m", "c")
+        self.assertEqual(self.cache.obtener(claves[0]), "a")
+        self.assertIsNone(self.cache.obtener(claves[1]))
+        self.assertEqual(self.cache.estadisticas()["entradas"], 2)
+
+class TestClienteOllama(unittest.TestCase):
+    """Pruebas para el cliente HTTP de Ollama."""
+
+    def test_espera_sin_ocupar_turno(self):
+        """Una petición que espera para reintentar no bloquea a las demás."""
+        cliente = ClienteOllama(url="http://ollama", concurrencia=1, reintentos=1, espera_inicial=0.5)
+        fallos = {"lenta": 1}
+
+        class Respuesta:
+            def __init__(self, estado):
+                self.status_code = estado
+                self.text = ""
+
+            def json(self):
+                return {"message": {"content": "[]"}}
+
+        def post(url, json, timeout):
+            if fallos.get(json["id"]):
+                fallos[json["id"]] -= 1
+                return Respuesta(503)
+            return Respuesta(200)
+
+        cliente.sesion.post = post
+        hilo = threading.Thread(target=cliente._post, args=("/api/chat", {"id": "lenta"}))
+        hilo.start()
+        time.sleep(0.1)
+        inicio = time.monotonic()
+        cliente._post("/api/chat", {"id": "rapida"})
+        self.assertLess(time.monotonic() - inicio, 0.3)
+        hilo.join()
+
+    def test_cuerpo_no_json(self):
+        """Un cuerpo que no es JSON se reintenta y termina en ErrorOllama."""
+        cliente = ClienteOllama(url="http://ollama", reintentos=1, espera_inicial=0.0)
+        intentos = []
+
+        class Respuesta:
+            status_code = 200
+            text = '{"message": {"cont'
+
+            def json(self):
+                return json.loads(self.text)
+
+        def post(url, json, timeout):
+            intentos.append(url)
+            return Respuesta()
+
+        cliente.sesion.post = post
+        with self.assertRaises(ErrorOllama):
+            cliente.chat("llama3:8b", [{"role": "user", "content": "hola"}])
+        self.assertEqual(len(intentos), 2)
+
+    def test_achat_valida_antes_de_guardar(self):
+        """La versión asíncrona tampoco guarda en caché respuestas inválidas."""
+        import asyncio
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CacheLLM(os.path.join(tmp, "cache.sqlite"))
+            cliente = ClienteOllama(url="http://ollama", cache=cache)
+            cliente._post = lambda ruta, cuerpo: {"message": {"content": "no es una lista"}}
+            mensajes = [{"role": "user", "content": "hola"}]
+            asyncio.run(cliente.achat("llama3:8b", mensajes, validar=lambda r: r.startswith("[")))
+            cuerpo = {"model": "llama3:8b", "messages": mensajes, "stream": False, "options": opciones_por_defecto()}
+            self.assertIsNone(cache.obtener(cache.clave(cuerpo)))
+            cliente.cerrar()
+
+class TestCategoriasSemanticas(unittest.TestCase):
+    """Pruebas para el diccionario persistente de categorías."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.tmp.name, "categorias.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_solo_animales_nuevos_son_desconocidos(self):
+        """Prueba que el léxico y las categorías aprendidas eviten preguntar a la IA."""
+        palabras = ["Perro", "gatitos", "berrego", "perro", "berrego"]
+        asignadas, desconocidas = resolver_categorias(palabras, self.ruta)
+        self.assertEqual(desconocidas, ["berrego"])
+
+        registrar_categorias({"Berrego": "granja"}, self.ruta)
+        asignadas, desconocidas = resolver_categorias(palabras, self.ruta)
+        self.assertEqual(desconocidas, [])
+        self.assertEqual(asignadas["berrego"], "granja")
+        self.assertEqual(asignadas["Perro"], asignadas["gatitos"])
+
+        grupos = construir_grupos(palabras, asignadas)
+        self.assertEqual(grupos["granja"], ["berrego"])
+        self.assertEqual(sum(len(v) for v in grupos.values()), 4)
+
+if __name__ == "__main__":
+    unittest.main()
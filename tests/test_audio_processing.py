@@ -0,0 +1,208 @@
+"""
+Pruebas para el procesamiento de audio del sistema AI Alcohol.
+"""
+
+import unittest
+import tempfile
+import json
+import os
+import shutil
+from pathlib import Path
+import sys
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import lfilter
+
+# Agregar el directorio raíz al path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from config import AUDIO_CONFIG
+from src.audio_processing.deteccion_de_voz import (
+    a_tiempo_absoluto,
+    cargar_indice_de_voz,
+    guardar_indice_de_voz,
+    indice_de_voz,
+    niveles_por_trama,
+    recortar_a_voz
+)
+from src.audio_processing.diarizacion_de_personas import asignar_roles, realizar_diarizacion, regiones_de_voz
+from src.audio_processing.procesamiento_de_audio import _leer_bloques_ffmpeg
+
+SR = 16000
+
+def voz_sintetica(f0, formantes, duracion):
+    """Vocal sostenida: tren de armónicos filtrado por resonadores en los formantes."""
+    t = np.arange(int(duracion * SR)) / SR
+    fase = 2 * np.pi * np.cumsum(f0 * (1 + 0.03 * np.sin(2 * np.pi * 3 * t))) / SR
+    fuente = sum(np.sin(k * fase) / k for k in range(1, 30))
+    senal = np.zeros_like(fuente)
+    for formante in formantes:
+        w = 2 * np.pi * formante / SR
+        senal += lfilter([1], [1, -2 * 0.97 * np.cos(w), 0.97 ** 2], fuente)
+    senal *= np.sqrt(0.5 * (1 + np.sin(2 * np.pi * 4 * t)))
+    return (0.3 * senal / np.max(np.abs(senal))).astype(np.float32)
+
+VOCES = {
+    "A": (110, (500, 1500, 2500)),
+    "B": (230, (800, 2200, 3000))
+}
+
+class TestDiarizacion(unittest.TestCase):
+    """Pruebas para la diarización local en CPU."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def _grabacion(self, turnos):
+        partes = []
+        for hablante, duracion in turnos:
+            partes.append(np.zeros(int(0.6 * SR), dtype=np.float32))
+            partes.append(voz_sintetica(*VOCES[hablante], duracion))
+        ruta = os.path.join(self.temp_dir, "audio.wav")
+        sf.write(ruta, np.concatenate(partes), SR)
+        return ruta
+
+    def test_regiones_unen_pausas_cortas(self):
+        """Las pausas menores a max_hueco no separan regiones."""
+        mascara = np.array([1, 1, 0, 1, 1] + [0] * 12 + [1] * 6, dtype=bool)
+        regiones = regiones_de_voz(mascara, 0.03, max_hueco=0.3)
+        np.testing.assert_allclose(regiones, [[0.0, 0.15], [0.51, 0.69]])
+
+    def test_dos_hablantes_alternados(self):
+        """Cada turno se asigna a su hablante y se guarda diarization_results.json."""
+        turnos = [("A", 3.0), ("B", 1.0), ("B", 1.2), ("A", 2.5), ("B", 0.8), ("A", 3.0)]
+        segmentos = realizar_diarizacion(self._grabacion(turnos), output_dir=self.temp_dir)
+
+        self.assertEqual(len(segmentos), len(turnos))
+        self.assertEqual(
+            [s["speaker"] for s in segmentos],
+            ["SPEAKER_00", "SPEAKER_01", "SPEAKER_01", "SPEAKER_00", "SPEAKER_01", "SPEAKER_00"]
+        )
+        self.assertAlmostEqual(segmentos[0]["start_time"], 0.6, delta=0.1)
+        # Los turnos cortos son del paciente; las instrucciones largas, del examinador
+        self.assertEqual(
+            [s["role"] for s in segmentos],
+            ["examinador", "paciente", "paciente", "examinador", "paciente", "examinador"]
+        )
+
+        with open(os.path.join(self.temp_dir, "diarization_results.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), segmentos)
+
+    def test_asignar_roles(self):
+        """El paciente es el hablante con más turnos cortos, aunque hable menos tiempo."""
+        segmentos = [
+            {"speaker": "SPEAKER_00", "start_time": 0.0, "end_time": 6.0},
+            {"speaker": "SPEAKER_01", "start_time": 7.0, "end_time": 7.6},
+            {"speaker": "SPEAKER_01", "start_time": 9.0, "end_time": 9.5},
+            {"speaker": "SPEAKER_00", "start_time": 10.0, "end_time": 11.0},
+            {"speaker": "SPEAKER_01", "start_time": 12.0, "end_time": 12.8}
+        ]
+        roles = asignar_roles(segmentos, turno_corto=2.0)
+        self.assertEqual(roles, {"SPEAKER_00": "examinador", "SPEAKER_01": "paciente"})
+        self.assertEqual(segmentos[1]["role"], "paciente")
+
+        # Con un solo hablante, ese hablante es el paciente
+        self.assertEqual(asignar_roles(segmentos[:1]), {"SPEAKER_00": "paciente"})
+
+    def test_un_solo_hablante(self):
+        """Si los grupos no se separan se devuelve un único hablante."""
+        segmentos = realizar_diarizacion(self._grabacion([("A", 3.0), ("A", 1.0), ("A", 2.5)]), output_dir=self.temp_dir)
+        self.assertEqual({s["speaker"] for s in segmentos}, {"SPEAKER_00"})
+
+class TestDeteccionDeVoz(unittest.TestCase):
+    """Pruebas para el índice de voz y el recorte de silencios."""
+
+    def setUp(self):
+        # 1 s de silencio, 0.5 s de voz, 2 s de silencio, 0.4 s de voz, 1 s de silencio
+        self.audio = np.concatenate([
+            np.zeros(SR, dtype=np.float32),
+            voz_sintetica(*VOCES["A"], 0.5),
+            np.zeros(2 * SR, dtype=np.float32),
+            voz_sintetica(*VOCES["B"], 0.4),
+            np.zeros(SR, dtype=np.float32)
+        ])
+
+    def test_indice_de_voz(self):
+        """Las regiones cubren la voz con su margen y dejan fuera los silencios largos."""
+        regiones = indice_de_voz(niveles_por_trama(self.audio, SR, 0.03), 0.03, umbral_db=-35, max_hueco=0.5, margen=0.1)
+        self.assertEqual(len(regiones), 2)
+        np.testing.assert_allclose(regiones[0], [0.9, 1.6], atol=0.05)
+        np.testing.assert_allclose(regiones[1], [3.4, 4.0], atol=0.05)
+
+    def test_indice_guardado_corresponde_al_audio(self):
+        """El índice se descarta si cambia el audio o los parámetros vad_*."""
+        from unittest import mock
+
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, "audio.wav")
+            sf.write(ruta, self.audio, SR)
+            regiones = np.array([[0.9, 1.6], [3.4, 4.0]])
+            guardar_indice_de_voz(ruta, regiones)
+            np.testing.assert_allclose(cargar_indice_de_voz(ruta), regiones)
+
+            with mock.patch.dict(AUDIO_CONFIG, {"vad_threshold_db": -20.0}):
+                self.assertIsNone(cargar_indice_de_voz(ruta))
+
+            sf.write(ruta, self.audio[:SR], SR)
+            self.assertIsNone(cargar_indice_de_voz(ruta))
+
+    def test_recorte_y_tiempos_absolutos(self):
+        """Los tiempos del audio recortado vuelven a la grabación original."""
+        regiones = np.array([[0.9, 1.6], [3.4, 4.0]])
+        audio_voz, mapa = recortar_a_voz(self.audio, SR, 0.0, 5.0, regiones, hueco=0.3)
+
+        self.assertAlmostEqual(len(audio_voz) / SR, 0.7 + 0.3 + 0.6, places=3)
+        self.assertAlmostEqual(a_tiempo_absoluto(0.1, mapa), 1.0)
+        self.assertAlmostEqual(a_tiempo_absoluto(1.1, mapa), 3.5)
+        # Un tiempo dentro del silencio insertado pasa al inicio de la pieza siguiente
+        self.assertAlmostEqual(a_tiempo_absoluto(0.8, mapa), 3.4)
+
+        # Los segmentos fuera de toda región quedan vacíos
+        vacio, mapa_vacio = recortar_a_voz(self.audio, SR, 2.0, 3.0, regiones)
+        self.assertEqual(len(vacio), 0)
+        self.assertEqual(len(mapa_vacio), 0)
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg no está instalado")
+class TestDecodificacionPorTuberia(unittest.TestCase):
+    """Pruebas para la lectura por bloques desde ffmpeg."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _wav(self, nombre, audio):
+        ruta = os.path.join(self.temp_dir, nombre)
+        sf.write(ruta, audio, SR)
+        return ruta
+
+    def test_lectura_completa(self):
+        """Todos los bloques suman la duración del audio."""
+        ruta = self._wav("audio.wav", voz_sintetica(*VOCES["A"], 2.0))
+        self.assertEqual(sum(len(b) for b in _leer_bloques_ffmpeg(ruta, SR, SR // 2)), 2 * SR)
+
+    def test_error_del_consumidor_no_se_oculta(self):
+        """Si quien lee los bloques falla o se detiene, no se reporta un error de ffmpeg."""
+        ruta = self._wav("audio.wav", voz_sintetica(*VOCES["A"], 2.0))
+        bloques = _leer_bloques_ffmpeg(ruta, SR, SR // 2)
+        with self.assertRaises(KeyError):
+            for _ in bloques:
+                raise KeyError("consumidor")
+        bloques.close()
+
+    def test_entrada_vacia_o_invalida(self):
+        """Un audio sin muestras o un archivo ilegible fallan en lugar de producir un WAV vacío."""
+        with self.assertRaises(ValueError):
+            list(_leer_bloques_ffmpeg(self._wav("vacio.wav", np.zeros(0, dtype=np.float32)), SR, SR))
+        with self.assertRaises(RuntimeError):
+            list(_leer_bloques_ffmpeg(os.path.join(self.temp_dir, "no_existe.wav"), SR, SR))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -145,6 +145,54 @@ class TestResultsStructure(unittest.TestCase):
                         except json.JSONDecodeError:
                             self.fail(f"El archivo {file_name} no es un JSON válido")
 
+    def test_carpetas_unicas_por_archivo(self):
+        """Prueba que archivos con el mismo nombre base no compartan carpeta."""
+        from src.pipeline.etapas import nombre_con_hash, nombres_unicos
+
+        archivos = ["a/video_1.mp4", "b/video_1.MOV", "video_2.mp4"]
+        nombres = nombres_unicos(archivos)
+        self.assertEqual(nombres, [nombre_con_hash("a/video_1.mp4"), nombre_con_hash("b/video_1.MOV"), "video_2"])
+        self.assertEqual(len(set(nombres)), 3)
+        self.assertRegex(nombres[0], r"^video_1_[0-9a-f]{8}$")
+        # El mismo archivo repetido no es una colisión
+        self.assertEqual(nombres_unicos(["video_3.mp4", "./video_3.mp4"]), ["video_3", "video_3"])
+
+    def test_carpeta_con_sufijo_no_depende_del_lote(self):
+        """Prueba que x.mp4 no desplace a un archivo llamado x_mp4.wav."""
+        from src.pipeline.etapas import nombre_con_hash, nombres_unicos
+
+        lote = nombres_unicos(["x.mp4", "x.mov", "x_mp4.wav"])
+        self.assertEqual(lote[2], "x_mp4")
+        self.assertEqual(nombres_unicos(["x_mp4.wav"]), ["x_mp4"])
+        self.assertEqual(lote[0], nombre_con_hash("x.mp4"))
+        self.assertEqual(nombres_unicos(["x.mp4", "otra/x.wav"])[0], lote[0])
+
+def _etapa_de_prueba(trabajo):
+    return trabajo
+
+class TestProcesamientoPorLotes(unittest.TestCase):
+    """Pruebas para el encadenamiento de etapas del lote."""
+
+    def test_pool_cerrado_no_bloquea_el_lote(self):
+        """Si una etapa no se puede encolar, el archivo termina con error en lugar de colgar el lote."""
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        from src.pipeline import procesamiento_por_lotes as lotes
+
+        def ejecutores(limites):
+            cerrado = ThreadPoolExecutor(max_workers=1)
+            cerrado.shutdown()
+            return {"cpu": ThreadPoolExecutor(max_workers=1), "llm": cerrado}
+
+        etapas = (("conversion", _etapa_de_prueba, "cpu"), ("extraccion", _etapa_de_prueba, "llm"))
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(lotes, "ETAPAS", etapas), \
+                mock.patch.object(lotes, "_crear_ejecutores", ejecutores):
+            salida = lotes.procesar_lote(["video_1.mp4"], tmp, limites={"cpu_workers": 1})
+
+        self.assertEqual(salida[0]["estado"], "error")
+        self.assertTrue(salida[0]["mensaje"].startswith("extraccion:"))
+
 def run_tests():
     """Ejecuta todas las pruebas."""
     # Crear un test suite
@@ -156,7 +204,8 @@ def run_tests():
         TestDataStructures,
         TestFileFormats,
         TestDataFiles,
-        TestResultsStructure
+        TestResultsStructure,
+        TestProcesamientoPorLotes
     ]
     
     for test_class in test_classes:
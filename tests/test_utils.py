@@ -0,0 +1,222 @@
+"""
+Pruebas para las utilidades del sistema AI Alcohol.
+"""
+
+import unittest
+import tempfile
+import json
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Agregar el directorio raíz al path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.utils.cache_de_etapas import ejecutar_con_cache
+from src.utils.correccion_de_lista_animales import alinear_tiempos, sobreescribir_tiempos
+from src.utils.linea_de_tiempo import CAMPOS_ANIMALES, cargar_linea_de_tiempo, cargar_registros, guardar_linea_de_tiempo
+from src.utils.normalizacion_de_texto import normalizar, normalizar_lote
+
+class TestCacheDeEtapas(unittest.TestCase):
+    """Pruebas para la caché de etapas del pipeline."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.entrada = os.path.join(self.dir, "entrada.txt")
+        self.salida = os.path.join(self.dir, "salida.txt")
+        with open(self.entrada, "w") as f:
+            f.write("a")
+        self.ejecuciones = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _etapa(self):
+        self.ejecuciones += 1
+        with open(self.salida, "w") as f:
+            f.write("b")
+        return {"salida": self.salida}
+
+    def test_reutiliza_resultado_sin_cambios(self):
+        """Prueba que una etapa sin cambios no se vuelva a ejecutar."""
+        ejecutar_con_cache(self.dir, "etapa", [self.entrada], {"p": 1}, self._etapa)
+        salidas = ejecutar_con_cache(self.dir, "etapa", [self.entrada], {"p": 1}, self._etapa)
+        self.assertEqual(self.ejecuciones, 1)
+        self.assertEqual(salidas, {"salida": self.salida})
+
+    def test_invalida_por_parametros_y_entradas(self):
+        """Prueba que cambiar parámetros o el contenido de la entrada invalide la caché."""
+        ejecutar_con_cache(self.dir, "etapa", [self.entrada], {"p": 1}, self._etapa)
+        ejecutar_con_cache(self.dir, "etapa", [self.entrada], {"p": 2}, self._etapa)
+        self.assertEqual(self.ejecuciones, 2)
+
+        with open(self.entrada, "w") as f:
+            f.write("otro contenido")
+        ejecutar_con_cache(self.dir, "etapa", [self.entrada], {"p": 2}, self._etapa)
+        self.assertEqual(self.ejecuciones, 3)
+
+    def test_invalida_si_falta_la_salida(self):
+        """Prueba que la etapa se repita si su salida fue borrada."""
+        ejecutar_con_cache(self.dir, "etapa", [self.entrada], {}, self._etapa)
+        os.remove(self.salida)
+        ejecutar_con_cache(self.dir, "etapa", [self.entrada], {}, self._etapa)
+        self.assertEqual(self.ejecuciones, 2)
+
+class TestLineaDeTiempo(unittest.TestCase):
+    """Pruebas para el formato columnar de líneas de tiempo."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, "lista_animales")
+        self.registros = [
+            {"word": "perro", "start": 1.5, "segment": 0, "speaker": "SPEAKER_01", "posible": False, "alineada": True},
+            {"word": "berrego", "start": 3.25, "segment": 1, "speaker": "SPEAKER_01", "posible": True, "alineada": False}
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_npy_mapeado_en_memoria(self):
+        """Prueba que el .npy conserve todas las columnas y se abra con mmap."""
+        ruta = guardar_linea_de_tiempo(self.base, self.registros, exportar_json=False)
+        linea = cargar_linea_de_tiempo(ruta)
+        self.assertIsNotNone(getattr(linea, "filename", None))
+        self.assertEqual(linea["start"].tolist(), [1.5, 3.25])
+        self.assertEqual(linea["segment"].tolist(), [0, 1])
+        self.assertFalse(os.path.exists(self.base + ".json"))
+        del linea
+
+    def test_entradas_sin_alinear(self):
+        """Prueba que la marca de alineación sobreviva al guardar y que falte = alineada."""
+        guardar_linea_de_tiempo(self.base, self.registros, exportar_json=False)
+        self.assertEqual([r["alineada"] for r in cargar_registros(self.base + ".npy", CAMPOS_ANIMALES)], [True, False])
+
+        guardar_linea_de_tiempo(self.base, [{"word": "gato", "start": 2.0}], exportar_json=False)
+        self.assertEqual(cargar_registros(self.base + ".npy", CAMPOS_ANIMALES)[0]["alineada"], True)
+
+    def test_textos_largos_sin_truncar(self):
+        """Prueba que las palabras y hablantes largos se guarden completos."""
+        palabra = "hipopotamo" * 5
+        hablante = "ENTREVISTADOR_PRINCIPAL"
+        registros = self.registros + [{"word": palabra, "start": 6.0, "speaker": hablante}]
+        linea = cargar_linea_de_tiempo(guardar_linea_de_tiempo(self.base, registros, exportar_json=False))
+        self.assertEqual(linea["word"][-1], palabra)
+        self.assertEqual(linea["speaker"][-1], hablante)
+        del linea
+
+    def test_json_como_alternativa(self):
+        """Prueba que los cargadores acepten .json y .npy indistintamente."""
+        guardar_linea_de_tiempo(self.base, self.registros, campos_json=CAMPOS_ANIMALES, exportar_json=True)
+        esperado = [{k: r[k] for k in CAMPOS_ANIMALES} for r in self.registros]
+        self.assertEqual(cargar_registros(self.base + ".json", CAMPOS_ANIMALES), esperado)
+        os.remove(self.base + ".json")
+        self.assertEqual(cargar_registros(self.base + ".json", CAMPOS_ANIMALES), esperado)
+
+class TestAlineacionDeTiempos(unittest.TestCase):
+    """Pruebas para la corrección de tiempos de las palabras de la IA."""
+
+    def setUp(self):
+        self.transcripcion = [
+            {"word": "perro", "start": 1.0},
+            {"word": "gato", "start": 2.0},
+            {"word": "león", "start": 2.0},
+            {"word": "perro", "start": 4.0},
+            {"word": "caballo", "start": 5.5},
+            {"word": "perro", "start": 9.0}
+        ]
+
+    def test_mismo_tiempo_distintas_palabras(self):
+        """Dos palabras distintas en el mismo instante conservan su tiempo."""
+        alineadas = alinear_tiempos(self.transcripcion, [
+            {"word": "gato", "start": 0.0},
+            {"word": "leon", "start": 0.0}
+        ])
+        self.assertEqual([a["start"] for a in alineadas], [2.0, 2.0])
+
+    def test_repeticiones_y_tiempo_propuesto(self):
+        """Las repeticiones no reutilizan tiempos y se elige la ocurrencia más cercana a la propuesta."""
+        alineadas = alinear_tiempos(self.transcripcion, [
+            {"word": "perro", "start": 8.7, "posible": False},
+            {"word": "Perro", "start": 0.9}
+        ])
+        self.assertEqual([a["start"] for a in alineadas], [9.0, 1.0])
+        self.assertFalse(alineadas[0]["posible"])
+
+        alineadas = alinear_tiempos(self.transcripcion, [{"word": "perro"}] * 4)
+        self.assertEqual([a.get("start") for a in alineadas], [1.0, 4.0, 9.0, None])
+        self.assertEqual([a["alineada"] for a in alineadas], [True, True, True, False])
+
+    def test_tiempos_de_la_ia_desordenados(self):
+        """Un tiempo erróneo o desordenado de la IA no le quita su tiempo a las demás palabras."""
+        transcripcion = [
+            {"word": "perro", "start": 1.0},
+            {"word": "gato", "start": 2.0},
+            {"word": "vaca", "start": 30.0}
+        ]
+        alineadas = alinear_tiempos(transcripcion, [
+            {"word": "vaca", "start": 3.0},
+            {"word": "gato", "start": 4.0},
+            {"word": "perro", "start": 5.0}
+        ])
+        self.assertEqual([a["start"] for a in alineadas], [30.0, 2.0, 1.0])
+        self.assertTrue(all(a["alineada"] for a in alineadas))
+
+        # Repeticiones con los tiempos de la IA intercambiados
+        alineadas = alinear_tiempos(self.transcripcion, [
+            {"word": "perro", "start": 9.5},
+            {"word": "perro", "start": 0.5},
+            {"word": "perro", "start": 20.0}
+        ])
+        self.assertEqual(sorted(a["start"] for a in alineadas), [1.0, 4.0, 9.0])
+        self.assertEqual(alineadas[1]["start"], 1.0)
+
+    def test_palabras_alteradas_por_la_ia(self):
+        """Una palabra escrita distinto por la IA se alinea por similitud; las ajenas se dejan igual."""
+        alineadas = alinear_tiempos(self.transcripcion, [
+            {"word": "caballos", "start": 5.0},
+            {"word": "jirafa", "start": 7.0}
+        ])
+        self.assertEqual([a["start"] for a in alineadas], [5.5, 7.0])
+        self.assertEqual([a["alineada"] for a in alineadas], [True, False])
+
+    def test_sobreescribir_tiempos(self):
+        """El envoltorio lee la transcripción (.npy o .json) y reescribe el JSON de la IA."""
+        with tempfile.TemporaryDirectory() as tmp:
+            guardar_linea_de_tiempo(os.path.join(tmp, "palabras_con_tiempos"), self.transcripcion, exportar_json=False)
+            ia_path = os.path.join(tmp, "ia.json")
+            with open(ia_path, "w", encoding="utf-8") as f:
+                json.dump([{"word": "caballo", "start": 0.0}], f)
+
+            devueltas = sobreescribir_tiempos(os.path.join(tmp, "palabras_con_tiempos.json"), ia_path)
+            with open(ia_path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), devueltas)
+            self.assertEqual(devueltas[0]["start"], 5.5)
+
+class TestNormalizacionDeTexto(unittest.TestCase):
+    """Pruebas para la normalización de palabras."""
+
+    def test_normalizar(self):
+        """Minúsculas, sin tildes ni puntuación."""
+        self.assertEqual(normalizar("León,"), "leon")
+        self.assertEqual(normalizar("  ÑANDÚ! "), "nandu")
+        self.assertEqual(normalizar("pez-espada"), "pezespada")
+        self.assertEqual(normalizar("¿...?"), "")
+
+    def test_normalizar_lote(self):
+        """El lote da lo mismo que normalizar palabra por palabra, con listas o arreglos."""
+        palabras = ["Perro", "perro.", "Águila", "perro", "gato"]
+        esperado = [normalizar(p) for p in palabras]
+        self.assertEqual(normalizar_lote(palabras), esperado)
+
+        arreglo = np.array(palabras)
+        resultado = normalizar_lote(arreglo)
+        self.assertIsInstance(resultado, np.ndarray)
+        self.assertEqual(resultado.tolist(), esperado)
+        self.assertEqual(normalizar_lote(np.array([], dtype="U8")).tolist(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Pruebas para las métricas de fluidez del sistema AI Alcohol.
+"""
+
+import unittest
+import tempfile
+import json
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio raíz al path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.visualization.agregacion_de_cohorte import leer_resumenes, unir_con_pacientes
+from src.visualization.metricas_fluidez import (
+    agrupamiento_y_cambios,
+    contar_repeticiones,
+    conteo_por_intervalo,
+    fluidez_acumulada,
+    metricas_cohorte,
+    resumen_fluidez
+)
+
+class TestMetricasFluidez(unittest.TestCase):
+    """Pruebas para el motor de métricas de fluidez."""
+
+    def test_fluidez_acumulada(self):
+        """Prueba las ppm acumuladas: i respuestas en t segundos -> i * 60 / t."""
+        tiempos, ppm = fluidez_acumulada([12.0, 2.0, 5.0])
+        np.testing.assert_allclose(tiempos, [0.0, 3.0, 10.0])
+        np.testing.assert_allclose(ppm, [0.0, 40.0, 18.0])
+
+    def test_intervalos_y_cambios(self):
+        """Prueba el conteo por intervalos de 15 s y el agrupamiento por categoría."""
+        self.assertEqual(conteo_por_intervalo([0.0, 3.0, 16.0, 50.0]).tolist(), [2, 1, 0, 1])
+        metricas = agrupamiento_y_cambios(["granja", "granja", "aves", "granja", "granja", "granja"])
+        self.assertEqual(metricas["cambios"], 2)
+        self.assertEqual(metricas["grupos"], 3)
+        self.assertAlmostEqual(metricas["tamano_medio_grupo"], 1.0)
+
+    def test_cohorte_igual_a_sesiones(self):
+        """Prueba que la versión de cohorte coincida con el cálculo sesión por sesión."""
+        rng = np.random.default_rng(0)
+        sesiones = [np.sort(rng.uniform(0, 60, n)) for n in (5, 1, 12)]
+        sesiones.insert(1, np.array([]))
+        palabras = [rng.choice(["perro", "gato", "vaca"], len(s)) for s in sesiones]
+        categorias = [rng.choice(["granja", "mascotas"], len(s)) for s in sesiones]
+        cohorte = metricas_cohorte(
+            np.concatenate(sesiones), [len(s) for s in sesiones],
+            claves=np.concatenate(palabras), categorias=np.concatenate(categorias)
+        )
+
+        self.assertTrue(np.isnan(cohorte["ppm_promedio"][1]))
+        for i, s in enumerate(sesiones):
+            if not len(s):
+                continue
+            resumen = resumen_fluidez(s)
+            self.assertAlmostEqual(round(cohorte["ppm_promedio"][i], 2), resumen["ppm_promedio"])
+            self.assertAlmostEqual(round(cohorte["desviacion_estandar"][i], 2), resumen["desviacion_estandar"])
+            self.assertAlmostEqual(round(cohorte["ppm_final"][i], 2), resumen["ppm_final"])
+            self.assertEqual(cohorte["total_palabras"][i], resumen["total_palabras"])
+            if len(s) > 1:
+                self.assertAlmostEqual(round(cohorte["latencia_mediana"][i], 2), resumen["latencia_mediana"])
+            else:
+                self.assertTrue(np.isnan(cohorte["latencia_mediana"][i]))
+            conteo = resumen["conteo_por_intervalo"]
+            self.assertEqual(cohorte["conteo_por_intervalo"][i].tolist()[:len(conteo)], conteo)
+            self.assertEqual(cohorte["repeticiones"][i], contar_repeticiones(palabras[i]))
+            grupos = agrupamiento_y_cambios(categorias[i].tolist())
+            self.assertEqual(cohorte["cambios"][i], grupos["cambios"])
+            self.assertEqual(cohorte["grupos"][i], grupos["grupos"])
+            self.assertAlmostEqual(cohorte["tamano_medio_grupo"][i], grupos["tamano_medio_grupo"])
+
+    def test_cohorte_con_sesion_final_vacia(self):
+        """Prueba que una última sesión sin respuestas quede en NaN sin fallar."""
+        cohorte = metricas_cohorte([1.0, 2.0, 3.0], [3, 0])
+        self.assertAlmostEqual(cohorte["tiempo_final"][0], 2.0)
+        self.assertTrue(np.isnan(cohorte["tiempo_final"][1]))
+        self.assertEqual(cohorte["total_palabras"].tolist(), [3, 0])
+
+class TestAgregacionDeCohorte(unittest.TestCase):
+    """Pruebas para la agregación de resúmenes de la cohorte."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for video, ppm in (("video_1", 12.5), ("video_2", 20.0)):
+            carpeta = os.path.join(self.tmp.name, video)
+            os.makedirs(carpeta)
+            with open(os.path.join(carpeta, f"resumen_fluidez_{video}.json"), "w", encoding="utf-8") as f:
+                json.dump({"ppm_promedio": ppm, "total_palabras": 10}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_join_por_nombre_normalizado(self):
+        """Prueba que los nombres se unan sin importar tildes, mayúsculas ni espacios."""
+        resumenes = leer_resumenes(self.tmp.name)
+        self.assertEqual(sorted(resumenes["video"]), ["video_1", "video_2"])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "indice_resumenes.json")))
+
+        pacientes = pd.DataFrame({"NOMBRE": ["José  Pérez", "ANA LOPEZ", "SIN VIDEO"]})
+        asociaciones = {"video_1": "JOSE PEREZ ", "video_2": "Ana López"}
+        df = unir_con_pacientes(pacientes, asociaciones, resumenes)
+        self.assertEqual(df["ppm_promedio"].tolist()[:2], [12.5, 20.0])
+        self.assertTrue(pd.isna(df["ppm_promedio"].iloc[2]))
+        self.assertEqual(len(df), 3)
+
+    def test_video_por_carpeta(self):
+        """Prueba que un resumen copiado a otra carpeta no duplique pacientes."""
+        carpeta = os.path.join(self.tmp.name, "copia")
+        os.makedirs(carpeta)
+        with open(os.path.join(carpeta, "resumen_fluidez_video_1.json"), "w", encoding="utf-8") as f:
+            json.dump({"ppm_promedio": 99.0, "total_palabras": 10}, f)
+
+        resumenes = leer_resumenes(self.tmp.name, usar_indice=False)
+        self.assertEqual(sorted(resumenes["video"]), ["video_1", "video_2"])
+
+        # Un DataFrame con videos repetidos tampoco multiplica las filas del paciente
+        repetidos = pd.concat([resumenes, resumenes.assign(ppm_promedio=30.0)], ignore_index=True)
+        pacientes = pd.DataFrame({"NOMBRE": ["José Pérez", "Ana López"]})
+        df = unir_con_pacientes(pacientes, {"video_1": "José Pérez", "video_2": "Ana López"}, repetidos)
+        self.assertEqual(len(df), 2)
+        self.assertEqual(df["ppm_promedio"].tolist(), [30.0, 30.0])
+
+if __name__ == "__main__":
+    unittest.main()